@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+API HTTP local de solo lectura sobre el corpus descargado
+Búsqueda por id, rol_era_sup_s y sent__RUC_s, y listados filtrados por
+tribunal, fechas y materia con un catálogo SQLite persistente que guarda la
+ubicación de cada sentencia en su batch (sin recorrer archivos por consulta)
+"""
+
+import sys
+import json
+import sqlite3
+import threading
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+from pathlib import Path
+
+from corpus_local import listar_batches, tribunal_de_batch, registros_batch, leer_registro, firma_archivo, fecha_sentencia
+
+CATALOGO_DEFAULT = "output/catalogo_corpus.sqlite"
+PUERTO_DEFAULT = 8765
+TAMANO_CACHE = 2048            # Sentencias completas en memoria
+LIMITE_LISTADO = 1000          # Filas por defecto en listados NDJSON
+
+
+def materias_de(sentencia):
+    """Materias de la sentencia como lista"""
+    materias = sentencia.get('gls_materia_ss') or sentencia.get('gls_materia_s') or []
+    if isinstance(materias, str):
+        return [materias]
+    return [str(m) for m in materias]
+
+
+class CatalogoDesactualizado(Exception):
+    """El catálogo apunta a un batch que ya no existe o que se reescribió"""
+
+
+class CatalogoCorpus:
+    """Catálogo de ubicaciones: sentencia → (batch, rango en bytes) con índices de búsqueda"""
+
+    def __init__(self, ruta=CATALOGO_DEFAULT, tamano_cache=TAMANO_CACHE):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.local = threading.local()
+        self.crear_esquema()
+        self.leer = lru_cache(maxsize=tamano_cache)(self._leer)
+
+    @property
+    def conn(self):
+        """Conexión por hilo (el servidor atiende cada request en un hilo)"""
+        if not hasattr(self.local, 'conn'):
+            self.local.conn = sqlite3.connect(self.ruta)
+            self.local.conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn.execute("PRAGMA synchronous=NORMAL")
+        return self.local.conn
+
+    def crear_esquema(self):
+        """Crear tablas si no existen"""
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ubicaciones (
+                id TEXT PRIMARY KEY,
+                version INTEGER,
+                tribunal TEXT,
+                fecha TEXT,
+                rol TEXT,
+                ruc TEXT,
+                ruta TEXT NOT NULL,
+                inicio INTEGER NOT NULL,
+                largo INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_ubicaciones_rol ON ubicaciones(rol);
+            CREATE INDEX IF NOT EXISTS idx_ubicaciones_ruc ON ubicaciones(ruc);
+            CREATE INDEX IF NOT EXISTS idx_ubicaciones_tribunal_fecha ON ubicaciones(tribunal, fecha);
+            CREATE INDEX IF NOT EXISTS idx_ubicaciones_fecha ON ubicaciones(fecha);
+            CREATE INDEX IF NOT EXISTS idx_ubicaciones_ruta ON ubicaciones(ruta);
+
+            CREATE TABLE IF NOT EXISTS materias (
+                id TEXT NOT NULL,
+                materia TEXT NOT NULL COLLATE NOCASE
+            );
+            CREATE INDEX IF NOT EXISTS idx_materias ON materias(materia, id);
+            CREATE INDEX IF NOT EXISTS idx_materias_id ON materias(id);
+
+            CREATE TABLE IF NOT EXISTS batches_catalogados (
+                ruta TEXT PRIMARY KEY,
+                firma TEXT
+            );
+        """)
+
+    def actualizar(self, directorio):
+        """Catalogar los batches nuevos o modificados de un directorio"""
+        catalogados = dict(self.conn.execute("SELECT ruta, firma FROM batches_catalogados"))
+        total_batches = 0
+        total_sentencias = 0
+
+        rutas = listar_batches(directorio)
+        for ruta_batch in rutas:
+            firma = firma_archivo(ruta_batch)
+            if catalogados.get(str(ruta_batch)) == firma:
+                continue
+
+            tribunal = tribunal_de_batch(ruta_batch)
+            with self.conn:
+                # Las ubicaciones anteriores del batch dejan de ser válidas
+                self.conn.execute(
+                    "DELETE FROM materias WHERE id IN (SELECT id FROM ubicaciones WHERE ruta = ?)",
+                    (str(ruta_batch),)
+                )
+                self.conn.execute("DELETE FROM ubicaciones WHERE ruta = ?", (str(ruta_batch),))
+
+                for inicio, largo, sentencia in registros_batch(ruta_batch):
+                    id_sentencia = str(sentencia.get('id') or '')
+                    if not id_sentencia:
+                        continue
+                    self.conn.execute("DELETE FROM materias WHERE id = ?", (id_sentencia,))
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO ubicaciones (id, version, tribunal, fecha, rol, ruc, ruta, inicio, largo) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (id_sentencia, sentencia.get('_version_'), tribunal, fecha_sentencia(sentencia),
+                         sentencia.get('rol_era_sup_s'), sentencia.get('sent__RUC_s'),
+                         str(ruta_batch), inicio, largo)
+                    )
+                    self.conn.executemany(
+                        "INSERT INTO materias (id, materia) VALUES (?, ?)",
+                        [(id_sentencia, materia) for materia in materias_de(sentencia)]
+                    )
+                    total_sentencias += 1
+
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO batches_catalogados (ruta, firma) VALUES (?, ?)",
+                    (str(ruta_batch), firma)
+                )
+
+            total_batches += 1
+
+        # Batches que ya no están en el disco: sus ubicaciones no se pueden leer
+        presentes = {str(ruta) for ruta in rutas}
+        with self.conn:
+            for ruta in set(catalogados) - presentes:
+                self.conn.execute(
+                    "DELETE FROM materias WHERE id IN (SELECT id FROM ubicaciones WHERE ruta = ?)", (ruta,)
+                )
+                self.conn.execute("DELETE FROM ubicaciones WHERE ruta = ?", (ruta,))
+                self.conn.execute("DELETE FROM batches_catalogados WHERE ruta = ?", (ruta,))
+
+        return total_batches, total_sentencias
+
+    def _registro(self, id_sentencia, ruta, inicio, largo):
+        """Leer una sentencia de su batch; CatalogoDesactualizado si la ubicación ya no vale
+
+        Un batch borrado da OSError; uno reescrito deja el rango apuntando a
+        otros bytes (JSON inválido u otra sentencia).
+        """
+        try:
+            sentencia = leer_registro(ruta, inicio, largo)
+        except (OSError, ValueError) as e:
+            raise CatalogoDesactualizado(f"No se pudo leer la sentencia {id_sentencia} de {ruta}: {e}") from e
+        if str(sentencia.get('id')) != id_sentencia:
+            raise CatalogoDesactualizado(f"{ruta} cambió desde que se catalogó (se esperaba la sentencia {id_sentencia})")
+        return sentencia
+
+    def _leer(self, id_sentencia, ruta, inicio, largo, version):
+        """Sentencia completa desde su ubicación (la versión forma parte de la clave de caché)"""
+        return self._registro(id_sentencia, ruta, inicio, largo)
+
+    def _sentencias(self, filas):
+        """Sentencias completas de filas (id, ruta, inicio, largo, version)"""
+        return [self.leer(*fila) for fila in filas]
+
+    def por_id(self, id_sentencia):
+        """Sentencia por id (o None)"""
+        fila = self.conn.execute(
+            "SELECT id, ruta, inicio, largo, version FROM ubicaciones WHERE id = ?", (str(id_sentencia),)
+        ).fetchone()
+        return self.leer(*fila) if fila else None
+
+    def por_rol(self, rol):
+        """Sentencias con un rol_era_sup_s"""
+        return self._sentencias(self.conn.execute(
+            "SELECT id, ruta, inicio, largo, version FROM ubicaciones WHERE rol = ? ORDER BY fecha", (rol,)
+        ))
+
+    def por_ruc(self, ruc):
+        """Sentencias con un sent__RUC_s"""
+        return self._sentencias(self.conn.execute(
+            "SELECT id, ruta, inicio, largo, version FROM ubicaciones WHERE ruc = ? ORDER BY fecha", (ruc,)
+        ))
+
+    def listar(self, tribunal=None, desde=None, hasta=None, materia=None, limite=LIMITE_LISTADO, offset=0):
+        """Generar sentencias filtradas, ordenadas por fecha (sin cargarlas todas)"""
+        sql = "SELECT u.id, u.ruta, u.inicio, u.largo FROM ubicaciones u"
+        condiciones = []
+        parametros = []
+
+        if materia:
+            sql += " JOIN materias m ON m.id = u.id"
+            condiciones.append("m.materia = ?")
+            parametros.append(materia)
+        if tribunal:
+            condiciones.append("u.tribunal = ?")
+            parametros.append(tribunal)
+        if desde:
+            condiciones.append("u.fecha >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("u.fecha <= ?")
+            parametros.append(hasta)
+
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        sql += " ORDER BY u.fecha, u.id LIMIT ? OFFSET ?"
+        parametros.extend([limite, offset])
+
+        # Las sentencias de un listado se leen sin pasar por la caché de lookups
+        for id_sentencia, ruta, inicio, largo in self.conn.execute(sql, parametros):
+            yield self._registro(id_sentencia, ruta, inicio, largo)
+
+    def contar(self, tribunal, desde, hasta):
+        """Sentencias catalogadas de un tribunal entre dos fechas (inclusive)"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM ubicaciones WHERE tribunal = ? AND fecha BETWEEN ? AND ?",
+            (tribunal, desde, hasta)
+        ).fetchone()[0]
+
+    def estadisticas(self):
+        """Tamaño del catálogo y estado de la caché"""
+        info = self.leer.cache_info()
+        return {
+            "sentencias": self.conn.execute("SELECT COUNT(*) FROM ubicaciones").fetchone()[0],
+            "batches": self.conn.execute("SELECT COUNT(*) FROM batches_catalogados").fetchone()[0],
+            "por_tribunal": dict(self.conn.execute(
+                "SELECT tribunal, COUNT(*) FROM ubicaciones GROUP BY tribunal"
+            )),
+            "cache": {"aciertos": info.hits, "fallos": info.misses, "tamano": info.currsize, "maximo": info.maxsize}
+        }
+
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    """Rutas:
+    GET /sentencias/<id>
+    GET /rol/<rol_era_sup_s>
+    GET /ruc/<sent__RUC_s>
+    GET /sentencias?tribunal=&desde=&hasta=&materia=&limite=&offset=   (NDJSON)
+    GET /estadisticas
+    """
+
+    catalogo = None
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Cabeceras y cuerpo van en escrituras separadas
+
+    def log_message(self, formato, *args):
+        """Silenciar el log por request (cientos por segundo)"""
+
+    def responder_json(self, estado, datos):
+        """Respuesta JSON con Content-Length (mantiene la conexión abierta)"""
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def escribir_chunk(self, datos):
+        """Escribir una línea NDJSON como chunk"""
+        linea = json.dumps(datos, ensure_ascii=False).encode('utf-8') + b"\n"
+        self.wfile.write(f"{len(linea):X}\r\n".encode('ascii') + linea + b"\r\n")
+
+    def responder_ndjson(self, sentencias):
+        """Respuesta NDJSON en chunks: una sentencia por línea a medida que se lee
+
+        La primera sentencia se lee antes de enviar las cabeceras, así un error
+        temprano todavía recibe su código de estado (400 o 500). Una vez iniciado el cuerpo,
+        un error se informa como última línea {"error": ...} y el stream se
+        cierra con el chunk final, sin escribir otra línea de estado.
+        """
+        sentencias = iter(sentencias)
+        primera = next(sentencias, None)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            if primera is not None:
+                self.escribir_chunk(primera)
+            for sentencia in sentencias:
+                self.escribir_chunk(sentencia)
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            self.escribir_chunk({"error": str(e)})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        """Atender consultas de lectura"""
+        url = urlsplit(self.path)
+        partes = [unquote(p) for p in url.path.strip('/').split('/') if p]
+        consulta = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        try:
+            if partes == ['sentencias']:
+                self.responder_ndjson(self.catalogo.listar(
+                    tribunal=consulta.get('tribunal'),
+                    desde=consulta.get('desde'),
+                    hasta=consulta.get('hasta'),
+                    materia=consulta.get('materia'),
+                    limite=int(consulta.get('limite', LIMITE_LISTADO)),
+                    offset=int(consulta.get('offset', 0))
+                ))
+            elif len(partes) == 2 and partes[0] == 'sentencias':
+                sentencia = self.catalogo.por_id(partes[1])
+                if sentencia is None:
+                    self.responder_json(404, {"error": f"Sentencia {partes[1]} no encontrada"})
+                else:
+                    self.responder_json(200, sentencia)
+            elif len(partes) == 2 and partes[0] == 'rol':
+                self.responder_json(200, self.catalogo.por_rol(partes[1]))
+            elif len(partes) == 2 and partes[0] == 'ruc':
+                self.responder_json(200, self.catalogo.por_ruc(partes[1]))
+            elif partes == ['estadisticas']:
+                self.responder_json(200, self.catalogo.estadisticas())
+            else:
+                self.responder_json(404, {"error": "Ruta no encontrada"})
+        except CatalogoDesactualizado as e:
+            self.responder_json(500, {"error": f"{e}; vuelva a iniciar la API para actualizar el catálogo"})
+        except ValueError as e:
+            # Parámetros inválidos (limite, offset)
+            self.responder_json(400, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except (OSError, sqlite3.Error) as e:
+            self.responder_json(500, {"error": f"Error interno: {e}"})
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+
+    if len(args) < 1:
+        print("Uso: python api_corpus.py DIRECTORIO_BATCHES [--puerto=8765] [--catalogo=RUTA] [--cache=N]")
+        print("Ejemplo: python api_corpus.py output/universo_completo")
+        print("         curl localhost:8765/rol/C-2902-2023")
+        sys.exit(1)
+
+    print("🌐 API LOCAL DEL CORPUS")
+    print("=" * 60)
+
+    catalogo = CatalogoCorpus(
+        opciones.get('catalogo', CATALOGO_DEFAULT),
+        tamano_cache=int(opciones.get('cache', TAMANO_CACHE))
+    )
+    total_batches, total_sentencias = catalogo.actualizar(args[0])
+    print(f"📦 Batches catalogados: {total_batches} nuevos ({total_sentencias:,} sentencias)")
+    print(f"📊 Sentencias en catálogo: {catalogo.estadisticas()['sentencias']:,}")
+
+    ManejadorAPI.catalogo = catalogo
+    puerto = int(opciones.get('puerto', PUERTO_DEFAULT))
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), ManejadorAPI)
+    servidor.daemon_threads = True
+    print(f"🚀 Escuchando en http://127.0.0.1:{puerto}")
+
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ Servidor detenido")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
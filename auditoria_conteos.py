@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Auditoría de completitud del corpus por conteos
+Compara el total informado por juris.pjud.cl (consultas de una fila) con lo
+descargado localmente por tribunal y ventana de fechas, parte en dos las
+ventanas que no cuadran hasta llegar al día, y encola solo esas ventanas
+para volver a descargarlas
+"""
+
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, date, timedelta
+from pathlib import Path
+
+from api_corpus import CatalogoCorpus
+from descargar_sentencias_api import DescargadorSentencias, SalidaPorDia
+
+AUDITORIA_DEFAULT = "output/auditoria"
+WORKERS_DEFAULT = 4
+PAUSA_CONSULTA = 0.5           # Segundos entre consultas de un mismo worker
+
+
+def ventanas_mensuales(desde, hasta):
+    """Dividir [desde, hasta] en ventanas por mes calendario"""
+    ventanas = []
+    inicio = desde
+    while inicio <= hasta:
+        siguiente_mes = (inicio.replace(day=1) + timedelta(days=32)).replace(day=1)
+        fin = min(siguiente_mes - timedelta(days=1), hasta)
+        ventanas.append((inicio, fin))
+        inicio = fin + timedelta(days=1)
+    return ventanas
+
+
+class AuditorConteos:
+    """Conteos remotos concurrentes contra el catálogo local, con bisección de diferencias"""
+
+    def __init__(self, directorio_corpus, directorio=AUDITORIA_DEFAULT, workers=WORKERS_DEFAULT):
+        self.directorio_corpus = Path(directorio_corpus)
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.cola_file = self.directorio / "cola_redescarga.json"
+        self.workers = workers
+        self.catalogo = CatalogoCorpus(self.directorio / "catalogo.sqlite")
+        self.local = threading.local()
+        self.consultas = 0
+        self.lock = threading.Lock()
+
+    def _descargador(self):
+        """Descargador y token propios de cada worker (la sesión no se comparte entre hilos)"""
+        if not hasattr(self.local, 'descargador'):
+            self.local.descargador = DescargadorSentencias()
+            self.local.token = self.local.descargador.obtener_token()
+        return self.local.descargador, self.local.token
+
+    def conteo_remoto(self, tribunal, desde, hasta):
+        """Total informado por el buscador para una ventana (o None si falla)"""
+        descargador, token = self._descargador()
+        if not token:
+            return None
+        try:
+            total = descargador.contar_sentencias(token, tribunal, desde.isoformat(), hasta.isoformat())
+        except Exception as e:
+            print(f"   ⚠️ {tribunal} {desde} a {hasta}: {e}")
+            total = None
+        finally:
+            with self.lock:
+                self.consultas += 1
+            time.sleep(PAUSA_CONSULTA)
+        return total
+
+    def auditar(self, desde, hasta, tribunales):
+        """Ventanas mínimas (día) cuyo conteo local no coincide con el remoto"""
+        self.catalogo.actualizar(self.directorio_corpus)
+        diferencias = []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pendientes = {}
+
+            def encolar(tribunal, inicio, fin):
+                futuro = executor.submit(self.conteo_remoto, tribunal, inicio, fin)
+                pendientes[futuro] = (tribunal, inicio, fin)
+
+            for tribunal in tribunales:
+                for inicio, fin in ventanas_mensuales(desde, hasta):
+                    encolar(tribunal, inicio, fin)
+
+            while pendientes:
+                listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    tribunal, inicio, fin = pendientes.pop(futuro)
+                    remoto = futuro.result()
+                    local = self.catalogo.contar(tribunal, inicio.isoformat(), fin.isoformat())
+
+                    if remoto is not None and remoto == local:
+                        continue
+
+                    dias = (fin - inicio).days + 1
+                    if remoto is not None and dias > 1:
+                        # Bisección: solo se sigue bajando por la mitad que no cuadra
+                        medio = inicio + timedelta(days=dias // 2 - 1)
+                        encolar(tribunal, inicio, medio)
+                        encolar(tribunal, medio + timedelta(days=1), fin)
+                        continue
+
+                    diferencias.append({
+                        "tribunal": tribunal,
+                        "desde": inicio.isoformat(),
+                        "hasta": fin.isoformat(),
+                        "remoto": remoto,
+                        "local": local,
+                    })
+                    estado = "sin respuesta" if remoto is None else f"remoto {remoto} / local {local}"
+                    print(f"   ❗ {tribunal} {inicio} a {fin}: {estado}")
+
+        diferencias.sort(key=lambda d: (d["tribunal"], d["desde"]))
+        return diferencias
+
+    def cargar_cola(self):
+        """Ventanas pendientes de volver a descargar"""
+        if self.cola_file.exists():
+            with open(self.cola_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("ventanas", [])
+        return []
+
+    def guardar_cola(self, ventanas):
+        """Guardar la cola de redescarga (escritura atómica)"""
+        tmp = self.cola_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"actualizada": datetime.now().isoformat(), "ventanas": ventanas},
+                      f, ensure_ascii=False, indent=2)
+        tmp.replace(self.cola_file)
+
+    def encolar(self, diferencias):
+        """Agregar a la cola las ventanas con faltantes (o sin respuesta) que no estén ya"""
+        cola = self.cargar_cola()
+        existentes = {(v["tribunal"], v["desde"], v["hasta"]) for v in cola}
+        for diferencia in diferencias:
+            faltan = diferencia["remoto"] is None or diferencia["remoto"] > diferencia["local"]
+            clave = (diferencia["tribunal"], diferencia["desde"], diferencia["hasta"])
+            if faltan and clave not in existentes:
+                cola.append(diferencia)
+                existentes.add(clave)
+        self.guardar_cola(cola)
+        return cola
+
+    def redescargar(self):
+        """Volver a descargar las ventanas de la cola y sacarlas de la cola
+
+        Se escriben con SalidaPorDia, como la descarga por fechas: cada día
+        descargado reemplaza su sentencias_YYYYMMDD.json en el corpus en vez
+        de agregar otro archivo con las mismas sentencias, que el export
+        Parquet, el índice FTS, las facetas y MinHash contarían dos veces.
+        """
+        cola = self.cargar_cola()
+        descargador = DescargadorSentencias()
+        tribunales = dict(descargador.tribunales)
+
+        while cola:
+            ventana = cola[0]
+            tribunal = ventana["tribunal"]
+            descargador.tribunales = {tribunal: tribunales[tribunal]}
+
+            # Versiones anteriores escribían batch_redescarga_* junto a los archivos por día
+            for anterior in (self.directorio_corpus / tribunal).glob(
+                    f"batch_redescarga_{ventana['desde']}_{ventana['hasta']}_*.json"):
+                anterior.unlink()
+
+            salida = SalidaPorDia(
+                self.directorio_corpus, ventana["desde"], ventana["hasta"],
+                self.directorio / f"redescarga_{tribunal}_{ventana['desde']}_{ventana['hasta']}.json"
+            )
+            try:
+                for _, docs, num_found in descargador.iterar_paginas(ventana["desde"], ventana["hasta"]):
+                    salida.agregar(tribunal, tribunales[tribunal]['descripcion'], docs, num_found)
+            finally:
+                salida.cerrar()
+
+            print(f"   ✅ {tribunal} {ventana['desde']} a {ventana['hasta']}: "
+                  f"{salida.resumen['total_sentencias']} sentencias en {len(salida.archivos)} archivos")
+            cola.pop(0)
+            self.guardar_cola(cola)
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+
+    if len(args) < 3:
+        print("Uso: python auditoria_conteos.py DIRECTORIO_CORPUS FECHA_DESDE FECHA_HASTA "
+              "[--tribunal=X] [--workers=N] [--auditoria=DIR] [--redescargar]")
+        print("Ejemplo: python auditoria_conteos.py output/descarga_api 2024-01-01 2024-12-31 --redescargar")
+        sys.exit(1)
+
+    try:
+        desde = date.fromisoformat(args[1])
+        hasta = date.fromisoformat(args[2])
+    except ValueError:
+        print("❌ Error: Las fechas deben estar en formato YYYY-MM-DD")
+        sys.exit(1)
+
+    auditor = AuditorConteos(
+        args[0],
+        opciones.get('auditoria', AUDITORIA_DEFAULT),
+        workers=int(opciones.get('workers', WORKERS_DEFAULT))
+    )
+    tribunales = [opciones['tribunal']] if 'tribunal' in opciones else list(DescargadorSentencias().tribunales)
+
+    print("🧮 AUDITORÍA DE CONTEOS DEL CORPUS")
+    print(f"📅 {desde} a {hasta} | 🏛️ {len(tribunales)} tribunales | 👷 {auditor.workers} workers")
+    print("=" * 60)
+
+    inicio = time.time()
+    diferencias = auditor.auditar(desde, hasta, tribunales)
+    cola = auditor.encolar(diferencias)
+
+    print(f"\n✅ Auditoría completada en {time.time() - inicio:.0f}s")
+    print(f"📡 Consultas de conteo: {auditor.consultas:,}")
+    print(f"❗ Días con diferencias: {len(diferencias)}")
+    print(f"📋 Ventanas en cola de redescarga: {len(cola)} ({auditor.cola_file})")
+
+    if '--redescargar' in sys.argv and cola:
+        print("\n📥 REDESCARGANDO VENTANAS CON FALTANTES")
+        print("=" * 60)
+        auditor.redescargar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Backfill de sentencias por día con calendario de completitud
+Divide un rango de fechas en ventanas por tribunal, las descarga con un
+pool de workers bajo un presupuesto común de solicitudes y registra en un
+calendario persistente los días completos. Cada corrida planifica solo los
+días que faltan, así los días perdidos por ejecuciones fallidas se
+completan solos y ponerse al día con un año es un único comando reanudable
+"""
+
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, date, timedelta
+from pathlib import Path
+
+from descargar_sentencias_api import DescargadorSentencias, LimitadorSolicitudes
+
+SALIDA_DEFAULT = "output/descarga_api"
+CALENDARIO_DEFAULT = "output/descarga_api/calendario_descarga.json"
+WORKERS_DEFAULT = 3
+SOLICITUDES_POR_SEGUNDO = 2.0   # Presupuesto compartido por todos los workers
+DIAS_POR_TAREA = 7              # Tamaño inicial de las ventanas
+MAX_SENTENCIAS_TAREA = 2000     # Ventanas con más sentencias se parten en dos
+
+
+def rango_dias(desde, hasta):
+    """Días de [desde, hasta]"""
+    return [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+
+def agrupar_ventanas(dias, max_dias):
+    """Agrupar días ordenados en ventanas de días consecutivos de hasta max_dias"""
+    ventanas = []
+    for dia in dias:
+        if ventanas and dia - ventanas[-1][1] == timedelta(days=1) \
+                and (dia - ventanas[-1][0]).days < max_dias:
+            ventanas[-1][1] = dia
+        else:
+            ventanas.append([dia, dia])
+    return [tuple(ventana) for ventana in ventanas]
+
+
+class CalendarioDescarga:
+    """Días completos por tribunal, con la cantidad de sentencias de cada uno"""
+
+    def __init__(self, ruta=CALENDARIO_DEFAULT):
+        self.ruta = Path(ruta)
+        self.tribunales = {}
+        if self.ruta.exists():
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                self.tribunales = json.load(f).get("tribunales", {})
+
+    def guardar(self):
+        """Guardar el calendario (escritura atómica)"""
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.ruta.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                "actualizado": datetime.now().isoformat(),
+                "tribunales": {
+                    tribunal: dict(sorted(dias.items())) for tribunal, dias in sorted(self.tribunales.items())
+                }
+            }, f, ensure_ascii=False, indent=2)
+        tmp.replace(self.ruta)
+
+    def completo(self, tribunal, dia):
+        """¿Está el día completo para el tribunal?"""
+        return dia.isoformat() in self.tribunales.get(tribunal, {})
+
+    def pendientes(self, tribunal, desde, hasta):
+        """Días del rango que faltan para el tribunal"""
+        return [dia for dia in rango_dias(desde, hasta) if not self.completo(tribunal, dia)]
+
+    def marcar(self, tribunal, desde, hasta, por_dia):
+        """Marcar como completos los días de una ventana descargada"""
+        dias = self.tribunales.setdefault(tribunal, {})
+        for dia in rango_dias(desde, hasta):
+            dias[dia.isoformat()] = por_dia.get(dia.isoformat(), 0)
+
+    def primer_dia(self):
+        """Día más antiguo registrado (o None)"""
+        dias = [min(por_dia) for por_dia in self.tribunales.values() if por_dia]
+        return date.fromisoformat(min(dias)) if dias else None
+
+
+class PlanificadorBackfill:
+    """Pool de workers que descarga las ventanas pendientes del calendario"""
+
+    def __init__(self, salida=SALIDA_DEFAULT, calendario=CALENDARIO_DEFAULT, workers=WORKERS_DEFAULT,
+                 por_segundo=SOLICITUDES_POR_SEGUNDO, dias_por_tarea=DIAS_POR_TAREA):
+        self.salida = Path(salida)
+        self.calendario = CalendarioDescarga(calendario)
+        self.workers = workers
+        self.dias_por_tarea = dias_por_tarea
+        self.limitador = LimitadorSolicitudes(por_segundo)
+        self.tribunales = DescargadorSentencias().tribunales
+        self.local = threading.local()
+
+    def _descargador(self, tribunal):
+        """Descargador propio de cada worker, limitado a un tribunal y al presupuesto común"""
+        if not hasattr(self.local, 'descargador'):
+            self.local.descargador = DescargadorSentencias()
+            self.local.descargador.limitador = self.limitador
+        self.local.descargador.tribunales = {tribunal: self.tribunales[tribunal]}
+        return self.local.descargador
+
+    def ejecutar_tarea(self, tribunal, desde, hasta):
+        """Descargar una ventana de un tribunal
+
+        Devuelve ('completa', sentencias por día), ('dividir', total) si la
+        ventana es demasiado grande, o ('error', motivo).
+        """
+        descargador = self._descargador(tribunal)
+        token = descargador.obtener_token()
+        if not token:
+            return 'error', "sin token"
+
+        total = descargador.contar_sentencias(token, tribunal, desde.isoformat(), hasta.isoformat())
+        if total is None:
+            return 'error', "sin respuesta al conteo"
+        if total > MAX_SENTENCIAS_TAREA and desde < hasta:
+            return 'dividir', total
+        if total == 0:
+            return 'completa', {}
+
+        resumen = descargador.descargar_sentencias_fecha(
+            desde.isoformat(), hasta.isoformat(), self.salida,
+            resumen_file=self.salida / tribunal / f"resumen_{desde:%Y%m%d}_{hasta:%Y%m%d}.json",
+            token=token  # El del conteo: no pedir otro
+        )
+        info = resumen['por_tribunal'].get(tribunal)
+        if not info or info['descargadas'] < info['total']:
+            descargadas = info['descargadas'] if info else 0
+            return 'error', f"incompleta ({descargadas} de {info['total'] if info else total})"
+
+        por_dia = {dia: conteo.get(tribunal, 0) for dia, conteo in resumen['por_dia'].items()}
+        return 'completa', por_dia
+
+    def ejecutar(self, desde, hasta, tribunales):
+        """Descargar todos los días pendientes del rango; devuelve estadísticas de la corrida"""
+        estadisticas = {"ventanas": 0, "dias": 0, "sentencias": 0, "fallos": []}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pendientes = {}
+
+            def encolar(tribunal, inicio, fin):
+                futuro = executor.submit(self.ejecutar_tarea, tribunal, inicio, fin)
+                pendientes[futuro] = (tribunal, inicio, fin)
+
+            for tribunal in tribunales:
+                dias = self.calendario.pendientes(tribunal, desde, hasta)
+                for inicio, fin in agrupar_ventanas(dias, self.dias_por_tarea):
+                    encolar(tribunal, inicio, fin)
+
+            while pendientes:
+                listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    tribunal, inicio, fin = pendientes.pop(futuro)
+                    try:
+                        resultado, detalle = futuro.result()
+                    except Exception as e:
+                        resultado, detalle = 'error', str(e)
+
+                    if resultado == 'dividir':
+                        # Ventana adaptativa: se parte hasta que cada mitad quepa en una tarea
+                        medio = inicio + timedelta(days=(fin - inicio).days // 2)
+                        encolar(tribunal, inicio, medio)
+                        encolar(tribunal, medio + timedelta(days=1), fin)
+                    elif resultado == 'completa':
+                        self.calendario.marcar(tribunal, inicio, fin, detalle)
+                        self.calendario.guardar()
+                        estadisticas["ventanas"] += 1
+                        estadisticas["dias"] += (fin - inicio).days + 1
+                        estadisticas["sentencias"] += sum(detalle.values())
+                        print(f"   ✅ {tribunal} {inicio} a {fin}: {sum(detalle.values())} sentencias")
+                    else:
+                        estadisticas["fallos"].append({
+                            "tribunal": tribunal,
+                            "desde": inicio.isoformat(),
+                            "hasta": fin.isoformat(),
+                            "motivo": detalle,
+                        })
+                        print(f"   ❌ {tribunal} {inicio} a {fin}: {detalle}")
+
+        return estadisticas
+
+    def cobertura(self, desde, hasta, tribunales):
+        """Días completos por tribunal dentro del rango"""
+        total_dias = (hasta - desde).days + 1
+        return {
+            tribunal: (total_dias - len(self.calendario.pendientes(tribunal, desde, hasta)), total_dias)
+            for tribunal in tribunales
+        }
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+
+    if '--help' in sys.argv:
+        print("Uso: python backfill_sentencias.py [FECHA_DESDE] [FECHA_HASTA] [--ultimos=N] [--tribunal=X] "
+              "[--workers=N] [--por-segundo=X] [--dias-por-tarea=N] [--salida=DIR] [--calendario=ARCHIVO]")
+        print("Ejemplo: python backfill_sentencias.py 2024-01-01 2024-12-31 --workers=4")
+        print("Sin fechas completa los huecos desde el primer día del calendario hasta ayer")
+        sys.exit(0)
+
+    try:
+        hasta = date.fromisoformat(args[1]) if len(args) > 1 else date.today() - timedelta(days=1)
+        if args:
+            desde = date.fromisoformat(args[0])
+        elif 'ultimos' in opciones:
+            desde = hasta - timedelta(days=int(opciones['ultimos']) - 1)
+        else:
+            desde = None
+    except ValueError:
+        print("❌ Error: Las fechas deben estar en formato YYYY-MM-DD")
+        sys.exit(1)
+
+    planificador = PlanificadorBackfill(
+        opciones.get('salida', SALIDA_DEFAULT),
+        opciones.get('calendario', CALENDARIO_DEFAULT),
+        workers=int(opciones.get('workers', WORKERS_DEFAULT)),
+        por_segundo=float(opciones.get('por-segundo', SOLICITUDES_POR_SEGUNDO)),
+        dias_por_tarea=int(opciones.get('dias-por-tarea', DIAS_POR_TAREA))
+    )
+    desde = desde or planificador.calendario.primer_dia() or hasta
+    tribunales = [opciones['tribunal']] if 'tribunal' in opciones else list(planificador.tribunales)
+
+    print("🗓️ BACKFILL DE SENTENCIAS")
+    print(f"📅 {desde} a {hasta} | 🏛️ {len(tribunales)} tribunales | 👷 {planificador.workers} workers "
+          f"| ⏱️ {1 / planificador.limitador.intervalo:g} solicitudes/s")
+    print("=" * 60)
+
+    inicio = time.time()
+    estadisticas = planificador.ejecutar(desde, hasta, tribunales)
+
+    print(f"\n✅ Backfill completado en {time.time() - inicio:.0f}s")
+    print(f"📦 Ventanas descargadas: {estadisticas['ventanas']} ({estadisticas['dias']} días-tribunal)")
+    print(f"📊 Sentencias: {estadisticas['sentencias']:,}")
+    print("\n📋 COBERTURA DEL CALENDARIO:")
+    for tribunal, (completos, total_dias) in planificador.cobertura(desde, hasta, tribunales).items():
+        print(f"   {tribunal}: {completos}/{total_dias} días")
+    print(f"💾 Calendario: {planificador.calendario.ruta}")
+
+    if estadisticas["fallos"]:
+        print(f"\n⚠️ Ventanas con error: {len(estadisticas['fallos'])} (se reintentan en la próxima corrida)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
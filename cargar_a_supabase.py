@@ -8,10 +8,44 @@ import sys
 import json
 import os
 from pathlib import Path
-from supabase import create_client, Client
+from manifiesto_ingesta import ManifiestoIngesta, MANIFIESTO_DEFAULT
+from trazas import tramo, etapa, activar_desde_argv
 
-def cargar_sentencias_a_supabase(archivo_sentencias, supabase_url, supabase_key):
-    """Cargar sentencias a Supabase"""
+def insertar_lote(supabase, lote, tabla='sentencias', actualizar=False):
+    """Insertar un lote de filas en la tabla destino
+
+    Con actualizar=True cada fila reemplaza a la cargada antes con su misma
+    url_acceso (update por clave, fila a fila: no requiere un índice único
+    sobre url_acceso en la tabla, como sí lo requeriría un upsert).
+    """
+    with tramo("upload", "red", filas=len(lote)):
+        if actualizar:
+            return [
+                supabase.table(tabla).update(fila).eq('url_acceso', fila['url_acceso']).execute()
+                for fila in lote
+            ]
+        return supabase.table(tabla).insert(lote).execute()
+
+def cargar_lote(supabase, lote, manifiesto=None, tabla='sentencias'):
+    """Enviar un lote ya filtrado: insert para filas nuevas, update para modificadas"""
+    if manifiesto is None:
+        return insertar_lote(supabase, lote, tabla)
+
+    # Solo se puede actualizar por clave una fila con url_acceso
+    modificadas = [fila for fila in lote if fila.get('url_acceso') and manifiesto.ya_registrada(fila)]
+    nuevas = [fila for fila in lote if not (fila.get('url_acceso') and manifiesto.ya_registrada(fila))]
+    if nuevas:
+        insertar_lote(supabase, nuevas, tabla)
+    if modificadas:
+        insertar_lote(supabase, modificadas, tabla, actualizar=True)
+
+def cargar_sentencias_a_supabase(archivo_sentencias, supabase_url, supabase_key,
+                                 ruta_manifiesto=MANIFIESTO_DEFAULT, reconciliar=False):
+    """Cargar sentencias a Supabase
+
+    Si se indica un manifiesto, solo se envían filas nuevas o modificadas
+    respecto de cargas anteriores. Con ruta_manifiesto=None se envía todo.
+    """
     
     # Validar archivo
     archivo_path = Path(archivo_sentencias)
@@ -21,10 +55,17 @@ def cargar_sentencias_a_supabase(archivo_sentencias, supabase_url, supabase_key)
     
     # Cargar sentencias
     print(f"📖 Cargando sentencias desde {archivo_sentencias}...")
-    with open(archivo_path, 'r', encoding='utf-8') as f:
-        sentencias = json.load(f)
+    with tramo("decode", "cpu", archivo=archivo_path.name):
+        with open(archivo_path, 'r', encoding='utf-8') as f:
+            sentencias = json.load(f)
+    
+    print(f"📊 Total de sentencias en archivo: {len(sentencias)}")
+    
+    manifiesto = ManifiestoIngesta(ruta_manifiesto) if ruta_manifiesto else None
     
-    print(f"📊 Total de sentencias a cargar: {len(sentencias)}")
+    if manifiesto and not reconciliar and manifiesto.archivo_ingerido(archivo_path):
+        print("⏭️ Archivo ya cargado previamente (mismo contenido) - nada que enviar")
+        return True
     
     if len(sentencias) == 0:
         print("⚠️ No hay sentencias para cargar")
@@ -33,11 +74,31 @@ def cargar_sentencias_a_supabase(archivo_sentencias, supabase_url, supabase_key)
     # Crear cliente Supabase
     print(f"🔌 Conectando a Supabase...")
     try:
+        from supabase import create_client, Client  # Importación diferida (arranque rápido del CLI)
         supabase: Client = create_client(supabase_url, supabase_key)
     except Exception as e:
         print(f"❌ Error conectando a Supabase: {e}")
         return False
     
+    if manifiesto:
+        if reconciliar:
+            print("🔎 Reconciliando manifiesto con la tabla destino...")
+            try:
+                faltantes = manifiesto.reconciliar(supabase)
+                print(f"   {len(faltantes)} filas del manifiesto no están en la tabla y se reenviarán")
+            except Exception as e:
+                print(f"⚠️ No se pudo reconciliar: {e}")
+        
+        total_archivo = len(sentencias)
+        sentencias = manifiesto.filtrar_pendientes(sentencias)
+        print(f"📒 Manifiesto: {total_archivo - len(sentencias)} ya cargadas, {len(sentencias)} nuevas o modificadas")
+        
+        if len(sentencias) == 0:
+            manifiesto.registrar_archivo(archivo_path, total_archivo)
+            manifiesto.guardar()
+            print("✅ Nada nuevo que cargar")
+            return True
+    
     # Cargar sentencias en lotes
     batch_size = 100
     total_cargadas = 0
@@ -50,16 +111,26 @@ def cargar_sentencias_a_supabase(archivo_sentencias, supabase_url, supabase_key)
         batch_num = (i // batch_size) + 1
         
         try:
-            # Insertar sentencias
-            response = supabase.table('sentencias').insert(batch).execute()
+            # Insertar sentencias nuevas y actualizar las modificadas
+            cargar_lote(supabase, batch, manifiesto)
             
             total_cargadas += len(batch)
+            if manifiesto:
+                manifiesto.registrar_filas(batch)
+                # Guardar progreso cada 10 lotes
+                if batch_num % 10 == 0:
+                    manifiesto.guardar()
             print(f"   ✅ Lote {batch_num}: {len(batch)} sentencias cargadas ({total_cargadas}/{len(sentencias)})")
             
         except Exception as e:
             total_errores += len(batch)
             print(f"   ❌ Lote {batch_num}: Error - {e}")
     
+    if manifiesto:
+        if total_errores == 0:
+            manifiesto.registrar_archivo(archivo_path, total_archivo)
+        manifiesto.guardar()
+    
     # Resumen
     print("\n" + "=" * 60)
     print("📊 RESUMEN DE CARGA")
@@ -76,19 +147,41 @@ def cargar_sentencias_a_supabase(archivo_sentencias, supabase_url, supabase_key)
 
 def main():
     """Función principal"""
-    if len(sys.argv) < 4:
-        print("Uso: python cargar_a_supabase.py ARCHIVO_SENTENCIAS SUPABASE_URL SUPABASE_KEY")
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = [a for a in sys.argv[1:] if a.startswith('--')]
+    
+    if len(args) < 3:
+        print("Uso: python cargar_a_supabase.py ARCHIVO_SENTENCIAS SUPABASE_URL SUPABASE_KEY [opciones]")
         print("Ejemplo: python cargar_a_supabase.py output/descarga_api/sentencias_para_supabase.json https://xxx.supabase.co xxxkey")
+        print("Opciones:")
+        print(f"  --manifiesto=RUTA   Manifiesto de ingesta (por defecto {MANIFIESTO_DEFAULT})")
+        print("  --sin-manifiesto    Enviar todas las filas sin consultar el manifiesto")
+        print("  --reconciliar       Verificar contra la tabla qué filas del manifiesto existen")
+        print("  --traza[=DIR]       Exportar tramos con tiempo como traza de Chrome (output/trazas)")
+        print("  --profile           Además, perfil cProfile y memoria (tracemalloc) de la etapa")
         sys.exit(1)
     
-    archivo_sentencias = sys.argv[1]
-    supabase_url = sys.argv[2]
-    supabase_key = sys.argv[3]
+    archivo_sentencias = args[0]
+    supabase_url = args[1]
+    supabase_key = args[2]
+    
+    ruta_manifiesto = MANIFIESTO_DEFAULT
+    for opcion in opciones:
+        if opcion.startswith('--manifiesto='):
+            ruta_manifiesto = opcion.split('=', 1)[1]
+    if '--sin-manifiesto' in opciones:
+        ruta_manifiesto = None
+    reconciliar = '--reconciliar' in opciones
     
     print("🚀 CARGA DE SENTENCIAS A SUPABASE")
     print("=" * 60)
     
-    exito = cargar_sentencias_a_supabase(archivo_sentencias, supabase_url, supabase_key)
+    activar_desde_argv()
+    with etapa("carga"):
+        exito = cargar_sentencias_a_supabase(
+            archivo_sentencias, supabase_url, supabase_key,
+            ruta_manifiesto=ruta_manifiesto, reconciliar=reconciliar
+        )
     
     if not exito:
         sys.exit(1)
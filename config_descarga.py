@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Configuración de la descarga del universo (config_descarga_5_dias.json)
+Carga y valida la configuración que usan DescargadorUniversoCompleto y
+Scheduler5Dias, y la vigila durante la corrida: al guardar el archivo con
+valores válidos se aplican en caliente ritmo, workers, tamaño de batch y
+horarios; si el archivo queda inválido se mantiene la configuración anterior
+"""
+
+import os
+import sys
+import json
+import threading
+from pathlib import Path
+
+CONFIG_DEFAULT = "config_descarga_5_dias.json"
+INTERVALO_VIGILANCIA = 5      # Segundos entre revisiones del archivo
+MAX_WORKERS = 32              # Tope de workers por tribunal que acepta la configuración
+MAX_PROCESOS = 64             # Tope de procesos de decodificación y escritura
+
+# (sección, clave): (tipos, mínimo, máximo)
+_NUMERICOS = {
+    ("descarga", "batch_size"): (int, 1, 1000),
+    ("descarga", "max_workers_por_tribunal"): (int, 1, MAX_WORKERS),
+    ("descarga", "procesos_escritura"): (int, 0, MAX_PROCESOS),
+    ("descarga", "cola_escritura"): (int, 1, 1000),
+    ("descarga", "rate_limit_delay"): ((int, float), 0, 60),
+    ("descarga", "max_retries"): (int, 0, 100),
+    ("descarga", "timeout"): ((int, float), 1, 600),
+    ("descarga", "duracion_dias"): ((int, float), 0.01, 365),
+    ("descarga", "total_estimado"): (int, 0, None),
+    ("horarios", "inicio_diario"): (int, 0, 23),
+    ("horarios", "fin_diario"): (int, 1, 24),
+    ("horarios", "pausa_entre_tribunales"): ((int, float), 0, None),
+    ("horarios", "pausa_por_error"): ((int, float), 0, None),
+    ("horarios", "pausa_ciclo"): ((int, float), 0, None),
+}
+
+_NUMERICOS_TRIBUNAL = {
+    "prioridad": (int, 1, 100),
+    "workers": (int, 1, MAX_WORKERS),
+    "total_estimado": (int, 0, None),
+}
+
+
+def _revisar_numero(nombre, valor, tipos, minimo, maximo):
+    """Problema con un valor numérico o None"""
+    if isinstance(valor, bool) or not isinstance(valor, tipos):
+        return f"{nombre}: debe ser numérico (es {valor!r})"
+    if minimo is not None and valor < minimo:
+        return f"{nombre}: mínimo {minimo} (es {valor})"
+    if maximo is not None and valor > maximo:
+        return f"{nombre}: máximo {maximo} (es {valor})"
+    return None
+
+
+def validar_config(config):
+    """Lista de problemas de una configuración (vacía si es válida)"""
+    if not isinstance(config, dict):
+        return ["la configuración debe ser un objeto JSON"]
+
+    problemas = []
+    for (seccion, clave), (tipos, minimo, maximo) in _NUMERICOS.items():
+        if clave not in config.get(seccion, {}):
+            problemas.append(f"{seccion}.{clave}: falta")
+            continue
+        problema = _revisar_numero(f"{seccion}.{clave}", config[seccion][clave], tipos, minimo, maximo)
+        if problema:
+            problemas.append(problema)
+
+    horarios = config.get("horarios", {})
+    if not isinstance(horarios.get("pausa_nocturna"), bool):
+        problemas.append("horarios.pausa_nocturna: debe ser true o false")
+    if not problemas and horarios["inicio_diario"] >= horarios["fin_diario"]:
+        problemas.append("horarios: inicio_diario debe ser menor que fin_diario")
+
+    tribunales = config.get("tribunales")
+    if not isinstance(tribunales, dict) or not tribunales:
+        problemas.append("tribunales: debe listar al menos un tribunal")
+        return problemas
+
+    for nombre, tribunal in tribunales.items():
+        for clave, (tipos, minimo, maximo) in _NUMERICOS_TRIBUNAL.items():
+            if not isinstance(tribunal, dict) or clave not in tribunal:
+                problemas.append(f"tribunales.{nombre}.{clave}: falta")
+                continue
+            problema = _revisar_numero(f"tribunales.{nombre}.{clave}", tribunal[clave], tipos, minimo, maximo)
+            if problema:
+                problemas.append(problema)
+
+    return problemas
+
+
+def cargar_config(ruta=CONFIG_DEFAULT):
+    """Leer y validar la configuración (ValueError con los problemas si es inválida)"""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        try:
+            config = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"{ruta}: JSON inválido ({e})")
+
+    problemas = validar_config(config)
+    if problemas:
+        raise ValueError(f"{ruta}: " + "; ".join(problemas))
+    return config
+
+
+def cambios_config(anterior, nueva):
+    """Claves que cambiaron entre dos configuraciones, como 'seccion.clave'"""
+    cambios = []
+    for seccion in ("descarga", "horarios"):
+        for clave in sorted(set(anterior.get(seccion, {})) | set(nueva.get(seccion, {}))):
+            if anterior.get(seccion, {}).get(clave) != nueva.get(seccion, {}).get(clave):
+                cambios.append(f"{seccion}.{clave}")
+    for nombre in sorted(set(anterior.get("tribunales", {})) | set(nueva.get("tribunales", {}))):
+        if anterior.get("tribunales", {}).get(nombre) != nueva.get("tribunales", {}).get(nombre):
+            cambios.append(f"tribunales.{nombre}")
+    return cambios
+
+
+class ConfigDescarga:
+    """Configuración validada y vigilada; avisa a los suscriptores cuando cambia"""
+
+    def __init__(self, ruta=CONFIG_DEFAULT):
+        self.ruta = Path(ruta)
+        self.lock = threading.Lock()
+        self.suscriptores = []
+        self.hilo = None
+        self.detener = threading.Event()
+        self.firma = self._firma()
+        self.datos = cargar_config(self.ruta)
+
+    def _firma(self):
+        try:
+            stat = os.stat(self.ruta)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def seccion(self, nombre):
+        """Copia de una sección ('descarga', 'horarios', 'tribunales')"""
+        with self.lock:
+            return dict(self.datos[nombre])
+
+    def al_cambiar(self, funcion):
+        """Registrar funcion(config) a llamar tras cada recarga válida"""
+        self.suscriptores.append(funcion)
+        return funcion
+
+    def recargar_si_cambio(self):
+        """Recargar si el archivo cambió; devuelve las claves cambiadas (o [])"""
+        firma = self._firma()
+        if firma is None or firma == self.firma:
+            return []
+        self.firma = firma
+
+        try:
+            nueva = cargar_config(self.ruta)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Configuración no aplicada, se mantiene la anterior: {e}")
+            return []
+
+        with self.lock:
+            cambios = cambios_config(self.datos, nueva)
+            self.datos = nueva
+        if cambios:
+            print(f"🔧 Configuración recargada: {', '.join(cambios)}")
+            for funcion in self.suscriptores:
+                funcion(self)
+        return cambios
+
+    def vigilar(self, intervalo=INTERVALO_VIGILANCIA):
+        """Revisar el archivo en segundo plano (una sola vez por instancia)"""
+        if self.hilo is None:
+            def revisar():
+                while not self.detener.wait(intervalo):
+                    self.recargar_si_cambio()
+
+            self.hilo = threading.Thread(target=revisar, name="config", daemon=True)
+            self.hilo.start()
+        return self.hilo
+
+    def dejar_de_vigilar(self):
+        """Detener la vigilancia"""
+        self.detener.set()
+
+
+def main():
+    """Función principal"""
+    ruta = sys.argv[1] if len(sys.argv) > 1 else CONFIG_DEFAULT
+    print(f"🔧 Validando {ruta}")
+    try:
+        config = cargar_config(ruta)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    descarga, horarios = config["descarga"], config["horarios"]
+    print("✅ Configuración válida")
+    print(f"   Batch: {descarga['batch_size']} | Pausa entre requests: {descarga['rate_limit_delay']}s "
+          f"| Máx. workers: {descarga['max_workers_por_tribunal']}")
+    print(f"   Escritura: {descarga['procesos_escritura'] or 'en los hilos de red'} procesos "
+          f"| Cola: {descarga['cola_escritura']} batches")
+    print(f"   Horario: {horarios['inicio_diario']}:00-{horarios['fin_diario']}:00 "
+          f"(pausa nocturna: {'sí' if horarios['pausa_nocturna'] else 'no'})")
+    for nombre, tribunal in sorted(config["tribunales"].items(), key=lambda x: x[1]["prioridad"]):
+        print(f"   {tribunal['prioridad']}. {nombre}: {tribunal['workers']} workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Canal de control de una descarga en curso
+El scheduler y la descarga del universo exponen en localhost un pequeño
+servidor HTTP para pausar, reanudar, drenar (terminar lo que está en curso
+y detenerse), cambiar la concurrencia global, priorizar un tribunal y ver
+una instantánea del estado, sin reiniciar ni perder los batches en vuelo.
+Desde otra terminal: python control_descarga.py pausar
+Cada solicitud lleva el token que el servidor deja en output/ (legible solo
+por el usuario que lanzó la descarga); las que traen Origin, es decir las
+que envía un navegador, se rechazan
+Ctrl+C y SIGTERM también drenan; una segunda señal corta sin esperar
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import signal
+import secrets
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from urllib.request import Request, urlopen
+from urllib.error import URLError, HTTPError
+from pathlib import Path
+
+PUERTO_CONTROL = 8766
+PLAZO_DRENADO = 60      # Segundos que se espera a los batches en vuelo al drenar
+DIRECTORIO_TOKEN = "output"
+CABECERA_TOKEN = "X-Token-Control"
+
+
+def archivo_token(puerto=PUERTO_CONTROL):
+    """Archivo con el token del canal de control de un puerto"""
+    return Path(DIRECTORIO_TOKEN) / f"control_{puerto}.token"
+
+
+def escribir_token(puerto=PUERTO_CONTROL):
+    """Generar un token nuevo y guardarlo con permisos 0600"""
+    token = secrets.token_urlsafe(32)
+    ruta = archivo_token(puerto)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w') as f:
+        os.fchmod(f.fileno(), 0o600)  # Por si el archivo ya existía con otros permisos
+        f.write(token)
+    return token
+
+
+def leer_token(puerto=PUERTO_CONTROL):
+    """Token del canal de control (None si no hay descarga que lo haya creado)"""
+    try:
+        return archivo_token(puerto).read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+class ControlDescarga:
+    """Estado de control compartido entre el servidor y los hilos de descarga"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.corriendo = threading.Event()
+        self.corriendo.set()
+        self.drenando = False
+        self.plazo = None              # Instante (monotonic) en que se deja de esperar lo en vuelo
+        self.limite_workers = None     # None: lo que diga la configuración
+        self.prioritario = None
+        self.tribunales = set()        # Tribunales que se pueden priorizar
+        self.fuentes = []              # Funciones que aportan datos a la instantánea
+        self.eventos = []
+
+    @property
+    def pausado(self):
+        return not self.corriendo.is_set()
+
+    def _registrar(self, accion):
+        with self.lock:
+            self.eventos = (self.eventos + [{"fecha": datetime.now().isoformat(), "accion": accion}])[-20:]
+        print(f"🎛️ Control: {accion}")
+
+    def pausar(self):
+        """No emitir nuevas solicitudes; las que están en curso terminan"""
+        self.corriendo.clear()
+        self._registrar("pausa")
+
+    def reanudar(self):
+        """Volver a emitir solicitudes"""
+        self.corriendo.set()
+        self._registrar("reanudación")
+
+    def drenar(self, plazo=PLAZO_DRENADO):
+        """Terminar lo que está en curso (hasta plazo segundos), guardar estado y detenerse"""
+        if self.plazo is None:
+            self.plazo = time.monotonic() + plazo
+        self.drenando = True
+        self.corriendo.set()  # Un hilo pausado debe despertar para salir
+        self._registrar(f"drenado (plazo {max(0, self.plazo - time.monotonic()):.0f}s)")
+    
+    def plazo_vencido(self):
+        """¿Se acabó el tiempo para esperar lo que está en vuelo?"""
+        return self.plazo is not None and time.monotonic() >= self.plazo
+    
+    def senal(self, signum, frame):
+        """Manejador de SIGINT/SIGTERM: la primera señal drena, la segunda corta de inmediato"""
+        if self.drenando:
+            raise KeyboardInterrupt
+        self.drenar()
+    
+    @contextmanager
+    def senales(self, manejador=None):
+        """Durante el bloque, Ctrl+C y SIGTERM drenan en vez de cortar"""
+        if threading.current_thread() is not threading.main_thread():
+            yield  # Solo el hilo principal puede instalar manejadores de señales
+            return
+        
+        senales = (signal.SIGINT, signal.SIGTERM)
+        previos = {s: signal.signal(s, manejador or self.senal) for s in senales}
+        try:
+            yield
+        finally:
+            for s, previo in previos.items():
+                signal.signal(s, previo)
+
+    def fijar_concurrencia(self, workers):
+        """Tope global de workers por tribunal (None vuelve a la configuración)"""
+        self.limite_workers = workers
+        self._registrar(f"concurrencia {workers if workers else 'según configuración'}")
+
+    def agregar_tribunales(self, nombres):
+        """Registrar tribunales conocidos (los únicos que se pueden priorizar)"""
+        self.tribunales.update(nombres)
+
+    def priorizar(self, tribunal):
+        """Tribunal a descargar a continuación (None quita la prioridad)"""
+        if tribunal is not None and tribunal not in self.tribunales:
+            raise ValueError(f"Tribunal desconocido: {tribunal}")
+        self.prioritario = tribunal
+        self._registrar(f"prioridad {tribunal or 'ninguna'}")
+
+    def esperar_reanudacion(self, timeout=None):
+        """Bloquear mientras esté en pausa; devuelve False si se pidió drenar"""
+        self.corriendo.wait(timeout)
+        return not self.drenando
+
+    def limitar(self, workers):
+        """Aplicar el tope global a una cantidad de workers"""
+        limite = self.limite_workers
+        return min(workers, limite) if limite else workers
+
+    def agregar_fuente(self, funcion):
+        """Registrar funcion() -> dict a incluir en la instantánea"""
+        self.fuentes.append(funcion)
+        return funcion
+
+    def instantanea(self):
+        """Estado de control más lo que aporten el scheduler y el descargador"""
+        with self.lock:
+            eventos = list(self.eventos)
+        datos = {
+            "fecha": datetime.now().isoformat(),
+            "control": {
+                "pausado": self.pausado,
+                "drenando": self.drenando,
+                "plazo_restante": round(max(0, self.plazo - time.monotonic()), 1) if self.plazo else None,
+                "limite_workers": self.limite_workers,
+                "prioritario": self.prioritario,
+                "eventos": eventos,
+            }
+        }
+        for fuente in self.fuentes:
+            datos.update(fuente())
+        return datos
+
+
+class ManejadorControl(BaseHTTPRequestHandler):
+    """Rutas (solo en 127.0.0.1, con la cabecera X-Token-Control):
+    GET  /estado
+    POST /pausar | /reanudar | /drenar
+    POST /concurrencia?workers=N        (0 vuelve a la configuración)
+    POST /priorizar?tribunal=X          (sin tribunal quita la prioridad)
+    """
+
+    control = None
+    token = None
+
+    def log_message(self, formato, *args):
+        """Silenciar el log por request (las acciones ya se registran en ControlDescarga)"""
+
+    def responder_json(self, estado, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def autorizado(self):
+        """Token correcto y sin Origin (responde 403 si no)"""
+        if self.headers.get("Origin") is not None:
+            self.responder_json(403, {"error": "Solicitudes desde navegador no permitidas"})
+            return False
+        recibido = self.headers.get(CABECERA_TOKEN, "")
+        if not self.token or not hmac.compare_digest(recibido.encode(), self.token.encode()):
+            self.responder_json(403, {"error": "Token de control inválido"})
+            return False
+        return True
+
+    def do_GET(self):
+        """Instantánea del estado"""
+        if not self.autorizado():
+            return
+        if urlsplit(self.path).path.rstrip('/') == '/estado':
+            self.responder_json(200, self.control.instantanea())
+        else:
+            self.responder_json(404, {"error": "Ruta no encontrada (GET /estado)"})
+
+    def do_POST(self):
+        """Acciones de control"""
+        if not self.autorizado():
+            return
+        url = urlsplit(self.path)
+        accion = url.path.strip('/')
+        consulta = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        try:
+            if accion == 'pausar':
+                self.control.pausar()
+            elif accion == 'reanudar':
+                self.control.reanudar()
+            elif accion == 'drenar':
+                self.control.drenar()
+            elif accion == 'concurrencia':
+                workers = int(consulta.get('workers', 0))
+                if workers < 0:
+                    raise ValueError("workers debe ser >= 0")
+                self.control.fijar_concurrencia(workers or None)
+            elif accion == 'priorizar':
+                self.control.priorizar(consulta.get('tribunal') or None)
+            else:
+                self.responder_json(404, {"error": f"Acción desconocida: {accion}"})
+                return
+        except ValueError as e:
+            self.responder_json(400, {"error": str(e)})
+            return
+
+        self.responder_json(200, self.control.instantanea()["control"])
+
+
+def iniciar_servidor(control, puerto=PUERTO_CONTROL):
+    """Servidor de control en un hilo de fondo (None si el puerto está ocupado)"""
+    manejador = type("ManejadorControlActivo", (ManejadorControl,), {"control": control})
+    try:
+        servidor = ThreadingHTTPServer(("127.0.0.1", puerto), manejador)
+    except OSError as e:
+        print(f"⚠️ Canal de control no disponible en el puerto {puerto}: {e}")
+        return None
+
+    # El token se escribe solo si el puerto es nuestro: no pisar el de otra descarga
+    manejador.token = escribir_token(puerto)
+
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="control", daemon=True).start()
+    print(f"🎛️ Canal de control en http://127.0.0.1:{puerto} (python control_descarga.py estado)")
+    return servidor
+
+
+def puerto_de_argumentos(argv=None):
+    """Puerto pedido con --control=PUERTO (o el predeterminado)"""
+    for arg in (sys.argv[1:] if argv is None else argv):
+        if arg.startswith('--control='):
+            return int(arg.split('=', 1)[1])
+    return PUERTO_CONTROL
+
+
+def enviar(accion, puerto=PUERTO_CONTROL, **parametros):
+    """Cliente: ejecutar una acción (o 'estado') contra una descarga en curso"""
+    consulta = "&".join(f"{clave}={valor}" for clave, valor in parametros.items() if valor is not None)
+    url = f"http://127.0.0.1:{puerto}/{accion}" + (f"?{consulta}" if consulta else "")
+    solicitud = Request(url, method='GET' if accion == 'estado' else 'POST',
+                        headers={CABECERA_TOKEN: leer_token(puerto) or ""})
+    with urlopen(solicitud, timeout=10) as respuesta:
+        return json.loads(respuesta.read())
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+    acciones = ('estado', 'pausar', 'reanudar', 'drenar', 'concurrencia', 'priorizar')
+
+    if not args or args[0] not in acciones or (args[0] == 'concurrencia' and len(args) < 2):
+        print("Uso: python control_descarga.py estado|pausar|reanudar|drenar [--puerto=8766]")
+        print("     python control_descarga.py concurrencia N      (0 vuelve a la configuración)")
+        print("     python control_descarga.py priorizar [TRIBUNAL]")
+        print("Ejemplo: python control_descarga.py concurrencia 1")
+        sys.exit(1)
+
+    puerto = int(opciones.get('puerto', PUERTO_CONTROL))
+    parametros = {}
+    if args[0] == 'concurrencia':
+        parametros['workers'] = args[1]
+    elif args[0] == 'priorizar' and len(args) > 1:
+        parametros['tribunal'] = args[1]
+
+    try:
+        respuesta = enviar(args[0], puerto, **parametros)
+    except HTTPError as e:
+        print(f"❌ {json.loads(e.read()).get('error', e)}")
+        sys.exit(1)
+    except URLError as e:
+        print(f"❌ No hay una descarga escuchando en el puerto {puerto}: {e.reason}")
+        sys.exit(1)
+
+    print(json.dumps(respuesta, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
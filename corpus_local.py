@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Lectura del corpus descargado en disco
+Recorre los batch_*.json por tribunal, tanto el formato con metadatos
+(descarga por fechas) como el formato lista (descarga del universo y
+archivos por día de la descarga por fechas)
+"""
+
+import json
+from pathlib import Path
+
+from delta_textos import expandir_sentencia
+
+# Campos con el texto completo de la sentencia (pesados)
+CAMPOS_TEXTO = (
+    'texto_sentencia',
+    'texto_sentencia_anon',
+    'texto_sentencia_preview',
+    'texto_sentencia_anon_preview',
+    'texto_setencia',
+    'TEXTO_ETIQUETADO_t',
+    'texto_etiquetado_t',
+)
+
+
+def listar_batches(directorio):
+    """Listar archivos batch_*.json (y sentencias_YYYYMMDD.json de la descarga por día) por tribunal"""
+    directorio = Path(directorio)
+    return sorted(list(directorio.glob("*/batch_*.json")) + list(directorio.glob("*/sentencias_*.json")))
+
+
+def tribunal_de_batch(ruta_batch):
+    """El tribunal es el nombre del directorio que contiene el batch"""
+    return Path(ruta_batch).parent.name
+
+
+def leer_batch(ruta_batch):
+    """Leer las sentencias de un batch en cualquiera de los dos formatos
+
+    Los textos guardados como delta (ver delta_textos) se reconstruyen al leer.
+    """
+    with open(ruta_batch, 'r', encoding='utf-8') as f:
+        contenido = json.load(f)
+
+    if isinstance(contenido, dict):
+        contenido = contenido.get('sentencias', [])
+    return [expandir_sentencia(sentencia) for sentencia in contenido]
+
+
+def registros_batch(ruta_batch):
+    """Ubicar cada sentencia dentro del archivo del batch
+
+    Devuelve tuplas (inicio, largo, sentencia) con el rango en bytes del
+    objeto JSON de cada sentencia, para luego leerla sola con leer_registro.
+    """
+    with open(ruta_batch, 'rb') as f:
+        datos = f.read()
+    texto = datos.decode('utf-8')
+
+    if texto.lstrip().startswith('{'):
+        posicion = texto.index('[', texto.index('"sentencias"')) + 1
+    else:
+        posicion = texto.index('[') + 1
+
+    decodificador = json.JSONDecoder()
+    registros = []
+    posicion_bytes = len(texto[:posicion].encode('utf-8'))
+
+    while True:
+        inicio = posicion
+        while texto[posicion] in ' \t\r\n,':
+            posicion += 1
+        posicion_bytes += posicion - inicio  # Separadores: siempre ASCII
+        if texto[posicion] == ']':
+            break
+
+        sentencia, fin = decodificador.raw_decode(texto, posicion)
+        largo = len(texto[posicion:fin].encode('utf-8'))
+        registros.append((posicion_bytes, largo, expandir_sentencia(sentencia)))
+        posicion_bytes += largo
+        posicion = fin
+
+    return registros
+
+
+def leer_registro(ruta_batch, inicio, largo):
+    """Leer una sola sentencia de un batch por su rango en bytes"""
+    with open(ruta_batch, 'rb') as f:
+        f.seek(inicio)
+        return expandir_sentencia(json.loads(f.read(largo)))
+
+
+def iterar_batches(directorio, excluir=None):
+    """Recorrer los batches de un directorio
+
+    Genera tuplas (tribunal, ruta_batch, sentencias). Las rutas incluidas en
+    `excluir` se saltan sin leerlas.
+    """
+    excluir = excluir or set()
+    for ruta_batch in listar_batches(directorio):
+        if str(ruta_batch) in excluir:
+            continue
+        yield tribunal_de_batch(ruta_batch), ruta_batch, leer_batch(ruta_batch)
+
+
+def firma_archivo(ruta):
+    """Firma barata de un archivo (tamaño y fecha de modificación)"""
+    stat = Path(ruta).stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def anio_sentencia(sentencia):
+    """Año de la sentencia según los campos disponibles"""
+    anio = sentencia.get('sent__FEC_ANIO_i') or sentencia.get('sent__fec_anio_i')
+    if anio:
+        return int(anio)
+
+    fecha = sentencia.get('fec_sentencia_sup_dt')
+    if fecha:
+        return int(fecha[:4])
+
+    return sentencia.get('era_sup_i')
+
+
+def fecha_sentencia(sentencia):
+    """Fecha de la sentencia en formato YYYY-MM-DD (o None)"""
+    fecha = sentencia.get('fec_sentencia_sup_dt')
+    if fecha:
+        return fecha[:10]
+
+    anio = sentencia.get('sent__FEC_ANIO_i') or sentencia.get('sent__fec_anio_i')
+    mes = sentencia.get('sent__FEC_MES_i') or sentencia.get('sent__fec_mes_i')
+    dia = sentencia.get('sent__FEC_DIA_i') or sentencia.get('sent__fec_dia_i')
+    if anio and mes and dia:
+        return f"{int(anio):04d}-{int(mes):02d}-{int(dia):02d}"
+
+    return None
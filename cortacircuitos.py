@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Cortacircuitos ante bloqueos del servidor
+Reconoce el patrón de un bloqueo de la IP (varios HTTP 419 o conexiones
+reiniciadas seguidas) y deja de enviar solicitudes en todos los hilos y
+procesos de la máquina. Mientras está abierto solo se envía una sonda, con
+intervalos crecientes; cuando una sonda responde bien se retoma con un ritmo
+reducido que sube por etapas. El estado queda en disco y sobrevive a los
+reinicios, así una descarga relanzada no vuelve a golpear al servidor
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from presupuesto_ip import archivo_bloqueado
+
+CORTACIRCUITOS_DEFAULT = str(Path(__file__).resolve().parent / "output" / "cortacircuitos.json")
+
+UMBRAL_BLOQUEO = 5                                  # Fallos de bloqueo seguidos que abren el circuito
+ESTADOS_BLOQUEO = (419, 429)                        # Respuestas que cuentan como bloqueo
+SONDEOS = (1800, 3600, 7200, 14400, 28800, 43200)   # Segundos hasta cada sonda (el último se repite)
+PLAZO_SONDA = 120                                   # Segundos que una sonda tiene reservado el circuito
+RAMPA = (30.0, 10.0, 3.0, 1.0)                      # Segundos entre solicitudes en cada etapa de recuperación
+EXITOS_POR_ETAPA = 20                               # Respuestas buenas para pasar a la etapa siguiente
+
+
+class CircuitoAbierto(Exception):
+    """El circuito no permite enviar la solicitud (no se envió nada)"""
+
+    def __init__(self, mensaje, hasta=None):
+        super().__init__(mensaje)
+        self.hasta = hasta
+
+
+class BloqueoDetectado(CircuitoAbierto):
+    """La respuesta tiene el patrón de un bloqueo (419 o conexión reiniciada)"""
+
+
+def es_reinicio(error):
+    """¿La excepción (o su causa) es una conexión reiniciada o cortada por el servidor?"""
+    while error is not None:
+        if isinstance(error, (ConnectionResetError, ConnectionAbortedError, BrokenPipeError)):
+            return True
+        texto = str(error)
+        if 'Connection reset' in texto or 'Connection aborted' in texto or 'RemoteDisconnected' in texto:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _hora(instante):
+    return datetime.fromtimestamp(instante).strftime('%Y-%m-%d %H:%M')
+
+
+class Cortacircuitos:
+    """Circuito compartido por todos los procesos (estado en un archivo con bloqueo)
+
+    Estados: 'cerrado' (normal), 'abierto' (bloqueado: nada sale hasta la
+    próxima sonda), 'sondeando' (una sola solicitud de prueba en vuelo) y
+    'recuperando' (ritmo reducido que sube por etapas hasta cerrar).
+    """
+
+    def __init__(self, ruta=CORTACIRCUITOS_DEFAULT):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.ruta_lock = self.ruta.with_suffix('.lock')
+        self.lock = threading.Lock()
+        self.local = threading.local()   # ¿La solicitud en curso de este hilo es la sonda?
+
+    def _bloqueado(self):
+        return archivo_bloqueado(self.ruta_lock, self.lock)
+
+    def _leer(self):
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            estado = {}
+        estado.setdefault("estado", "cerrado")
+        estado.setdefault("fallos_seguidos", 0)
+        return estado
+
+    def _escribir(self, estado):
+        estado["actualizado"] = datetime.now().isoformat()
+        tmp = self.ruta.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, indent=2)
+        tmp.replace(self.ruta)
+
+    def _abrir(self, estado, motivo, ahora):
+        """Pasar a abierto y programar la próxima sonda (intervalo creciente)"""
+        intento = estado.get("intento", -1) + 1 if estado["estado"] != "cerrado" else 0
+        espera = SONDEOS[min(intento, len(SONDEOS) - 1)]
+        estado.update({
+            "estado": "abierto",
+            "motivo": motivo,
+            "intento": intento,
+            "proxima_sonda": ahora + espera,
+            "fallos_seguidos": 0,
+        })
+        estado.setdefault("abierto_desde", datetime.fromtimestamp(ahora).isoformat())
+        estado.pop("sonda_hasta", None)
+        estado.pop("etapa", None)
+        print(f"🚫 Circuito abierto ({motivo}): sin solicitudes hasta la sonda de las "
+              f"{_hora(ahora + espera)}")
+
+    def consultar(self):
+        """Estado actual (sin modificarlo)"""
+        with self._bloqueado():
+            return self._leer()
+
+    def permite_envio(self):
+        """¿Tiene sentido lanzar trabajo ahora? (cerrado, recuperando o sonda pendiente)"""
+        estado = self.consultar()
+        if estado["estado"] == "abierto":
+            return time.time() >= estado["proxima_sonda"]
+        if estado["estado"] == "sondeando":
+            return time.time() >= estado["sonda_hasta"]   # La sonda anterior quedó colgada
+        return True
+
+    def normal(self):
+        """¿Está cerrado? (ritmo y concurrencia normales)"""
+        return self.consultar()["estado"] == "cerrado"
+
+    def antes(self):
+        """Pedir permiso para una solicitud; CircuitoAbierto si no se puede enviar
+
+        En recuperación reserva un turno espaciado según la etapa y duerme
+        hasta él.
+        """
+        self.local.sonda = False
+        espera = 0
+        with self._bloqueado():
+            estado = self._leer()
+            ahora = time.time()
+
+            if estado["estado"] == "sondeando" and ahora >= estado["sonda_hasta"]:
+                estado["estado"] = "abierto"   # La sonda no informó a tiempo: se puede enviar otra
+
+            if estado["estado"] == "abierto":
+                if ahora < estado["proxima_sonda"]:
+                    raise CircuitoAbierto(f"Circuito abierto hasta {_hora(estado['proxima_sonda'])}",
+                                          estado["proxima_sonda"])
+                estado["estado"] = "sondeando"
+                estado["sonda_hasta"] = ahora + PLAZO_SONDA
+                self._escribir(estado)
+                self.local.sonda = True
+                print(f"🔎 Sonda {estado.get('intento', 0) + 1} contra el servidor")
+                return
+
+            if estado["estado"] == "sondeando":
+                raise CircuitoAbierto("Sonda en curso", estado["sonda_hasta"])
+
+            if estado["estado"] == "recuperando":
+                turno = max(estado.get("proximo_turno", ahora), ahora)
+                estado["proximo_turno"] = turno + RAMPA[estado["etapa"]]
+                self._escribir(estado)
+                espera = turno - ahora
+
+        if espera > 0:
+            time.sleep(espera)
+
+    def exito(self):
+        """La solicitud respondió bien"""
+        sonda, self.local.sonda = getattr(self.local, "sonda", False), False
+        with self._bloqueado():
+            estado = self._leer()
+            if estado["estado"] == "cerrado":
+                if estado["fallos_seguidos"]:
+                    estado["fallos_seguidos"] = 0
+                    self._escribir(estado)
+                return
+
+            if sonda and estado["estado"] == "sondeando":
+                estado.update({"estado": "recuperando", "etapa": 0, "exitos_etapa": 0,
+                               "proximo_turno": time.time() + RAMPA[0]})
+                estado.pop("sonda_hasta", None)
+                print(f"🟡 Sonda exitosa: recuperando a 1 solicitud cada {RAMPA[0]:g}s")
+            elif estado["estado"] == "recuperando":
+                estado["exitos_etapa"] = estado.get("exitos_etapa", 0) + 1
+                if estado["exitos_etapa"] >= EXITOS_POR_ETAPA:
+                    if estado["etapa"] + 1 < len(RAMPA):
+                        estado["etapa"] += 1
+                        estado["exitos_etapa"] = 0
+                        print(f"🟡 Recuperando: 1 solicitud cada {RAMPA[estado['etapa']]:g}s")
+                    else:
+                        estado = {"estado": "cerrado", "fallos_seguidos": 0,
+                                  "ultimo_bloqueo": estado.get("abierto_desde")}
+                        print("🟢 Circuito cerrado: ritmo normal")
+            self._escribir(estado)
+
+    def fallo(self, motivo, bloqueo=True):
+        """La solicitud falló; bloqueo=True si tiene el patrón de un bloqueo
+
+        Una sonda fallida (por cualquier motivo) o un bloqueo en recuperación
+        reabren el circuito de inmediato; cerrado, lo abren UMBRAL_BLOQUEO
+        bloqueos seguidos.
+        """
+        sonda, self.local.sonda = getattr(self.local, "sonda", False), False
+        with self._bloqueado():
+            estado = self._leer()
+            ahora = time.time()
+            if sonda and estado["estado"] == "sondeando":
+                self._abrir(estado, f"sonda fallida: {motivo}", ahora)
+            elif bloqueo and estado["estado"] == "recuperando":
+                self._abrir(estado, motivo, ahora)
+            elif bloqueo and estado["estado"] == "cerrado":
+                estado["fallos_seguidos"] += 1
+                if estado["fallos_seguidos"] >= UMBRAL_BLOQUEO:
+                    self._abrir(estado, f"{UMBRAL_BLOQUEO} seguidos: {motivo}", ahora)
+            else:
+                return
+            self._escribir(estado)
+
+    def solicitar(self, funcion, *args, turno=None, **kwargs):
+        """Enviar una solicitud HTTP (session.get/post) a través del circuito
+
+        turno() (p. ej. el presupuesto de la IP) se llama solo si el circuito
+        deja pasar la solicitud. Lanza CircuitoAbierto si no se envió y
+        BloqueoDetectado si la respuesta tiene el patrón de un bloqueo; en
+        ambos casos conviene reintentar más tarde en vez de darla por perdida.
+        """
+        self.antes()
+        if turno:
+            turno()
+        try:
+            respuesta = funcion(*args, **kwargs)
+        except Exception as e:
+            if es_reinicio(e):
+                self.fallo(f"conexión reiniciada ({e.__class__.__name__})")
+                raise BloqueoDetectado(f"Conexión reiniciada por el servidor: {e}") from e
+            self.fallo(str(e), bloqueo=False)
+            raise
+
+        if respuesta.status_code in ESTADOS_BLOQUEO:
+            self.fallo(f"HTTP {respuesta.status_code}")
+            raise BloqueoDetectado(f"HTTP {respuesta.status_code} del servidor")
+        if respuesta.status_code >= 500:
+            self.fallo(f"HTTP {respuesta.status_code}", bloqueo=False)
+        else:
+            self.exito()
+        return respuesta
+
+    def reiniciar(self):
+        """Cerrar el circuito a mano"""
+        with self._bloqueado():
+            self._escribir({"estado": "cerrado", "fallos_seguidos": 0})
+
+
+class _SinCortacircuitos:
+    """Cortacircuitos desactivado (PJUD_CORTACIRCUITOS=off)"""
+
+    def permite_envio(self):
+        return True
+
+    def normal(self):
+        return True
+
+    def solicitar(self, funcion, *args, turno=None, **kwargs):
+        if turno:
+            turno()
+        return funcion(*args, **kwargs)
+
+
+_cortacircuitos = None
+
+
+def cortacircuitos():
+    """Cortacircuitos de la máquina, uno por proceso"""
+    global _cortacircuitos
+    if _cortacircuitos is None:
+        ruta = os.environ.get("PJUD_CORTACIRCUITOS", CORTACIRCUITOS_DEFAULT)
+        if ruta.lower() in ("off", "0", "no"):
+            _cortacircuitos = _SinCortacircuitos()
+        else:
+            _cortacircuitos = Cortacircuitos(ruta)
+    return _cortacircuitos
+
+
+def main():
+    """Función principal"""
+    args = sys.argv[1:]
+    if args and args[0] not in ('estado', 'reiniciar'):
+        print("Uso: python cortacircuitos.py [estado|reiniciar]")
+        print("     estado     Estado del circuito (predeterminado)")
+        print("     reiniciar  Cerrar el circuito a mano (p. ej. tras cambiar de IP)")
+        sys.exit(1)
+
+    circuito = cortacircuitos()
+    if not isinstance(circuito, Cortacircuitos):
+        print("⚠️ Cortacircuitos desactivado (PJUD_CORTACIRCUITOS=off)")
+        return
+
+    if args and args[0] == 'reiniciar':
+        circuito.reiniciar()
+        print("🟢 Circuito cerrado")
+        return
+
+    estado = circuito.consultar()
+    print(f"🔌 Cortacircuitos ({circuito.ruta})")
+    print(f"   Estado: {estado['estado']}")
+    if estado["estado"] == "cerrado":
+        print(f"   Bloqueos seguidos: {estado['fallos_seguidos']} de {UMBRAL_BLOQUEO}")
+        if estado.get("ultimo_bloqueo"):
+            print(f"   Último bloqueo: {estado['ultimo_bloqueo']}")
+        return
+
+    print(f"   Motivo: {estado.get('motivo')} (abierto desde {estado.get('abierto_desde')})")
+    if estado["estado"] == "abierto":
+        print(f"   Próxima sonda: {_hora(estado['proxima_sonda'])} (intento {estado.get('intento', 0) + 1})")
+    elif estado["estado"] == "recuperando":
+        print(f"   Etapa {estado['etapa'] + 1} de {len(RAMPA)}: 1 solicitud cada {RAMPA[estado['etapa']]:g}s "
+              f"({estado.get('exitos_etapa', 0)}/{EXITOS_POR_ETAPA} respuestas buenas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Codificación delta de los textos derivados de una sentencia
+texto_sentencia_anon y las vistas previas son casi iguales al texto
+original: se guardan como un script de edición contra su texto base y se
+reconstruyen al leer. Si el delta no es más chico, se guarda el texto completo
+Es opcional (descarga con --delta-textos o este script): los batch_*.json con
+deltas solo los entienden los lectores de corpus_local, no otros consumidores
+"""
+
+import re
+import sys
+import json
+from difflib import SequenceMatcher
+
+# Campo derivado → campo base. El orden importa al expandir: anon antes que anon_preview
+CAMPOS_DELTA = (
+    ('texto_sentencia_anon', 'texto_sentencia'),
+    ('texto_sentencia_preview', 'texto_sentencia'),
+    ('texto_sentencia_anon_preview', 'texto_sentencia_anon'),
+)
+
+_LINEAS = re.compile(r'.*?(?:<br/>|\n)|.+', re.DOTALL)
+_TOKENS = re.compile(r'\w+|\W+')
+
+# Diferencias centrales más cortas que esto se insertan literales sin diff
+MIN_DIFF = 64
+
+
+def _largo_prefijo_comun(a, b):
+    """Largo del prefijo común (búsqueda binaria con comparación de slices en C)"""
+    bajo, alto = 0, min(len(a), len(b))
+    while bajo < alto:
+        medio = (bajo + alto + 1) // 2
+        if a[:medio] == b[:medio]:
+            bajo = medio
+        else:
+            alto = medio - 1
+    return bajo
+
+
+def _largo_sufijo_comun(a, b, limite):
+    """Largo del sufijo común sin superar `limite`"""
+    bajo, alto = 0, min(len(a), len(b), limite)
+    while bajo < alto:
+        medio = (bajo + alto + 1) // 2
+        if a[len(a) - medio:] == b[len(b) - medio:]:
+            bajo = medio
+        else:
+            alto = medio - 1
+    return bajo
+
+
+def codificar_delta(base, derivado):
+    """Script de edición que transforma `base` en `derivado`
+
+    Lista de operaciones: [inicio, largo] copia base[inicio:inicio+largo] y
+    un string se inserta literal.
+    """
+    ops = []
+
+    def copiar(inicio, largo):
+        if largo <= 0:
+            return
+        if ops and isinstance(ops[-1], list) and ops[-1][0] + ops[-1][1] == inicio:
+            ops[-1][1] += largo
+        else:
+            ops.append([inicio, largo])
+
+    def insertar(texto):
+        if not texto:
+            return
+        if ops and isinstance(ops[-1], str):
+            ops[-1] += texto
+        else:
+            ops.append(texto)
+
+    prefijo = _largo_prefijo_comun(base, derivado)
+    sufijo = _largo_sufijo_comun(base, derivado, min(len(base), len(derivado)) - prefijo)
+    medio_base = base[prefijo:len(base) - sufijo]
+    medio_derivado = derivado[prefijo:len(derivado) - sufijo]
+
+    copiar(0, prefijo)
+
+    def diferenciar(patron, inicio_base, trozo_base, trozo_derivado):
+        tokens_base = patron.findall(trozo_base)
+        tokens_derivado = patron.findall(trozo_derivado)
+        offsets_base = [inicio_base]
+        for token in tokens_base:
+            offsets_base.append(offsets_base[-1] + len(token))
+
+        matcher = SequenceMatcher(None, tokens_base, tokens_derivado)
+        for operacion, i1, i2, j1, j2 in matcher.get_opcodes():
+            if operacion == 'equal':
+                copiar(offsets_base[i1], offsets_base[i2] - offsets_base[i1])
+            elif operacion == 'replace' and patron is _LINEAS:
+                diferenciar(_TOKENS, offsets_base[i1],
+                            ''.join(tokens_base[i1:i2]), ''.join(tokens_derivado[j1:j2]))
+            else:
+                insertar(''.join(tokens_derivado[j1:j2]))
+
+    if medio_base and len(medio_derivado) > MIN_DIFF:
+        # Primero por líneas y, dentro de los bloques distintos, por palabras:
+        # la anonimización reemplaza nombres sin mover el resto del texto
+        diferenciar(_LINEAS, prefijo, medio_base, medio_derivado)
+    else:
+        insertar(medio_derivado)
+
+    copiar(len(base) - sufijo, sufijo)
+    return ops
+
+
+def aplicar_delta(base, ops):
+    """Reconstruir el texto derivado desde su base y el script de edición"""
+    return ''.join(
+        base[op[0]:op[0] + op[1]] if isinstance(op, list) else op for op in ops
+    )
+
+
+def comprimir_sentencia(sentencia):
+    """Reemplazar los textos derivados por deltas cuando ocupan menos"""
+    comprimida = dict(sentencia)
+
+    for campo, campo_base in CAMPOS_DELTA:
+        derivado = sentencia.get(campo)
+        base = sentencia.get(campo_base)
+        if not isinstance(derivado, str) or not isinstance(base, str) or not base:
+            continue
+
+        ops = codificar_delta(base, derivado)
+        if len(json.dumps(ops, ensure_ascii=False)) < len(derivado):
+            comprimida[campo] = {"delta_de": campo_base, "ops": ops}
+
+    return comprimida
+
+
+def expandir_sentencia(sentencia):
+    """Reconstruir los textos guardados como delta (sin efecto si no hay deltas)"""
+    if not any(isinstance(sentencia.get(campo), dict) for campo, _ in CAMPOS_DELTA):
+        return sentencia
+
+    for campo, _ in CAMPOS_DELTA:
+        valor = sentencia.get(campo)
+        if isinstance(valor, dict) and 'ops' in valor:
+            sentencia[campo] = aplicar_delta(sentencia.get(valor['delta_de']) or '', valor['ops'])
+    return sentencia
+
+
+def convertir_directorio(directorio, expandir=False):
+    """Codificar (o expandir) los textos derivados de todos los batches de un directorio
+
+    Los batches registrados en el manifiesto de su tribunal se reescriben con
+    integridad_batches.escribir_batch, que actualiza su entrada; si no, el
+    validador los daría por dañados y se volverían a descargar.
+    Devuelve (bytes antes, bytes después).
+    """
+    from corpus_local import listar_batches
+    from integridad_batches import cargar_manifiesto, escribir_batch
+
+    bytes_antes = 0
+    bytes_despues = 0
+    manifiestos = {}
+
+    for ruta_batch in listar_batches(directorio):
+        with open(ruta_batch, 'r', encoding='utf-8') as f:
+            contenido = json.load(f)
+        bytes_antes += ruta_batch.stat().st_size
+
+        sentencias = contenido.get('sentencias', []) if isinstance(contenido, dict) else contenido
+        convertir = expandir_sentencia if expandir else comprimir_sentencia
+        sentencias = [convertir(expandir_sentencia(dict(s))) for s in sentencias]
+
+        if isinstance(contenido, dict):
+            contenido['sentencias'] = sentencias
+        else:
+            contenido = sentencias
+
+        if ruta_batch.parent not in manifiestos:
+            manifiestos[ruta_batch.parent] = cargar_manifiesto(ruta_batch.parent)
+        entrada = manifiestos[ruta_batch.parent].get(ruta_batch.name)
+        if entrada:
+            escribir_batch(ruta_batch, contenido, entrada["sentencias"])
+        else:
+            tmp = ruta_batch.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(contenido, f, ensure_ascii=False, indent=2)
+            tmp.replace(ruta_batch)
+        bytes_despues += ruta_batch.stat().st_size
+
+        print(f"   ✅ {ruta_batch.parent.name}/{ruta_batch.name}")
+
+    return bytes_antes, bytes_despues
+
+
+def main():
+    """Función principal: convertir batches existentes"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+
+    if len(args) < 1:
+        print("Uso: python delta_textos.py DIRECTORIO_BATCHES [--expandir]")
+        print("Ejemplo: python delta_textos.py output/universo_completo")
+        sys.exit(1)
+
+    expandir = '--expandir' in sys.argv
+    print("🗜️ EXPANDIENDO TEXTOS DELTA" if expandir else "🗜️ CODIFICANDO TEXTOS DERIVADOS COMO DELTA")
+    print("=" * 60)
+
+    bytes_antes, bytes_despues = convertir_directorio(args[0], expandir)
+
+    print(f"\n✅ Conversión completada")
+    print(f"📏 Tamaño: {bytes_antes / 1024 / 1024:.1f} MB → {bytes_despues / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
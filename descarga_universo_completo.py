@@ -9,41 +9,114 @@ import os
 import sys
 import time
 import random
-import logging
+import multiprocessing
 from datetime import datetime, timedelta
 from pathlib import Path
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 import threading
 
+from config_descarga import ConfigDescarga, MAX_WORKERS
+from control_descarga import ControlDescarga, iniciar_servidor, puerto_de_argumentos
+from cortacircuitos import cortacircuitos, CircuitoAbierto
+from delta_textos import comprimir_sentencia
+from facetas_corpus import AgregadorFacetas, contar_facetas
+from integridad_batches import escribir_batch
+from presupuesto_ip import presupuesto_ip
+from registro_eventos import configurar_logger
+from trazas import tramo, registrar_tramo, activar_desde_argv
+
+MAX_REINTENTOS_BATCH = 3   # Errores de un batch (red, escritura, pool) antes de dejarlo para la próxima corrida
+MAX_REINICIOS_POOL = 3     # Procesos del pool perdidos (p. ej. OOM) por tribunal antes de detenerlo
+
+def procesar_respuesta(ruta_batch, contenido, delta_textos=False):
+    """Decodificar el cuerpo de una respuesta y escribir su batch
+
+    Se ejecuta en un proceso del pool (o en el hilo de red si no hay pool).
+    Devuelve (sentencias, conteos de facetas, tiempos); sin sentencias no
+    escribe nada. En el pool no hay trazador: los tramos decode y write se
+    miden aquí y registrar_batch los registra en el proceso principal.
+    """
+    pid = os.getpid()
+    tiempos = []
+    
+    inicio, t0 = time.time(), time.perf_counter()
+    sentencias = json.loads(contenido).get("sentencias", [])
+    tiempos.append(("decode", "cpu", inicio, time.perf_counter() - t0, pid, {"bytes": len(contenido)}))
+    if not sentencias:
+        return 0, None, tiempos
+    
+    ruta_batch = Path(ruta_batch)
+    ruta_batch.parent.mkdir(exist_ok=True)
+    sentencias_batch = [comprimir_sentencia(s) for s in sentencias] if delta_textos else sentencias
+    inicio, t0 = time.time(), time.perf_counter()
+    escribir_batch(ruta_batch, sentencias_batch, len(sentencias))
+    tiempos.append(("write", "escritura", inicio, time.perf_counter() - t0, pid, {"archivo": ruta_batch.name}))
+    return len(sentencias), contar_facetas(sentencias), tiempos
+
+class ProcesadorBatches:
+    """Pool de procesos que decodifica, comprime y escribe batches
+
+    Los hilos de red entregan el cuerpo crudo y siguen con el siguiente POST;
+    a lo sumo `limite` batches esperan o están en proceso. Si los procesos no
+    dan abasto, la red se frena en enviar() en vez de acumular respuestas.
+    """
+    
+    def __init__(self, procesos, limite):
+        # Sin fork: el proceso principal ya tiene hilos (config, control, red)
+        metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.executor = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context(metodo))
+        self.procesos = procesos
+        self.limite = limite
+        self.pendientes = 0
+        self.condicion = threading.Condition()
+        self.roto = False   # Murió un proceso (p. ej. OOM): el pool ya no acepta trabajo
+    
+    def ajustar(self, limite):
+        """Cambiar el largo de la cola (en caliente)"""
+        with self.condicion:
+            self.limite = limite
+            self.condicion.notify_all()
+    
+    def enviar(self, ruta_batch, contenido, delta_textos):
+        """Encolar un batch; bloquea mientras la cola esté llena"""
+        with tramo("cola", "espera"):
+            with self.condicion:
+                self.condicion.wait_for(lambda: self.pendientes < self.limite)
+                self.pendientes += 1
+        try:
+            future = self.executor.submit(procesar_respuesta, str(ruta_batch), contenido, delta_textos)
+        except Exception as e:
+            self._liberar(None)
+            if isinstance(e, BrokenProcessPool):
+                self.roto = True
+            raise
+        future.add_done_callback(self._liberar)
+        return future
+    
+    def _liberar(self, future):
+        if future is not None and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self.roto = True
+        with self.condicion:
+            self.pendientes -= 1
+            self.condicion.notify()
+    
+    def cerrar(self, esperar=True):
+        """Terminar los procesos; esperar=False descarta lo encolado (pool roto)"""
+        self.executor.shutdown(wait=esperar, cancel_futures=not esperar)
+
 class DescargadorUniversoCompleto:
-    def __init__(self, output_dir="output/universo_completo"):
+    def __init__(self, output_dir="output/universo_completo", config=None, control=None):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Configuración de seguridad
-        self.rate_limit_delay = 0.5  # 0.5 segundos entre requests
-        self.max_retries = 5
-        self.timeout = 30
-        self.batch_size = 50  # Sentencias por batch
-        
-        # Configuración de workers
-        self.max_workers = 3  # Conservador para evitar bloqueos
-        self.workers_por_tribunal = {
-            "Corte_de_Apelaciones": 3,
-            "Civiles": 2,
-            "Penales": 2,
-            "Familia": 1,
-            "Laborales": 1,
-            "Corte_Suprema": 1,
-            "Cobranza": 1
-        }
+        self.delta_textos = False  # --delta-textos: anon/preview como delta (solo lectores de corpus_local)
         
         # Configuración de logging
         self.setup_logging()
         
         # Estado del sistema
         self.estado_file = self.output_dir / "estado_descarga.json"
+        self.facetas = AgregadorFacetas(self.output_dir / "facetas")
         self.load_estado()
         
         # Configuración de tribunales
@@ -101,33 +174,86 @@ class DescargadorUniversoCompleto:
             "Referer": "https://juris.pjud.cl/busqueda",
         }
         
+        import requests  # Importación diferida: el CLI arranca sin cargar requests
+        
         self.session = requests.Session()
         self.session.headers.update(self.headers)
         
-    def setup_logging(self):
-        """Configurar sistema de logging"""
-        log_dir = self.output_dir / "logs"
-        log_dir.mkdir(exist_ok=True)
+        # Decodificación y escritura en procesos aparte (se crea al primer tribunal)
+        self.procesador = None
         
-        # Logger principal
-        self.logger = logging.getLogger('descarga_universo')
-        self.logger.setLevel(logging.INFO)
+        # Presupuesto de la IP y cortacircuitos ante bloqueos, compartidos con los demás procesos
+        self.presupuesto = presupuesto_ip()
+        self.circuito = cortacircuitos()
         
-        # Handler para archivo
-        file_handler = logging.FileHandler(log_dir / f"descarga_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-        file_handler.setLevel(logging.INFO)
+        # Ritmo, workers, tamaño de batch y prioridades vienen de config_descarga_5_dias.json
+        # y se vuelven a aplicar cada vez que el archivo cambia
+        self.config = config or ConfigDescarga()
+        self.aplicar_config(self.config)
+        self.config.al_cambiar(self.aplicar_config)
         
-        # Handler para consola
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
+        # Pausa, drenado, concurrencia y prioridad desde el canal de control
+        self.control = control or ControlDescarga()
+        self.control.agregar_tribunales(self.tribunales)
+        self.en_curso = {}  # tribunal -> batches en vuelo (lista que se reemplaza, no se modifica)
+        self.control.agregar_fuente(self.instantanea)
+    
+    def aplicar_config(self, config):
+        """Tomar los valores de la configuración (también en caliente, durante la descarga)"""
+        descarga = config.seccion("descarga")
+        self.rate_limit_delay = descarga["rate_limit_delay"]
+        self.max_retries = descarga["max_retries"]
+        self.timeout = descarga["timeout"]
+        self.batch_size = descarga["batch_size"]
+        self.max_workers = descarga["max_workers_por_tribunal"]
+        # Red (workers) y CPU (procesos) se ajustan por separado; la cantidad de
+        # procesos se fija al crear el pool, el largo de la cola cambia en caliente
+        self.procesos_escritura = descarga["procesos_escritura"]
+        self.cola_escritura = descarga["cola_escritura"]
+        if self.procesador:
+            self.procesador.ajustar(self.cola_escritura)
+        
+        tribunales = config.seccion("tribunales")
+        self.workers_por_tribunal = {
+            nombre: tribunales.get(nombre, {}).get("workers", 1) for nombre in self.tribunales
+        }
+        for nombre, tribunal in self.tribunales.items():
+            if nombre in tribunales:
+                tribunal["prioridad"] = tribunales[nombre]["prioridad"]
+                tribunal["total_estimado"] = tribunales[nombre]["total_estimado"]
+    
+    def workers_tribunal(self, tribunal_name):
+        """Workers actuales de un tribunal (acotados por max_workers_por_tribunal y el canal de control)"""
+        return self.control.limitar(min(self.workers_por_tribunal.get(tribunal_name, 1), self.max_workers))
+    
+    def instantanea(self):
+        """Estado de la descarga para el canal de control"""
+        return {
+            "descarga": {
+                "rate_limit_delay": self.rate_limit_delay,
+                "batch_size": self.batch_size,
+                "workers": {nombre: self.workers_tribunal(nombre) for nombre in self.tribunales},
+                "en_curso": {nombre: batches for nombre, batches in list(self.en_curso.items()) if batches},
+                "total_descargado": self.estado.get("total_descargado", 0),
+                "tribunales": {
+                    nombre: {clave: datos.get(clave) for clave in ("estado", "descargado", "total", "batch_actual")}
+                    for nombre, datos in self.estado["tribunales"].items()
+                },
+            }
+        }
+    
+    def batch_size_tribunal(self, tribunal_name):
+        """Tamaño de batch de un tribunal
         
-        # Formato
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
+        Queda fijo desde que el tribunal empieza: la numeración de los batch_NNNNNN
+        (reanudación, huecos, reparación) depende de él. Un cambio de batch_size
+        en la configuración se aplica a los tribunales que aún no comienzan.
+        """
+        return self.estado["tribunales"].get(tribunal_name, {}).get("batch_size", self.batch_size)
         
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+    def setup_logging(self):
+        """Configurar sistema de logging (JSON por línea con rotación, escrito fuera de los hilos de red)"""
+        self.logger = configurar_logger('descarga_universo', self.output_dir / "logs", "descarga")
         
     def load_estado(self):
         """Cargar estado de descarga desde archivo"""
@@ -149,6 +275,7 @@ class DescargadorUniversoCompleto:
         self.estado["ultima_actualizacion"] = datetime.now().isoformat()
         with open(self.estado_file, 'w') as f:
             json.dump(self.estado, f, indent=2)
+        self.facetas.guardar()
     
     def obtener_total_tribunal(self, tribunal_name, id_buscador, cabecera):
         """Obtener total real de sentencias de un tribunal"""
@@ -172,7 +299,8 @@ class DescargadorUniversoCompleto:
                 "limit": 1
             }
             
-            response = self.session.post(url, json=data, timeout=self.timeout)
+            response = self.circuito.solicitar(self.session.post, url, json=data, timeout=self.timeout,
+                                               turno=self.presupuesto.esperar)
             response.raise_for_status()
             
             result = response.json()
@@ -185,56 +313,114 @@ class DescargadorUniversoCompleto:
             self.logger.error(f"❌ Error obteniendo total para {tribunal_name}: {e}")
             return self.tribunales[tribunal_name]["total_estimado"]
     
-    def descargar_batch_sentencias(self, tribunal_name, offset, limit, batch_num):
-        """Descargar un batch de sentencias"""
+    def pedir_batch(self, tribunal_name, offset, limit):
+        """POST de un batch; devuelve el cuerpo crudo de la respuesta"""
         tribunal_config = self.tribunales[tribunal_name]
         
+        # Rate limiting
+        time.sleep(self.rate_limit_delay + random.uniform(0, 0.5))
+        
+        url = "https://juris.pjud.cl/busqueda/buscar_sentencias"
+        headers = self.headers.copy()
+        headers["busqueda"] = tribunal_config["cabecera"]
+        
+        filtros = {
+            "rol": "", "era": "", "fec_desde": "", "fec_hasta": "",
+            "tipo_norma": "", "num_norma": "", "num_art": "", "num_inciso": "",
+            "todas": "", "algunas": "", "excluir": "", "literal": "",
+            "proximidad": "", "distancia": "", "analisis_s": "", "submaterias": "",
+            "facetas_seleccionadas": [], "filtros_omnibox": [], "ids_comunas_seleccionadas_mapa": []
+        }
+        
+        data = {
+            "id_buscador": tribunal_config["id_buscador"],
+            "filtros": json.dumps(filtros),
+            "offset": offset,
+            "limit": limit
+        }
+        
+        # Con el circuito abierto lanza CircuitoAbierto sin enviar nada (el batch se reencola)
+        with tramo("post", "red", tribunal=tribunal_name, offset=offset):
+            response = self.circuito.solicitar(self.session.post, url, json=data, timeout=self.timeout,
+                                               turno=self.esperar_presupuesto)
+        response.raise_for_status()
+        return response.content
+    
+    def esperar_presupuesto(self):
+        """Turno del presupuesto de la IP (tramo propio en las trazas)"""
+        with tramo("presupuesto", "espera"):
+            self.presupuesto.esperar()
+    
+    def iniciar_procesador(self):
+        """Crear el pool de decodificación y escritura (procesos_escritura=0: en los hilos de red)"""
+        if self.procesador is None and self.procesos_escritura > 0:
+            self.procesador = ProcesadorBatches(self.procesos_escritura, self.cola_escritura)
+            self.logger.info(f"⚙️ Decodificación y escritura en {self.procesos_escritura} procesos "
+                             f"(cola de {self.cola_escritura} batches)")
+        return self.procesador
+    
+    def cerrar_procesador(self):
+        """Esperar lo encolado y terminar el pool de procesos (se vuelve a crear al próximo tribunal)"""
+        if self.procesador:
+            self.procesador.cerrar()
+            self.procesador = None
+    
+    def reiniciar_procesador(self):
+        """Reemplazar un pool roto; sus batches en vuelo ya fallaron y se reintentan"""
+        roto, self.procesador = self.procesador, None
+        roto.cerrar(esperar=False)
+        return self.iniciar_procesador()
+    
+    def registrar_batch(self, tribunal_name, batch_num, resultado, inicio=None):
+        """Contabilizar un batch ya escrito (facetas y log); devuelve sus sentencias"""
+        total, conteos, tiempos = resultado
+        for nombre, categoria, inicio_tramo, duracion, pid, args in tiempos:
+            registrar_tramo(nombre, categoria, inicio_tramo, duracion, pid, **args)
+        evento = {"tribunal": tribunal_name, "batch": batch_num, "sentencias": total}
+        if inicio is not None:
+            evento["latencia_ms"] = round((time.monotonic() - inicio) * 1000)
+        
+        if not total:
+            self.logger.warning(f"⚠️ {tribunal_name} - Batch {batch_num}: Sin sentencias",
+                                extra={"evento": dict(evento, estado="vacio")})
+            return 0
+        
+        batch_file = self.output_dir / tribunal_name / f"batch_{batch_num:06d}.json"
+        self.facetas.registrar_conteos(tribunal_name, batch_file, conteos, total)
+        # Rutinario: se muestrea (a lo sumo uno cada pocos segundos por tribunal)
+        self.logger.info(f"✅ {tribunal_name} - Batch {batch_num}: {total} sentencias",
+                         extra={"evento": dict(evento, estado="ok"), "muestreo": tribunal_name})
+        return total
+    
+    def descargar_batch_sentencias(self, tribunal_name, offset, limit, batch_num, en_cola=False):
+        """Descargar un batch de sentencias
+
+        Con en_cola=True y pool de procesos, devuelve el Future del pool apenas
+        termina la red (el resultado va a registrar_batch); si no, procesa aquí
+        y devuelve la cantidad de sentencias. Con en_cola=True los errores se
+        relanzan para que descargar_tribunal reintente el batch; si no, se
+        registran y se devuelve 0.
+        """
+        inicio = time.monotonic()
         try:
-            # Rate limiting
-            time.sleep(self.rate_limit_delay + random.uniform(0, 0.5))
-            
-            url = "https://juris.pjud.cl/busqueda/buscar_sentencias"
-            headers = self.headers.copy()
-            headers["busqueda"] = tribunal_config["cabecera"]
-            
-            filtros = {
-                "rol": "", "era": "", "fec_desde": "", "fec_hasta": "",
-                "tipo_norma": "", "num_norma": "", "num_art": "", "num_inciso": "",
-                "todas": "", "algunas": "", "excluir": "", "literal": "",
-                "proximidad": "", "distancia": "", "analisis_s": "", "submaterias": "",
-                "facetas_seleccionadas": [], "filtros_omnibox": [], "ids_comunas_seleccionadas_mapa": []
-            }
-            
-            data = {
-                "id_buscador": tribunal_config["id_buscador"],
-                "filtros": json.dumps(filtros),
-                "offset": offset,
-                "limit": limit
-            }
-            
-            response = self.session.post(url, json=data, timeout=self.timeout)
-            response.raise_for_status()
+            contenido = self.pedir_batch(tribunal_name, offset, limit)
+            batch_file = self.output_dir / tribunal_name / f"batch_{batch_num:06d}.json"
             
-            result = response.json()
-            sentencias = result.get("sentencias", [])
+            if en_cola and self.procesador:
+                return self.procesador.enviar(batch_file, contenido, self.delta_textos)
             
-            if sentencias:
-                # Guardar batch
-                tribunal_dir = self.output_dir / tribunal_name
-                tribunal_dir.mkdir(exist_ok=True)
-                
-                batch_file = tribunal_dir / f"batch_{batch_num:06d}.json"
-                with open(batch_file, 'w', encoding='utf-8') as f:
-                    json.dump(sentencias, f, ensure_ascii=False, indent=2)
-                
-                self.logger.info(f"✅ {tribunal_name} - Batch {batch_num}: {len(sentencias)} sentencias")
-                return len(sentencias)
-            else:
-                self.logger.warning(f"⚠️ {tribunal_name} - Batch {batch_num}: Sin sentencias")
-                return 0
-                
+            resultado = procesar_respuesta(batch_file, contenido, self.delta_textos)
+            return self.registrar_batch(tribunal_name, batch_num, resultado, inicio)
+        
+        except CircuitoAbierto:
+            raise   # No es un error del batch: quien lo lanzó lo reencola
         except Exception as e:
-            self.logger.error(f"❌ Error en batch {batch_num} de {tribunal_name}: {e}")
+            if en_cola:
+                raise   # descargar_tribunal lo registra y lo reintenta
+            self.logger.error(f"❌ Error en batch {batch_num} de {tribunal_name}: {e}", extra={"evento": {
+                "tribunal": tribunal_name, "batch": batch_num, "estado": "error", "error": str(e),
+                "latencia_ms": round((time.monotonic() - inicio) * 1000),
+            }})
             return 0
     
     def descargar_tribunal(self, tribunal_name):
@@ -261,7 +447,8 @@ class DescargadorUniversoCompleto:
                 "descargado": 0,
                 "batch_actual": 0,
                 "estado": "iniciando",
-                "inicio": datetime.now().isoformat()
+                "inicio": datetime.now().isoformat(),
+                "batch_size": self.batch_size
             }
         
         tribunal_estado = self.estado["tribunales"][tribunal_name]
@@ -269,67 +456,225 @@ class DescargadorUniversoCompleto:
         self.save_estado()
         
         # Calcular batches
-        total_batches = (total + self.batch_size - 1) // self.batch_size
+        batch_size = tribunal_estado.setdefault("batch_size", self.batch_size)
+        total_batches = (total + batch_size - 1) // batch_size
         batch_inicial = tribunal_estado.get("batch_actual", 0)
         
         self.logger.info(f"📊 {tribunal_name}: {total:,} sentencias en {total_batches:,} batches")
         self.logger.info(f"🔄 Continuando desde batch {batch_inicial}")
         
         sentencias_descargadas = 0
-        
-        # Descargar con workers limitados
-        max_workers = min(self.workers_por_tribunal[tribunal_name], 3)
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
-            
-            for batch_num in range(batch_inicial, total_batches):
-                offset = batch_num * self.batch_size
-                limit = min(self.batch_size, total - offset)
+        siguiente = batch_inicial
+        en_curso = {}     # future -> batch (en la red o en el pool de procesos)
+        en_red = set()    # futures de hilos de red: son los que cuentan para workers_tribunal()
+        inicios = {}      # batch -> instante en que se lanzó (latencia en el log)
+        terminados = 0
+        guardados = 0
+        # Batches ya escritos por delante de batch_actual (terminaron antes que uno anterior)
+        adelantados = set(tribunal_estado.get("batches_adelantados", []))
+        # Batches rechazados por el cortacircuitos o con error: se vuelven a pedir antes que los nuevos
+        reintentos = set()
+        errores = {}      # batch -> errores en esta corrida
+        fallidos = set()  # Superaron MAX_REINTENTOS_BATCH: quedan para la próxima corrida
+        reinicios_pool = 0
+        detenido = False  # Demasiados procesos del pool perdidos: no se lanzan más batches
+        circuito_abierto = False
+        
+        self.en_curso[tribunal_name] = []
+        self.iniciar_procesador()
+        
+        # El pool admite el máximo de workers; la concurrencia efectiva la fija
+        # workers_tribunal(), que se relee en cada vuelta (configuración y canal de control)
+        executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        try:
+            while ((siguiente < total_batches or reintentos) and not self.control.drenando and not detenido) or en_curso:
+                if self.control.drenando and self.control.plazo_vencido():
+                    # Lo que no terminó a tiempo se abandona; se retoma desde batch_actual
+                    self.logger.warning(f"⚠️ Plazo de drenado vencido: {len(en_curso)} batches de "
+                                        f"{tribunal_name} sin terminar se descargarán al reanudar")
+                    break
+                
+                if self.control.pausado and not en_curso:
+                    self.control.esperar_reanudacion(1.0)
+                    continue
+                
+                # Circuito abierto (bloqueo del servidor): nada sale hasta la próxima sonda
+                if not self.circuito.permite_envio():
+                    if not circuito_abierto:
+                        circuito_abierto = True
+                        self.logger.warning(f"🚫 Circuito abierto: {tribunal_name} en espera en batch "
+                                            f"{tribunal_estado['batch_actual']}",
+                                            extra={"evento": {"tribunal": tribunal_name, "estado": "circuito_abierto"}})
+                    if not en_curso:
+                        time.sleep(1.0)
+                        continue
+                else:
+                    circuito_abierto = False
                 
-                future = executor.submit(
-                    self.descargar_batch_sentencias,
-                    tribunal_name, offset, limit, batch_num
-                )
-                futures.append(future)
+                # En recuperación, de a un batch en la red (el circuito espacia las solicitudes)
+                limite = self.workers_tribunal(tribunal_name) if self.circuito.normal() else 1
+                while ((siguiente < total_batches or reintentos) and not circuito_abierto and not detenido
+                       and not self.control.pausado and not self.control.drenando and len(en_red) < limite):
+                    if reintentos:
+                        batch_num = min(reintentos)
+                        reintentos.discard(batch_num)
+                    elif siguiente in adelantados:
+                        siguiente += 1
+                        continue
+                    else:
+                        batch_num = siguiente
+                        siguiente += 1
+                    offset = batch_num * batch_size
+                    limit = min(batch_size, total - offset)
+                    future = executor.submit(
+                        self.descargar_batch_sentencias,
+                        tribunal_name, offset, limit, batch_num, True
+                    )
+                    en_curso[future] = batch_num
+                    en_red.add(future)
+                    inicios[batch_num] = time.monotonic()
+                self.en_curso[tribunal_name] = sorted(en_curso.values())
                 
-                # Control de concurrencia
-                if len(futures) >= max_workers * 2:
-                    # Esperar a que completen algunos
-                    for f in as_completed(futures[:max_workers]):
-                        try:
+                # Con timeout, para atender pausas, drenado y cambios de concurrencia sin esperar un batch
+                listos, _ = wait(en_curso, timeout=1.0, return_when=FIRST_COMPLETED)
+                for f in listos:
+                    batch_num = en_curso.pop(f)
+                    try:
+                        if f in en_red:
+                            en_red.discard(f)
                             batch_sentencias = f.result()
-                            sentencias_descargadas += batch_sentencias
-                            tribunal_estado["descargado"] += batch_sentencias
-                            tribunal_estado["batch_actual"] = batch_num + 1
-                            
-                            # Guardar progreso cada 10 batches
-                            if batch_num % 10 == 0:
-                                self.save_estado()
-                                
-                        except Exception as e:
-                            self.logger.error(f"❌ Error procesando batch: {e}")
-                    
-                    futures = futures[max_workers:]
-            
-            # Esperar batches restantes
-            for f in as_completed(futures):
-                try:
-                    batch_sentencias = f.result()
-                    sentencias_descargadas += batch_sentencias
-                    tribunal_estado["descargado"] += batch_sentencias
-                except Exception as e:
-                    self.logger.error(f"❌ Error procesando batch final: {e}")
+                            if isinstance(batch_sentencias, Future):
+                                # La red terminó: el batch sigue en vuelo en el pool de procesos
+                                en_curso[batch_sentencias] = batch_num
+                                continue
+                        else:
+                            batch_sentencias = self.registrar_batch(tribunal_name, batch_num, f.result(),
+                                                                    inicios.get(batch_num))
+                        sentencias_descargadas += batch_sentencias
+                        tribunal_estado["descargado"] += batch_sentencias
+                    except CircuitoAbierto as e:
+                        # No se envió o el servidor lo bloqueó: el batch se vuelve a pedir más tarde
+                        self.logger.warning(f"🚫 {tribunal_name} - Batch {batch_num}: {e} (se reintentará)",
+                                            extra={"evento": {"tribunal": tribunal_name, "batch": batch_num,
+                                                              "estado": "bloqueado", "error": str(e)}})
+                        inicios.pop(batch_num, None)
+                        reintentos.add(batch_num)
+                        continue
+                    except BrokenProcessPool as e:
+                        # Murió un proceso del pool: fallan todos sus batches, no solo el culpable.
+                        # Se reintentan sin contar como error del batch; el pool se reemplaza abajo
+                        self.logger.warning(f"🔁 {tribunal_name} - Batch {batch_num}: pool de procesos roto "
+                                            f"({e}), se reintentará",
+                                            extra={"evento": {"tribunal": tribunal_name, "batch": batch_num,
+                                                              "estado": "reintento", "error": str(e)}})
+                        inicios.pop(batch_num, None)
+                        reintentos.add(batch_num)
+                        continue
+                    except Exception as e:
+                        # El batch no quedó escrito: se reintenta (hasta MAX_REINTENTOS_BATCH veces)
+                        inicios.pop(batch_num, None)
+                        errores[batch_num] = errores.get(batch_num, 0) + 1
+                        if errores[batch_num] <= MAX_REINTENTOS_BATCH:
+                            self.logger.warning(f"🔁 {tribunal_name} - Batch {batch_num}: {e} (reintento "
+                                                f"{errores[batch_num]} de {MAX_REINTENTOS_BATCH})",
+                                                extra={"evento": {"tribunal": tribunal_name, "batch": batch_num,
+                                                                  "estado": "reintento", "error": str(e)}})
+                            reintentos.add(batch_num)
+                        else:
+                            self.logger.error(f"❌ {tribunal_name} - Batch {batch_num}: {e} (sin más reintentos; "
+                                              f"se descargará en la próxima corrida)",
+                                              extra={"evento": {"tribunal": tribunal_name, "batch": batch_num,
+                                                                "estado": "error", "error": str(e)}})
+                            fallidos.add(batch_num)
+                        continue
+                    inicios.pop(batch_num, None)
+                    adelantados.add(batch_num)
+                    terminados += 1
+                
+                if self.procesador and self.procesador.roto:
+                    reinicios_pool += 1
+                    self.reiniciar_procesador()
+                    if reinicios_pool > MAX_REINICIOS_POOL:
+                        # Un batch que mata al proceso una y otra vez: se deja para la próxima corrida
+                        detenido = True
+                        self.logger.error(f"❌ {tribunal_name}: el pool de procesos se rompió {reinicios_pool} "
+                                          f"veces; se detiene el tribunal en el batch "
+                                          f"{tribunal_estado['batch_actual']}")
+                    else:
+                        self.logger.warning(f"♻️ Pool de procesos roto (¿memoria?): reemplazado "
+                                            f"({reinicios_pool} de {MAX_REINICIOS_POOL})")
+                
+                # Reanudar desde el primer batch sin terminar (no se saltan batches en curso ni fallidos)
+                # y recordar los ya escritos más adelante para no volver a pedirlos
+                tribunal_estado["batch_actual"] = min([*en_curso.values(), *reintentos, *fallidos],
+                                                      default=siguiente)
+                adelantados = {b for b in adelantados if b >= tribunal_estado["batch_actual"]}
+                tribunal_estado["batches_adelantados"] = sorted(adelantados)
+                self.en_curso[tribunal_name] = sorted(en_curso.values())
+                
+                # Guardar progreso cada 10 batches
+                if terminados - guardados >= 10:
+                    guardados = terminados
+                    self.save_estado()
+        except KeyboardInterrupt:
+            # Segunda interrupción: no se espera lo que está en vuelo, pero el avance queda guardado
+            tribunal_estado["estado"] = "interrumpido"
+            self.estado["total_descargado"] += sentencias_descargadas
+            self.save_estado()
+            self.logger.info(f"⏹️ {tribunal_name} interrumpido en batch {tribunal_estado['batch_actual']}")
+            raise
+        finally:
+            # Sin esperar a los batches abandonados (sus requests terminan por timeout)
+            executor.shutdown(wait=not en_red, cancel_futures=True)
+            self.en_curso[tribunal_name] = []
         
-        tribunal_estado["estado"] = "completado"
-        tribunal_estado["fin"] = datetime.now().isoformat()
         self.estado["total_descargado"] += sentencias_descargadas
         
-        self.logger.info(f"✅ {tribunal_name} completado: {sentencias_descargadas:,} sentencias")
+        if siguiente < total_batches or en_curso or reintentos or fallidos:
+            # Drenado o con batches fallidos: se reanuda desde batch_actual, sin repetir los adelantados
+            tribunal_estado["estado"] = "interrumpido"
+            if (fallidos or detenido) and not self.control.drenando:
+                motivo = (f"pool de procesos roto {reinicios_pool} veces" if detenido else
+                          f"{len(fallidos)} batches sin descargar tras {MAX_REINTENTOS_BATCH} reintentos "
+                          f"{sorted(fallidos)}")
+                self.logger.error(f"❌ {tribunal_name} incompleto ({motivo}); se retoma en la próxima corrida "
+                                  f"desde el batch {tribunal_estado['batch_actual']}",
+                                  extra={"evento": {"tribunal": tribunal_name, "estado": "tribunal_incompleto",
+                                                    "fallidos": sorted(fallidos), "sentencias": sentencias_descargadas,
+                                                    "batches": terminados}})
+            else:
+                self.logger.info(f"⏹️ {tribunal_name} drenado en batch {tribunal_estado['batch_actual']}: "
+                                 f"{sentencias_descargadas:,} sentencias en esta corrida",
+                                 extra={"evento": {"tribunal": tribunal_name, "estado": "tribunal_drenado",
+                                                   "sentencias": sentencias_descargadas, "batches": terminados}})
+        else:
+            tribunal_estado["estado"] = "completado"
+            tribunal_estado["fin"] = datetime.now().isoformat()
+            self.logger.info(f"✅ {tribunal_name} completado: {sentencias_descargadas:,} sentencias",
+                             extra={"evento": {"tribunal": tribunal_name, "estado": "tribunal_completado",
+                                               "sentencias": sentencias_descargadas, "batches": terminados}})
         self.save_estado()
         
         return sentencias_descargadas
     
+    def reparar_batches(self, problemas):
+        """Volver a descargar los batches reportados por integridad_batches.py"""
+        reparados = 0
+        for problema in problemas:
+            tribunal_name = problema["tribunal"]
+            batch_num = problema.get("batch")
+            if tribunal_name not in self.tribunales or batch_num is None:
+                self.logger.warning(f"⚠️ No se puede reparar {tribunal_name}/{problema['archivo']}")
+                continue
+            
+            self.logger.info(f"🔧 Reparando {tribunal_name} - Batch {batch_num} ({problema['motivo']})")
+            batch_size = self.batch_size_tribunal(tribunal_name)
+            offset = batch_num * batch_size
+            if self.descargar_batch_sentencias(tribunal_name, offset, batch_size, batch_num):
+                reparados += 1
+        
+        return reparados
+    
     def ejecutar_descarga_completa(self):
         """Ejecutar descarga completa del universo"""
         self.logger.info("🚀 INICIANDO DESCARGA COMPLETA DEL UNIVERSO")
@@ -340,32 +685,49 @@ class DescargadorUniversoCompleto:
         self.save_estado()
         
         # Ordenar tribunales por prioridad
-        tribunales_ordenados = sorted(
+        pendientes = [nombre for nombre, _ in sorted(
             self.tribunales.items(),
             key=lambda x: x[1]["prioridad"]
-        )
+        )]
         
         total_descargado = 0
+        interrumpido = False
         
-        for tribunal_name, tribunal_config in tribunales_ordenados:
-            try:
-                self.logger.info(f"\n{'='*60}")
-                self.logger.info(f"🏛️ PROCESANDO TRIBUNAL: {tribunal_name}")
-                self.logger.info(f"{'='*60}")
-                
-                sentencias = self.descargar_tribunal(tribunal_name)
-                total_descargado += sentencias
-                
-                # Pausa entre tribunales para evitar sobrecarga
-                self.logger.info(f"⏸️ Pausa de 30 segundos antes del siguiente tribunal...")
-                time.sleep(30)
-                
-            except KeyboardInterrupt:
-                self.logger.info("⏹️ Descarga interrumpida por usuario")
-                break
-            except Exception as e:
-                self.logger.error(f"❌ Error procesando {tribunal_name}: {e}")
-                continue
+        try:
+            while pendientes and not self.control.drenando:
+                # Un tribunal priorizado desde el canal de control pasa adelante
+                tribunal_name = self.control.prioritario if self.control.prioritario in pendientes else pendientes[0]
+                pendientes.remove(tribunal_name)
+                try:
+                    self.logger.info(f"\n{'='*60}")
+                    self.logger.info(f"🏛️ PROCESANDO TRIBUNAL: {tribunal_name}")
+                    self.logger.info(f"{'='*60}")
+                    
+                    with tramo(tribunal_name, "tribunal"):
+                        sentencias = self.descargar_tribunal(tribunal_name)
+                    total_descargado += sentencias
+                    
+                    # Pausa entre tribunales para evitar sobrecarga
+                    if pendientes and not self.control.drenando:
+                        pausa = self.config.seccion("horarios")["pausa_entre_tribunales"]
+                        self.logger.info(f"⏸️ Pausa de {pausa} segundos antes del siguiente tribunal...")
+                        time.sleep(pausa)
+                    
+                except KeyboardInterrupt:
+                    self.logger.info("⏹️ Descarga interrumpida por usuario")
+                    interrumpido = True
+                    break
+                except Exception as e:
+                    self.logger.error(f"❌ Error procesando {tribunal_name}: {e}")
+                    continue
+        finally:
+            self.cerrar_procesador()  # Sin esto el forkserver y sus semáforos quedan vivos
+        
+        if interrumpido or self.control.drenando:
+            self.estado["estado"] = "interrumpido"
+            self.save_estado()
+            self.logger.info("⏹️ Descarga drenada - estado guardado, puedes continuar más tarde")
+            return total_descargado
         
         self.estado["estado"] = "completado"
         self.estado["fin"] = datetime.now().isoformat()
@@ -376,9 +738,42 @@ class DescargadorUniversoCompleto:
         self.logger.info(f"⏰ Fin: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
         return total_descargado
+    
+    def tribunal_completado(self, tribunal_name):
+        """¿Quedó el tribunal marcado como completado en el estado?"""
+        return self.estado["tribunales"].get(tribunal_name, {}).get("estado") == "completado"
+
+def tribunal_de_argumentos(argv):
+    """Tribunal pedido con --tribunal=X (o --tribunal X) o None"""
+    for i, arg in enumerate(argv):
+        if arg.startswith('--tribunal='):
+            return arg.split('=', 1)[1]
+        if arg == '--tribunal' and i + 1 < len(argv):
+            return argv[i + 1]
+    return None
 
 def main():
     """Función principal"""
+    tribunal = tribunal_de_argumentos(sys.argv[1:])
+    if tribunal:
+        # Un solo tribunal (uso no interactivo, p. ej. pruebas o reintentos puntuales)
+        activar_desde_argv()
+        descargador = DescargadorUniversoCompleto()
+        descargador.delta_textos = '--delta-textos' in sys.argv
+        if tribunal not in descargador.tribunales:
+            print(f"❌ Tribunal desconocido: {tribunal} ({', '.join(descargador.tribunales)})")
+            sys.exit(1)
+        descargador.config.vigilar()
+        iniciar_servidor(descargador.control, puerto_de_argumentos())
+        try:
+            with descargador.control.senales():  # Ctrl+C drena: lo en vuelo termina y se guarda
+                descargador.descargar_tribunal(tribunal)
+        except KeyboardInterrupt:
+            print("\n⏹️ Descarga interrumpida - estado guardado")
+        finally:
+            descargador.cerrar_procesador()
+        sys.exit(0 if descargador.tribunal_completado(tribunal) else 1)
+    
     print("🌍 DESCARGA COMPLETA DEL UNIVERSO DE SENTENCIAS")
     print("=" * 60)
     print("⚠️  ADVERTENCIA: Este proceso puede tomar varios días")
@@ -392,13 +787,24 @@ def main():
         print("❌ Descarga cancelada")
         return
     
+    # Instrumentación opcional (--traza[=DIR])
+    activar_desde_argv()
+    
     # Crear descargador
     descargador = DescargadorUniversoCompleto()
+    descargador.delta_textos = '--delta-textos' in sys.argv
+    descargador.config.vigilar()  # Cambios en config_descarga_5_dias.json se aplican en caliente
+    iniciar_servidor(descargador.control, puerto_de_argumentos())
     
     try:
-        # Ejecutar descarga
-        total = descargador.ejecutar_descarga_completa()
-        print(f"\n✅ Descarga completada: {total:,} sentencias")
+        # Ejecutar descarga (Ctrl+C o SIGTERM drenan; una segunda señal corta sin esperar)
+        with descargador.control.senales():
+            total = descargador.ejecutar_descarga_completa()
+        if descargador.estado["estado"] == "interrumpido":
+            print(f"\n⏹️ Descarga drenada: {total:,} sentencias en esta corrida")
+            print("💾 Estado guardado - puedes continuar más tarde")
+        else:
+            print(f"\n✅ Descarga completada: {total:,} sentencias")
         
     except KeyboardInterrupt:
         print("\n⏹️ Descarga interrumpida por usuario")
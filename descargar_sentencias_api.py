@@ -8,15 +8,171 @@ Formato actualizado basado en la investigación con Playwright
 import sys
 import json
 import time
-import requests
+import threading
 from datetime import datetime
 from pathlib import Path
-from bs4 import BeautifulSoup
+
+from corpus_local import fecha_sentencia
+from presupuesto_ip import presupuesto_ip
+from cortacircuitos import cortacircuitos
+from trazas import tramo, etapa, activar_desde_argv
+
+class EscritorJSONIncremental:
+    """Escribe un arreglo JSON elemento a elemento sin mantenerlo en memoria
+    
+    El archivo resultante es un arreglo JSON normal, compatible con
+    preparar_para_supabase.py. Tras cada escritura el arreglo queda cerrado,
+    así un corte a mitad de la descarga conserva lo ya escrito. Con
+    `continuar` se agregan elementos a un arreglo existente.
+    """
+    
+    CIERRE = b'\n]\n'
+    
+    def __init__(self, ruta, continuar=False):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.total = 0
+        
+        if continuar and self.ruta.exists():
+            self.archivo = open(self.ruta, 'r+b')
+            contenido = self.archivo.read()
+            self.posicion = contenido.rindex(b']')
+            self.vacio = not contenido[contenido.index(b'[') + 1:self.posicion].strip()
+        else:
+            self.archivo = open(self.ruta, 'wb')
+            self.archivo.write(b'[')
+            self.posicion = 1
+            self.vacio = True
+            self.archivo.write(self.CIERRE)
+            self.archivo.flush()
+    
+    def escribir(self, elementos):
+        """Agregar elementos al arreglo"""
+        with tramo("write", "escritura", archivo=self.ruta.name):
+            self.archivo.seek(self.posicion)
+            for elemento in elementos:
+                self.archivo.write(b'\n' if self.vacio else b',\n')
+                self.archivo.write(json.dumps(elemento, ensure_ascii=False).encode('utf-8'))
+                self.vacio = False
+                self.total += 1
+            self.posicion = self.archivo.tell()
+            self.archivo.write(self.CIERRE)
+            self.archivo.truncate()
+            self.archivo.flush()
+    
+    def cerrar(self):
+        """Cerrar el archivo (el arreglo ya está cerrado)"""
+        if not self.archivo.closed:
+            self.archivo.close()
+
+class LimitadorSolicitudes:
+    """Presupuesto de solicitudes por segundo compartido entre hilos
+    
+    Cada llamada a esperar() reserva el siguiente turno libre y duerme hasta
+    él, de modo que varios workers juntos no superan el ritmo configurado.
+    """
+    
+    def __init__(self, por_segundo):
+        self.intervalo = 1.0 / por_segundo
+        self.siguiente = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def esperar(self):
+        """Bloquear hasta el turno de la próxima solicitud"""
+        with self.lock:
+            ahora = time.monotonic()
+            turno = max(self.siguiente, ahora)
+            self.siguiente = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+class SalidaPorDia:
+    """Salida de una descarga por fechas: un archivo por tribunal y día
+    
+    Cada página se reparte entre los archivos de sus días apenas llega y el
+    resumen se actualiza en disco, de modo que la memoria no crece con el
+    largo del rango y un corte conserva lo descargado hasta ese momento.
+    """
+    
+    def __init__(self, output_dir, fecha_desde, fecha_hasta, resumen_file=None):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.escritores = {}
+        self.archivos = set()
+        self.rango = f"{fecha_desde.replace('-', '')}_{fecha_hasta.replace('-', '')}"
+        self.resumen = {
+            'fecha_ejecucion': datetime.now().isoformat(),
+            'rango_fechas': {
+                'desde': fecha_desde,
+                'hasta': fecha_hasta
+            },
+            'total_sentencias': 0,
+            'por_tribunal': {},
+            'por_dia': {},
+            'archivos': []
+        }
+        self.resumen_file = Path(resumen_file) if resumen_file else (
+            self.output_dir / f"resumen_{fecha_desde.replace('-', '')}.json"
+        )
+    
+    def _escritor(self, tribunal_name, dia):
+        """Escritor del archivo de un tribunal y día (los de otros tribunales se cierran)"""
+        clave = (tribunal_name, dia)
+        if clave not in self.escritores:
+            for otra in [c for c in self.escritores if c[0] != tribunal_name]:
+                self.escritores.pop(otra).cerrar()
+            
+            # Las sentencias sin fecha no tienen día propio: su archivo es del rango pedido,
+            # para que ventanas distintas de un mismo tribunal no se pisen
+            nombre = f"sin-fecha_{self.rango}" if dia == 'sin-fecha' else dia.replace('-', '')
+            ruta = self.output_dir / tribunal_name / f"sentencias_{nombre}.json"
+            # Un día ya escrito en esta corrida se continúa; si no, se reemplaza
+            self.escritores[clave] = EscritorJSONIncremental(ruta, continuar=ruta in self.archivos)
+            self.archivos.add(ruta)
+        return self.escritores[clave]
+    
+    def agregar(self, tribunal_name, descripcion, docs, num_found):
+        """Escribir una página y actualizar el resumen"""
+        por_dia = {}
+        for doc in docs:
+            por_dia.setdefault(fecha_sentencia(doc) or 'sin-fecha', []).append(doc)
+        
+        for dia, sentencias in por_dia.items():
+            self._escritor(tribunal_name, dia).escribir(sentencias)
+            conteo = self.resumen['por_dia'].setdefault(dia, {})
+            conteo[tribunal_name] = conteo.get(tribunal_name, 0) + len(sentencias)
+        
+        info = self.resumen['por_tribunal'].setdefault(tribunal_name, {
+            'total': num_found,
+            'descargadas': 0,
+            'tribunal': descripcion
+        })
+        info['descargadas'] += len(docs)
+        self.resumen['total_sentencias'] += len(docs)
+        self.guardar_resumen()
+    
+    def guardar_resumen(self):
+        """Escribir el resumen parcial (escritura atómica)"""
+        self.resumen['archivos'] = sorted(str(ruta) for ruta in self.archivos)
+        tmp = self.resumen_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.resumen, f, ensure_ascii=False, indent=2)
+        tmp.replace(self.resumen_file)
+    
+    def cerrar(self):
+        """Cerrar los archivos abiertos y marcar el resumen como completo"""
+        for escritor in self.escritores.values():
+            escritor.cerrar()
+        self.escritores = {}
+        self.resumen['completado'] = datetime.now().isoformat()
+        self.guardar_resumen()
 
 class DescargadorSentencias:
     """Descargador de sentencias para GitHub Actions"""
     
     def __init__(self):
+        import requests  # Importación diferida: el CLI arranca sin cargar requests
+        
         self.base_url = "https://juris.pjud.cl"
         self.session = requests.Session()
         
@@ -43,11 +199,30 @@ class DescargadorSentencias:
             'Civiles': {'id': '328', 'descripcion': 'Tribunales Civiles'},
             'Cobranza': {'id': '269', 'descripcion': 'Tribunales de Cobranza'}
         }
+        
+        self.filas_por_pagina = 100
+        
+        # Presupuesto de solicitudes compartido entre hilos (LimitadorSolicitudes), opcional
+        self.limitador = None
+        # Presupuesto de la IP y cortacircuitos ante bloqueos, compartidos con los demás procesos
+        self.presupuesto = presupuesto_ip()
+        self.circuito = cortacircuitos()
+    
+    def _esperar_turno(self):
+        """Respetar el limitador asignado (si hay) y el presupuesto de la IP"""
+        if self.limitador:
+            self.limitador.esperar()
+        self.presupuesto.esperar()
     
-    def _get_token(self):
-        """Obtener token CSRF"""
+    def obtener_token(self):
+        """Obtener token CSRF (para contar_sentencias, iterar_paginas o descargar_sentencias_fecha)"""
+        from bs4 import BeautifulSoup
+        
         try:
-            response = self.session.get(f"{self.base_url}/busqueda/lista_buscadores")
+            with tramo("get_token", "red"):
+                response = self.circuito.solicitar(
+                    self.session.get, f"{self.base_url}/busqueda/lista_buscadores", turno=self._esperar_turno
+                )
             soup = BeautifulSoup(response.text, 'html.parser')
             token_meta = soup.find('meta', {'name': 'csrf-token'})
             
@@ -62,27 +237,96 @@ class DescargadorSentencias:
     def _establish_context(self, tribunal_name):
         """Establecer contexto del tribunal"""
         try:
-            response = self.session.get(f"{self.base_url}/busqueda?{tribunal_name}")
+            with tramo("establish_context", "red", tribunal=tribunal_name):
+                response = self.circuito.solicitar(
+                    self.session.get, f"{self.base_url}/busqueda?{tribunal_name}", turno=self._esperar_turno
+                )
             return response.status_code == 200
         except Exception as e:
             print(f"⚠️ Error estableciendo contexto: {e}")
             return False
     
-    def descargar_sentencias_fecha(self, fecha_desde, fecha_hasta):
-        """Descargar sentencias para un rango de fechas específico"""
-        print(f"📅 Descargando sentencias: {fecha_desde} a {fecha_hasta}")
-        print("=" * 60)
+    def _buscar_pagina(self, token, tribunal_name, tribunal_config, fecha_desde, fecha_hasta, offset, filas=None):
+        """Solicitar una página de resultados para un tribunal"""
+        # Formato correcto: multipart/form-data
+        data = {
+            '_token': token,
+            'id_buscador': tribunal_config['id'],
+            'filtros': json.dumps({
+                "rol": "",
+                "era": "",
+                "fec_desde": fecha_desde,
+                "fec_hasta": fecha_hasta,
+                "tipo_norma": "",
+                "num_norma": "",
+                "num_art": "",
+                "num_inciso": "",
+                "todas": "",
+                "algunas": "",
+                "excluir": "",
+                "literal": "",
+                "proximidad": "",
+                "distancia": "",
+                "analisis_s": "",
+                "submaterias": "",
+                "facetas_seleccionadas": [],
+                "filtros_omnibox": [],
+                "ids_comunas_seleccionadas_mapa": []
+            }),
+            'numero_filas_paginacion': str(filas or self.filas_por_pagina),
+            'offset_paginacion': str(offset),
+            'orden': 'recientes',
+            'personalizacion': 'false'
+        }
+        
+        headers = {
+            'Referer': f'https://juris.pjud.cl/busqueda?{tribunal_name}',
+            'Accept': 'text/html, */*; q=0.01'
+        }
+        
+        # Con el circuito abierto (bloqueo) lanza CircuitoAbierto sin enviar nada
+        with tramo("post", "red", tribunal=tribunal_name, offset=offset):
+            response = self.circuito.solicitar(
+                self.session.post,
+                f"{self.base_url}/busqueda/buscar_sentencias",
+                data=data,
+                headers=headers,
+                turno=self._esperar_turno
+            )
+        
+        if response.status_code != 200:
+            return None
+        
+        with tramo("decode", "cpu", bytes=len(response.content)):
+            result = response.json()
+        if 'response' not in result:
+            return None
         
-        todas_sentencias = []
-        total_por_tribunal = {}
+        return result['response']
+    
+    def contar_sentencias(self, token, tribunal_name, fecha_desde, fecha_hasta):
+        """Total de sentencias de un tribunal en un rango (consulta de una fila) o None"""
+        pagina = self._buscar_pagina(
+            token, tribunal_name, self.tribunales[tribunal_name], fecha_desde, fecha_hasta, 0, filas=1
+        )
+        if pagina is None:
+            return None
+        return pagina.get('numFound', 0)
+    
+    def iterar_paginas(self, fecha_desde, fecha_hasta, token=None):
+        """Recorrer página a página las sentencias de todos los tribunales
         
+        Genera tuplas (tribunal_name, docs, num_found) a medida que llegan,
+        sin acumular el rango completo en memoria. Con `token` se usa ese
+        token CSRF en vez de pedir uno nuevo por tribunal.
+        """
         for tribunal_name, tribunal_config in self.tribunales.items():
             print(f"\n🏛️ {tribunal_config['descripcion']}...")
             
             try:
-                # Obtener token
-                token = self._get_token()
-                if not token:
+                # Obtener token (salvo que ya venga uno)
+                token_tribunal = token or self.obtener_token()
+                if not token_tribunal:
                     print(f"❌ No se pudo obtener token")
                     continue
                 
@@ -91,124 +335,76 @@ class DescargadorSentencias:
                     print(f"❌ No se pudo establecer contexto")
                     continue
                 
-                # Formato correcto: multipart/form-data
-                data = {
-                    '_token': token,
-                    'id_buscador': tribunal_config['id'],
-                    'filtros': json.dumps({
-                        "rol": "",
-                        "era": "",
-                        "fec_desde": fecha_desde,
-                        "fec_hasta": fecha_hasta,
-                        "tipo_norma": "",
-                        "num_norma": "",
-                        "num_art": "",
-                        "num_inciso": "",
-                        "todas": "",
-                        "algunas": "",
-                        "excluir": "",
-                        "literal": "",
-                        "proximidad": "",
-                        "distancia": "",
-                        "analisis_s": "",
-                        "submaterias": "",
-                        "facetas_seleccionadas": [],
-                        "filtros_omnibox": [],
-                        "ids_comunas_seleccionadas_mapa": []
-                    }),
-                    'numero_filas_paginacion': '100',
-                    'offset_paginacion': '0',
-                    'orden': 'recientes',
-                    'personalizacion': 'false'
-                }
-                
-                headers = {
-                    'Referer': f'https://juris.pjud.cl/busqueda?{tribunal_name}',
-                    'Accept': 'text/html, */*; q=0.01'
-                }
-                
-                response = self.session.post(
-                    f"{self.base_url}/busqueda/buscar_sentencias",
-                    data=data,
-                    headers=headers
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
+                offset = 0
+                while True:
+                    pagina = self._buscar_pagina(
+                        token_tribunal, tribunal_name, tribunal_config, fecha_desde, fecha_hasta, offset
+                    )
+                    if pagina is None:
+                        break
                     
-                    if 'response' in result:
-                        num_found = result['response'].get('numFound', 0)
-                        docs = result['response'].get('docs', [])
-                        
+                    num_found = pagina.get('numFound', 0)
+                    docs = pagina.get('docs', [])
+                    
+                    if offset == 0:
                         print(f"   📊 Encontradas: {num_found}")
-                        print(f"   📄 Descargadas: {len(docs)}")
-                        
-                        if len(docs) > 0:
-                            todas_sentencias.extend(docs)
-                            total_por_tribunal[tribunal_name] = {
-                                'total': num_found,
-                                'descargadas': len(docs),
-                                'tribunal': tribunal_config['descripcion']
-                            }
+                    
+                    if not docs:
+                        break
+                    
+                    print(f"   📄 Página offset {offset}: {len(docs)} sentencias")
+                    yield tribunal_name, docs, num_found
+                    
+                    offset += len(docs)
+                    if offset >= num_found:
+                        break
+                    
+                    time.sleep(1)  # Delay entre páginas
                 
                 time.sleep(1)  # Delay entre tribunales
                 
             except Exception as e:
                 print(f"❌ Error: {e}")
                 continue
-        
-        return todas_sentencias, total_por_tribunal
     
-    def guardar_resultados(self, sentencias, total_por_tribunal, fecha_desde, fecha_hasta):
-        """Guardar resultados en formato JSON"""
-        output_dir = Path("output/descarga_api")
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Guardar sentencias
-        fecha_str = fecha_desde.replace('-', '')
-        sentencias_file = output_dir / f"sentencias_{fecha_str}.json"
+    def descargar_sentencias_fecha(self, fecha_desde, fecha_hasta, output_dir="output/descarga_api", resumen_file=None,
+                                   token=None):
+        """Descargar sentencias para un rango de fechas específico
         
-        with open(sentencias_file, 'w', encoding='utf-8') as f:
-            json.dump(sentencias, f, ensure_ascii=False, indent=2)
-        
-        # Guardar para Supabase (formato compatible)
-        supabase_file = output_dir / "sentencias_para_supabase.json"
-        with open(supabase_file, 'w', encoding='utf-8') as f:
-            json.dump(sentencias, f, ensure_ascii=False, indent=2)
-        
-        # Guardar resumen
-        resumen = {
-            'fecha_ejecucion': datetime.now().isoformat(),
-            'rango_fechas': {
-                'desde': fecha_desde,
-                'hasta': fecha_hasta
-            },
-            'total_sentencias': len(sentencias),
-            'por_tribunal': total_por_tribunal,
-            'archivo_sentencias': str(sentencias_file),
-            'archivo_supabase': str(supabase_file)
-        }
+        Las páginas se escriben a medida que llegan en
+        output_dir/<tribunal>/sentencias_YYYYMMDD.json (las sin fecha, en
+        sentencias_sin-fecha_DESDE_HASTA.json). Devuelve el resumen.
+        """
+        print(f"📅 Descargando sentencias: {fecha_desde} a {fecha_hasta}")
+        print("=" * 60)
         
-        resumen_file = output_dir / f"resumen_{fecha_str}.json"
-        with open(resumen_file, 'w', encoding='utf-8') as f:
-            json.dump(resumen, f, ensure_ascii=False, indent=2)
+        salida = SalidaPorDia(output_dir, fecha_desde, fecha_hasta, resumen_file)
+        try:
+            with etapa("descarga"):
+                for tribunal_name, docs, num_found in self.iterar_paginas(fecha_desde, fecha_hasta, token):
+                    salida.agregar(tribunal_name, self.tribunales[tribunal_name]['descripcion'], docs, num_found)
+        finally:
+            salida.cerrar()
         
         print(f"\n💾 Archivos guardados:")
-        print(f"   - {sentencias_file}")
-        print(f"   - {supabase_file}")
-        print(f"   - {resumen_file}")
+        for archivo in salida.resumen['archivos']:
+            print(f"   - {archivo}")
+        print(f"   - {salida.resumen_file}")
         
-        return sentencias_file, supabase_file, resumen_file
+        return salida.resumen
 
 def main():
     """Función principal"""
-    if len(sys.argv) < 3:
-        print("Uso: python descargar_sentencias_api.py FECHA_DESDE FECHA_HASTA")
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    
+    if len(args) < 2:
+        print("Uso: python descargar_sentencias_api.py FECHA_DESDE FECHA_HASTA [--traza[=DIR]] [--profile]")
         print("Ejemplo: python descargar_sentencias_api.py 2025-03-01 2025-03-01")
         sys.exit(1)
     
-    fecha_desde = sys.argv[1]
-    fecha_hasta = sys.argv[2]
+    fecha_desde = args[0]
+    fecha_hasta = args[1]
+    activar_desde_argv()
     
     # Validar formato de fecha
     try:
@@ -223,16 +419,14 @@ def main():
     print("=" * 60)
     
     descargador = DescargadorSentencias()
-    sentencias, total_por_tribunal = descargador.descargar_sentencias_fecha(fecha_desde, fecha_hasta)
+    resumen = descargador.descargar_sentencias_fecha(fecha_desde, fecha_hasta)
     
-    if sentencias:
-        archivos = descargador.guardar_resultados(sentencias, total_por_tribunal, fecha_desde, fecha_hasta)
-        
+    if resumen['total_sentencias']:
         print("\n" + "=" * 60)
         print(f"✅ DESCARGA COMPLETADA")
-        print(f"📊 Total de sentencias: {len(sentencias)}")
+        print(f"📊 Total de sentencias: {resumen['total_sentencias']}")
         print("\n📋 POR TRIBUNAL:")
-        for tribunal, info in total_por_tribunal.items():
+        for tribunal, info in resumen['por_tribunal'].items():
             print(f"   {info['tribunal']}: {info['descargadas']} de {info['total']}")
     else:
         print("\n⚠️ No se encontraron sentencias para el rango especificado")
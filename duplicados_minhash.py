@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Detección de sentencias casi duplicadas con MinHash + LSH
+Calcula firmas MinHash del texto normalizado en lotes vectorizados, busca
+candidatos por bandas LSH (sin comparar todos contra todos) y persiste
+firmas y buckets para revisar los batches nuevos contra el corpus existente
+"""
+
+import re
+import sys
+import json
+import zlib
+import sqlite3
+from functools import lru_cache
+from datetime import datetime
+from pathlib import Path
+
+from corpus_local import iterar_batches, firma_archivo
+from normalizar_textos import normalizar_html
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BASE_DEFAULT = "output/duplicados.sqlite"
+
+NUM_PERMUTACIONES = 128
+BANDAS = 16                        # 16 bandas x 8 filas: umbral LSH ~0.7
+FILAS_POR_BANDA = NUM_PERMUTACIONES // BANDAS
+LARGO_SHINGLE = 5                  # Shingles de 5 palabras
+UMBRAL_SIMILITUD = 0.8             # Jaccard estimado mínimo para considerar duplicado
+MIN_PALABRAS = 50                  # Textos más cortos no son comparables
+MAX_SHINGLES_POR_LOTE = 50000      # Acota la matriz permutaciones x shingles (~25 MB)
+SEMILLA = 20240102
+
+_PALABRA = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=2**18)
+def hash_palabra(palabra):
+    """Hash estable de 32 bits de una palabra (el vocabulario se repite mucho)"""
+    return zlib.crc32(palabra.encode('utf-8'))
+
+
+def palabras_texto(sentencia):
+    """Palabras del texto normalizado de la sentencia"""
+    texto = normalizar_html(sentencia.get('texto_sentencia'))
+    return _PALABRA.findall(texto.lower())
+
+
+class DetectorDuplicados:
+    """Firmas MinHash, índice LSH persistente y pares casi duplicados"""
+
+    def __init__(self, ruta=BASE_DEFAULT):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.ruta)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.crear_esquema()
+
+        # Permutaciones fijas para que las firmas persistidas sean comparables
+        rng = np.random.default_rng(SEMILLA)
+        # Aritmética uint32: el desborde equivale a trabajar módulo 2^32
+        self.a = rng.integers(1, 2**32, NUM_PERMUTACIONES, dtype=np.uint32) | np.uint32(1)
+        self.b = rng.integers(0, 2**32, NUM_PERMUTACIONES, dtype=np.uint32)
+        self.pesos_shingle = np.array(
+            [pow(1000003, i, 2**32) for i in range(LARGO_SHINGLE)], dtype=np.uint64
+        )
+        self.pesos_banda = rng.integers(1, 2**62, FILAS_POR_BANDA, dtype=np.uint64)
+
+    def crear_esquema(self):
+        """Crear tablas si no existen"""
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS firmas (
+                idx INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                tribunal TEXT,
+                firma BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                banda INTEGER NOT NULL,
+                clave INTEGER NOT NULL,
+                idx INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_buckets ON buckets(banda, clave);
+            CREATE TABLE IF NOT EXISTS pares (
+                idx_a INTEGER NOT NULL,
+                idx_b INTEGER NOT NULL,
+                similitud REAL NOT NULL,
+                PRIMARY KEY (idx_a, idx_b)
+            );
+            CREATE TABLE IF NOT EXISTS batches_procesados (
+                ruta TEXT PRIMARY KEY,
+                firma TEXT
+            );
+        """)
+
+    def _hashes_shingles(self, palabras):
+        """Hashes de 32 bits de los shingles de palabras (combinación vectorizada)"""
+        tokens = np.fromiter(map(hash_palabra, palabras), dtype=np.uint64, count=len(palabras))
+        n = len(tokens) - LARGO_SHINGLE + 1
+        hashes = np.zeros(n, dtype=np.uint64)
+        for i in range(LARGO_SHINGLE):
+            hashes += tokens[i:i + n] * self.pesos_shingle[i]
+        return np.unique((hashes & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+
+    def calcular_firmas(self, textos):
+        """Firmas MinHash (n_textos x NUM_PERMUTACIONES, uint32) de una lista de listas de palabras"""
+        firmas = np.empty((len(textos), NUM_PERMUTACIONES), dtype=np.uint32)
+        shingles = [self._hashes_shingles(palabras) for palabras in textos]
+
+        inicio = 0
+        while inicio < len(shingles):
+            # Agrupar textos hasta MAX_SHINGLES_POR_LOTE y procesarlos en una sola operación
+            fin, total = inicio, 0
+            while fin < len(shingles) and (fin == inicio or total + len(shingles[fin]) <= MAX_SHINGLES_POR_LOTE):
+                total += len(shingles[fin])
+                fin += 1
+
+            grupo = np.concatenate(shingles[inicio:fin])
+            offsets = np.cumsum([0] + [len(s) for s in shingles[inicio:fin - 1]])
+            permutados = self.a[:, None] * grupo[None, :] + self.b[:, None]
+            firmas[inicio:fin] = np.minimum.reduceat(permutados, offsets, axis=1).T
+            inicio = fin
+
+        return firmas
+
+    def claves_bandas(self, firmas):
+        """Clave LSH de 63 bits por banda (n_textos x BANDAS)"""
+        bandas = firmas.astype(np.uint64).reshape(len(firmas), BANDAS, FILAS_POR_BANDA)
+        claves = (bandas * self.pesos_banda).sum(axis=2) & np.uint64(0x7FFFFFFFFFFFFFFF)
+        return claves.astype(np.int64)
+
+    def agregar(self, tribunal, sentencias):
+        """Agregar sentencias al índice y registrar sus casi duplicados. Devuelve pares nuevos"""
+        ids, textos = [], []
+        vistos = set()   # Un batch puede repetir una sentencia (páginas solapadas)
+        for sentencia in sentencias:
+            id_sentencia = str(sentencia.get('id') or '')
+            if not id_sentencia or id_sentencia in vistos:
+                continue
+            vistos.add(id_sentencia)
+            existe = self.conn.execute("SELECT 1 FROM firmas WHERE id = ?", (id_sentencia,)).fetchone()
+            if existe:
+                continue
+            palabras = palabras_texto(sentencia)
+            if len(palabras) < MIN_PALABRAS:
+                continue
+            ids.append(id_sentencia)
+            textos.append(palabras)
+
+        if not ids:
+            return 0
+
+        firmas = self.calcular_firmas(textos)
+        claves = self.claves_bandas(firmas)
+        pares_nuevos = 0
+
+        for i, id_sentencia in enumerate(ids):
+            cursor = self.conn.execute(
+                "INSERT INTO firmas (id, tribunal, firma) VALUES (?, ?, ?)",
+                (id_sentencia, tribunal, firmas[i].tobytes())
+            )
+            idx = cursor.lastrowid
+
+            # Candidatos: comparten al menos una banda completa
+            candidatos = set()
+            for banda in range(BANDAS):
+                clave = int(claves[i, banda])
+                candidatos.update(fila[0] for fila in self.conn.execute(
+                    "SELECT idx FROM buckets WHERE banda = ? AND clave = ?", (banda, clave)
+                ))
+            self.conn.executemany(
+                "INSERT INTO buckets (banda, clave, idx) VALUES (?, ?, ?)",
+                [(banda, int(claves[i, banda]), idx) for banda in range(BANDAS)]
+            )
+
+            # Verificar candidatos con la similitud estimada por la firma completa
+            for candidato in candidatos:
+                firma_candidato = np.frombuffer(self.conn.execute(
+                    "SELECT firma FROM firmas WHERE idx = ?", (candidato,)
+                ).fetchone()[0], dtype=np.uint32)
+                similitud = float(np.mean(firma_candidato == firmas[i]))
+                if similitud >= UMBRAL_SIMILITUD:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO pares (idx_a, idx_b, similitud) VALUES (?, ?, ?)",
+                        (min(idx, candidato), max(idx, candidato), similitud)
+                    )
+                    pares_nuevos += 1
+
+        return pares_nuevos
+
+    def procesar_directorio(self, directorio):
+        """Procesar los batches nuevos de un directorio"""
+        procesados = dict(self.conn.execute("SELECT ruta, firma FROM batches_procesados"))
+        total_batches = 0
+        total_pares = 0
+
+        for tribunal, ruta_batch, sentencias in iterar_batches(directorio):
+            firma = firma_archivo(ruta_batch)
+            if procesados.get(str(ruta_batch)) == firma:
+                continue
+
+            with self.conn:
+                pares = self.agregar(tribunal, sentencias)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO batches_procesados (ruta, firma) VALUES (?, ?)",
+                    (str(ruta_batch), firma)
+                )
+
+            total_batches += 1
+            total_pares += pares
+            print(f"   ✅ {tribunal} - {ruta_batch.name}: {len(sentencias)} sentencias, {pares} pares")
+
+        return total_batches, total_pares
+
+    def clusters(self):
+        """Agrupar pares en clusters de casi duplicados (union-find)"""
+        padre = {}
+
+        def raiz(x):
+            while padre.setdefault(x, x) != x:
+                padre[x] = padre[padre[x]]
+                x = padre[x]
+            return x
+
+        for idx_a, idx_b in self.conn.execute("SELECT idx_a, idx_b FROM pares"):
+            ra, rb = raiz(idx_a), raiz(idx_b)
+            if ra != rb:
+                padre[max(ra, rb)] = min(ra, rb)
+
+        grupos = {}
+        for idx in padre:
+            grupos.setdefault(raiz(idx), []).append(idx)
+
+        info = dict((idx, (id_sentencia, tribunal)) for idx, id_sentencia, tribunal in
+                    self.conn.execute("SELECT idx, id, tribunal FROM firmas WHERE idx IN (SELECT idx_a FROM pares UNION SELECT idx_b FROM pares)"))
+
+        resultado = []
+        for miembros in grupos.values():
+            if len(miembros) < 2:
+                continue
+            resultado.append({
+                "representante": info[min(miembros)][0],
+                "sentencias": [
+                    {"id": info[idx][0], "tribunal": info[idx][1]} for idx in sorted(miembros)
+                ]
+            })
+        resultado.sort(key=lambda c: len(c["sentencias"]), reverse=True)
+        return resultado
+
+    def cerrar(self):
+        """Cerrar conexión"""
+        self.conn.close()
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+
+    if len(args) < 1:
+        print("Uso: python duplicados_minhash.py DIRECTORIO_BATCHES [--base=RUTA] [--salida=clusters.json]")
+        print("Ejemplo: python duplicados_minhash.py output/universo_completo")
+        sys.exit(1)
+
+    if np is None:
+        print("❌ Error: se requiere numpy (pip install numpy)")
+        sys.exit(1)
+
+    print("🧬 DETECTANDO SENTENCIAS CASI DUPLICADAS")
+    print("=" * 60)
+
+    detector = DetectorDuplicados(opciones.get('base', BASE_DEFAULT))
+    total_batches, total_pares = detector.procesar_directorio(args[0])
+    clusters = detector.clusters()
+    detector.cerrar()
+
+    salida = Path(opciones.get('salida', "output/clusters_duplicados.json"))
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({
+            "fecha": datetime.now().isoformat(),
+            "umbral_similitud": UMBRAL_SIMILITUD,
+            "total_clusters": len(clusters),
+            "clusters": clusters
+        }, f, ensure_ascii=False, indent=2)
+
+    print(f"\n✅ Detección completada")
+    print(f"📦 Batches nuevos: {total_batches}")
+    print(f"🔗 Pares nuevos: {total_pares}")
+    print(f"🧩 Clusters totales: {len(clusters)}")
+    print(f"💾 Archivo generado: {salida}")
+
+
+if __name__ == "__main__":
+    main()
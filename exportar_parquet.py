@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Exportar metadatos de sentencias a Parquet particionado por tribunal y año
+Las consultas analíticas leen solo las columnas que necesitan en vez de
+volver a parsear los batch_*.json completos
+"""
+
+import sys
+import json
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+from corpus_local import (
+    CAMPOS_TEXTO, iterar_batches, firma_archivo, anio_sentencia, fecha_sentencia, tribunal_de_batch
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Campos sin sufijo de tipo Solr, o cuyo sufijo no corresponde a los datos reales
+TIPOS_ESPECIALES = {
+    '_version_': 'int',
+    'id_instancia': 'int',
+    'tip_causa_juz_i': 'texto',     # Letras: 'O', 'C', 'I'...
+    'flg_reserva_i': 'texto',       # 'NO' en parte de los tribunales
+    'crr_documento_id_i': 'texto',  # Compuesto en Laborales y Familia: '1082070-15697238'
+}
+
+
+def tipo_campo(nombre):
+    """Inferir el tipo de columna a partir del sufijo Solr del campo"""
+    if nombre in TIPOS_ESPECIALES:
+        return TIPOS_ESPECIALES[nombre]
+    if nombre.endswith('_ss'):
+        return 'lista'
+    if nombre.endswith('_i'):
+        return 'int'
+    if nombre.endswith('_dt'):
+        return 'fecha'
+    return 'texto'
+
+
+def tipo_arrow(tipo):
+    """Tipo Arrow equivalente"""
+    return {
+        'int': pa.int64(),
+        'lista': pa.list_(pa.string()),
+        'fecha': pa.timestamp('s', tz='UTC'),
+        'texto': pa.string(),
+    }[tipo]
+
+
+def convertir_valor(valor, tipo):
+    """Convertir un valor JSON al tipo de su columna (None si no calza)"""
+    if valor is None:
+        return None
+
+    if tipo == 'int':
+        try:
+            return int(valor)
+        except (TypeError, ValueError):
+            return None
+    if tipo == 'lista':
+        if not isinstance(valor, list):
+            valor = [valor]
+        return [str(v) for v in valor]
+    if tipo == 'fecha':
+        try:
+            return datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return str(valor)
+
+
+class ExportadorParquet:
+    """Exportador incremental: cada batch nuevo agrega archivos a sus particiones"""
+
+    def __init__(self, input_dir, output_dir="output/parquet", con_textos=False):
+        self.input_dir = Path(input_dir)
+        self.output_dir = Path(output_dir)
+        self.con_textos = con_textos
+        self.estado_file = self.output_dir / "estado_exportacion.json"
+        self.cargar_estado()
+
+    def cargar_estado(self):
+        """Cargar registro de batches ya exportados"""
+        if self.estado_file.exists():
+            with open(self.estado_file, 'r') as f:
+                self.estado = json.load(f)
+        else:
+            self.estado = {"batches": {}, "columnas": {}}
+
+        # Estados anteriores solo guardaban la firma: ubicar sus particiones en disco
+        for ruta_batch, registro in self.estado["batches"].items():
+            if isinstance(registro, str):
+                self.estado["batches"][ruta_batch] = {
+                    "firma": registro,
+                    "particiones": self._particiones_en_disco(tribunal_de_batch(ruta_batch), ruta_batch),
+                }
+
+        # Tipos corregidos a mano prevalecen sobre los inferidos en ejecuciones previas
+        for nombre, tipo in TIPOS_ESPECIALES.items():
+            if nombre in self.estado["columnas"]:
+                self.estado["columnas"][nombre] = tipo
+
+    def guardar_estado(self):
+        """Guardar registro de batches exportados"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.estado["ultima_actualizacion"] = datetime.now().isoformat()
+        with open(self.estado_file, 'w') as f:
+            json.dump(self.estado, f, indent=2)
+
+    def esquema(self):
+        """Esquema unificado de todas las columnas exportadas hasta ahora"""
+        return pa.schema([
+            (nombre, tipo_arrow(tipo)) for nombre, tipo in sorted(self.estado["columnas"].items())
+        ])
+
+    def _tabla(self, filas, columnas):
+        """Construir una tabla Arrow tipada"""
+        campos = [(nombre, tipo_arrow(tipo)) for nombre, tipo in columnas]
+        datos = {}
+        for nombre, tipo in columnas:
+            valores = [fila.get(nombre) for fila in filas]
+            if tipo == 'texto':
+                valores = [None if v is None else str(v) for v in valores]
+            datos[nombre] = valores
+        return pa.table(datos, schema=pa.schema(campos))
+
+    def _archivo_parte(self, seccion, tribunal, anio, ruta_batch):
+        """Archivo de un batch en una partición (nombre estable: re-exportar lo sobrescribe)"""
+        nombre_parte = hashlib.blake2b(str(ruta_batch).encode(), digest_size=8).hexdigest()
+        return self.output_dir / seccion / f"tribunal={tribunal}" / f"anio={anio}" / f"parte-{nombre_parte}.parquet"
+
+    def _particiones_en_disco(self, tribunal, ruta_batch):
+        """Años en que existe un archivo del batch"""
+        nombre = self._archivo_parte("metadatos", tribunal, 0, ruta_batch).name
+        return sorted(
+            int(archivo.parent.name.split('=', 1)[1])
+            for archivo in (self.output_dir / "metadatos" / f"tribunal={tribunal}").glob(f"anio=*/{nombre}")
+        )
+
+    def _quitar_particiones(self, tribunal, ruta_batch, anios):
+        """Borrar los archivos del batch en particiones que ya no le corresponden"""
+        for anio in anios:
+            for seccion in ("metadatos", "textos"):
+                self._archivo_parte(seccion, tribunal, anio, ruta_batch).unlink(missing_ok=True)
+
+    def exportar_batch(self, tribunal, ruta_batch, sentencias):
+        """Exportar un batch a las particiones tribunal=/anio= que correspondan
+
+        Devuelve los años de las particiones escritas.
+        """
+        particiones = {}
+
+        for sentencia in sentencias:
+            fila = {'fecha_sentencia': fecha_sentencia(sentencia)}
+            for nombre, valor in sentencia.items():
+                if nombre in CAMPOS_TEXTO:
+                    continue
+                tipo = self.estado["columnas"].setdefault(nombre, tipo_campo(nombre))
+                convertido = convertir_valor(valor, tipo)
+                if convertido is None and valor is not None and tipo == 'int':
+                    # Un valor no numérico pasa la columna a texto en vez de perderlo
+                    print(f"   ⚠️ {nombre}: valor no numérico {valor!r}, la columna pasa a texto")
+                    self.estado["columnas"][nombre] = 'texto'
+                    convertido = str(valor)
+                fila[nombre] = convertido
+
+            anio = anio_sentencia(sentencia) or 0
+            particiones.setdefault(anio, []).append((fila, sentencia))
+
+        for anio, filas in particiones.items():
+            archivo = self._archivo_parte("metadatos", tribunal, anio, ruta_batch)
+            archivo.parent.mkdir(parents=True, exist_ok=True)
+
+            columnas = sorted({'fecha_sentencia': 'texto', **self.estado["columnas"]}.items())
+            tabla = self._tabla([fila for fila, _ in filas], columnas)
+            pq.write_table(tabla, archivo, compression='zstd')
+
+            if self.con_textos:
+                archivo_textos = self._archivo_parte("textos", tribunal, anio, ruta_batch)
+                archivo_textos.parent.mkdir(parents=True, exist_ok=True)
+
+                columnas_texto = [('id', 'texto')] + [(c, 'texto') for c in CAMPOS_TEXTO]
+                filas_texto = []
+                for _, sentencia in filas:
+                    fila_texto = {'id': sentencia.get('id')}
+                    for campo in CAMPOS_TEXTO:
+                        valor = sentencia.get(campo)
+                        if isinstance(valor, list):
+                            valor = '\n'.join(str(v) for v in valor)
+                        fila_texto[campo] = valor
+                    filas_texto.append(fila_texto)
+
+                tabla_textos = self._tabla(filas_texto, columnas_texto)
+                pq.write_table(tabla_textos, archivo_textos, compression='zstd')
+
+        return sorted(particiones)
+
+    def exportar(self):
+        """Exportar solo los batches nuevos o modificados desde la última ejecución
+
+        Si un batch reescrito ya no tiene filas de algún año, su archivo en
+        esa partición se borra para no dejar filas obsoletas.
+        """
+        exportados = self.estado["batches"]
+        total_batches = 0
+        total_sentencias = 0
+
+        for tribunal, ruta_batch, sentencias in iterar_batches(self.input_dir):
+            firma = firma_archivo(ruta_batch)
+            anterior = exportados.get(str(ruta_batch))
+            if anterior and anterior["firma"] == firma:
+                continue
+
+            anios = self.exportar_batch(tribunal, ruta_batch, sentencias)
+            if anterior:
+                self._quitar_particiones(tribunal, ruta_batch, set(anterior["particiones"]) - set(anios))
+            total_sentencias += len(sentencias)
+            exportados[str(ruta_batch)] = {"firma": firma, "particiones": anios}
+            total_batches += 1
+            print(f"   ✅ {tribunal} - {ruta_batch.name}: {len(sentencias)} sentencias")
+
+            # Guardar progreso cada 10 batches
+            if total_batches % 10 == 0:
+                self.guardar_estado()
+
+        self.guardar_estado()
+        return total_batches, total_sentencias
+
+
+def abrir_dataset(output_dir="output/parquet"):
+    """Abrir el dataset de metadatos con el esquema unificado y particiones hive"""
+    import pyarrow.dataset as ds
+
+    exportador = ExportadorParquet(".", output_dir)
+    return ds.dataset(
+        Path(output_dir) / "metadatos",
+        format="parquet",
+        partitioning="hive",
+        schema=pa.unify_schemas([
+            exportador.esquema(),
+            pa.schema([('fecha_sentencia', pa.string()), ('tribunal', pa.string()), ('anio', pa.int32())])
+        ])
+    )
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+
+    if len(args) < 1:
+        print("Uso: python exportar_parquet.py DIRECTORIO_BATCHES [DIRECTORIO_SALIDA] [--con-textos]")
+        print("Ejemplo: python exportar_parquet.py output/universo_completo output/parquet")
+        sys.exit(1)
+
+    if pa is None:
+        print("❌ Error: se requiere pyarrow (pip install pyarrow)")
+        sys.exit(1)
+
+    input_dir = args[0]
+    output_dir = args[1] if len(args) > 1 else "output/parquet"
+
+    print("🗂️ EXPORTANDO METADATOS A PARQUET")
+    print("=" * 60)
+
+    exportador = ExportadorParquet(input_dir, output_dir, con_textos='--con-textos' in sys.argv)
+    total_batches, total_sentencias = exportador.exportar()
+
+    print(f"\n✅ Exportación completada")
+    print(f"📦 Batches nuevos: {total_batches}")
+    print(f"📊 Sentencias exportadas: {total_sentencias:,}")
+    print(f"💾 Dataset: {Path(output_dir) / 'metadatos'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Agregación incremental de facetas del corpus
+Mantiene conteos por tribunal de materia, juez, resultado del recurso, sala
+y mes a medida que se escriben los batches, con valores internados como
+enteros y contadores en arreglos. Permite totales agregados al instante y
+comparar contra corridas anteriores
+"""
+
+import sys
+import json
+import array
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from corpus_local import listar_batches, tribunal_de_batch, leer_batch, firma_archivo, fecha_sentencia
+
+FACETAS_DEFAULT = "output/facetas"
+
+FACETAS = ('materia', 'juez', 'resultado', 'sala', 'mes')
+
+
+def _lista(valor):
+    """Valores de un campo que puede venir como string o lista"""
+    if not valor:
+        return []
+    if isinstance(valor, list):
+        return [str(v).strip() for v in valor if v and str(v).strip()]
+    valor = str(valor).strip()
+    return [valor] if valor else []
+
+
+def valores_facetas(sentencia):
+    """Valores de cada faceta para una sentencia"""
+    fecha = fecha_sentencia(sentencia)
+    return {
+        'materia': _lista(sentencia.get('gls_materia_ss') or sentencia.get('gls_materia_s')),
+        'juez': _lista(sentencia.get('gls_juez_ss')),
+        'resultado': _lista(sentencia.get('resultado_recurso_sup_s')),
+        'sala': _lista(sentencia.get('gls_sala_sup_s')),
+        'mes': [fecha[:7]] if fecha else [],
+    }
+
+
+def contar_facetas(sentencias):
+    """Conteo de valores por faceta de un batch (sin estado: sirve en otro proceso)"""
+    conteos = {faceta: Counter() for faceta in FACETAS}
+    for sentencia in sentencias:
+        for faceta, valores in valores_facetas(sentencia).items():
+            conteos[faceta].update(valores)
+    return conteos
+
+
+class AgregadorFacetas:
+    """Contadores por tribunal y faceta indexados por el número del valor internado
+
+    Cada batch deja su aporte en aportes.jsonl (solo se agregan líneas), así
+    un batch reescrito se descuenta antes de volver a sumarlo. En memoria y
+    en facetas.json quedan solo los contadores y, por batch, su firma y la
+    posición de su aporte en el registro: guardar no crece con los batches.
+    """
+
+    def __init__(self, directorio=FACETAS_DEFAULT):
+        self.directorio = Path(directorio)
+        self.estado_file = self.directorio / "facetas.json"
+        self.aportes_file = self.directorio / "aportes.jsonl"
+        self.historial_dir = self.directorio / "historial"
+        self.lock = threading.Lock()
+        self._aportes = None
+        self.cargar()
+
+    def cargar(self):
+        """Cargar vocabulario y contadores, e indexar los aportes por batch"""
+        estado = {}
+        if self.estado_file.exists():
+            with open(self.estado_file, 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+
+        self.valores = {faceta: estado.get("valores", {}).get(faceta, []) for faceta in FACETAS}
+        self.numeros = {
+            faceta: {valor: i for i, valor in enumerate(valores)} for faceta, valores in self.valores.items()
+        }
+        self.conteos = {
+            tribunal: {faceta: array.array('q', por_faceta.get(faceta, [])) for faceta in FACETAS}
+            for tribunal, por_faceta in estado.get("conteos", {}).items()
+        }
+        self.sentencias = Counter(estado.get("sentencias", {}))
+
+        # Batch → (firma, tribunal, posición del aporte en aportes.jsonl)
+        self.batches = {}
+        if self._aportes:
+            self._aportes.close()
+            self._aportes = None
+
+        if "batches" in estado:
+            # Formato anterior: los aportes venían dentro de facetas.json
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            self.aportes_file.unlink(missing_ok=True)
+            for ruta_batch, registro in estado["batches"].items():
+                self._anotar_aporte(ruta_batch, registro["firma"], registro["tribunal"], registro["aporte"])
+            return
+
+        if not self.aportes_file.exists():
+            return
+
+        # Las líneas escritas después del último guardar no están en los contadores
+        with open(self.aportes_file, 'r+b') as f:
+            f.truncate(estado.get("aportes_bytes", 0))
+            posicion = 0
+            for linea in f:
+                registro = json.loads(linea)
+                self.batches[registro["batch"]] = (registro["firma"], registro["tribunal"], posicion)
+                posicion += len(linea)
+
+    def _anotar_aporte(self, ruta_batch, firma, tribunal, aporte):
+        """Agregar el aporte de un batch al registro y recordar su posición"""
+        if self._aportes is None:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            self._aportes = open(self.aportes_file, 'ab')
+        posicion = self._aportes.tell()
+        registro = {"batch": str(ruta_batch), "firma": firma, "tribunal": tribunal, "aporte": aporte}
+        self._aportes.write(json.dumps(registro, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.batches[str(ruta_batch)] = (firma, tribunal, posicion)
+
+    def _leer_aporte(self, posicion):
+        """Aporte guardado en una posición de aportes.jsonl"""
+        if self._aportes:
+            self._aportes.flush()
+        with open(self.aportes_file, 'rb') as f:
+            f.seek(posicion)
+            return json.loads(f.readline())["aporte"]
+
+    def guardar(self):
+        """Guardar estado (escritura atómica)
+
+        La copia se arma completa bajo el lock: json.dump corre fuera de él
+        mientras otros hilos siguen registrando batches.
+        """
+        with self.lock:
+            aportes_bytes = 0
+            if self._aportes:
+                self._aportes.flush()
+                aportes_bytes = self._aportes.tell()
+            elif self.aportes_file.exists():
+                aportes_bytes = self.aportes_file.stat().st_size
+
+            estado = {
+                "ultima_actualizacion": datetime.now().isoformat(),
+                "valores": {faceta: list(valores) for faceta, valores in self.valores.items()},
+                "conteos": {
+                    tribunal: {faceta: contador.tolist() for faceta, contador in por_faceta.items()}
+                    for tribunal, por_faceta in self.conteos.items()
+                },
+                "sentencias": dict(self.sentencias),
+                "aportes_bytes": aportes_bytes,
+            }
+
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        tmp = self.estado_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False)
+        tmp.replace(self.estado_file)
+
+    def _internar(self, faceta, valor):
+        """Número del valor en el vocabulario de la faceta"""
+        numero = self.numeros[faceta].get(valor)
+        if numero is None:
+            numero = len(self.valores[faceta])
+            self.numeros[faceta][valor] = numero
+            self.valores[faceta].append(valor)
+        return numero
+
+    def _sumar(self, tribunal, aporte, signo):
+        """Sumar (o restar) el aporte de un batch a los contadores del tribunal"""
+        por_faceta = self.conteos.setdefault(tribunal, {faceta: array.array('q') for faceta in FACETAS})
+        for faceta, pares in aporte.items():
+            if faceta == 'sentencias':
+                self.sentencias[tribunal] += signo * pares
+                continue
+            contador = por_faceta[faceta]
+            for numero, cantidad in pares:
+                if numero >= len(contador):
+                    contador.frombytes(bytes(contador.itemsize * (numero + 1 - len(contador))))
+                contador[numero] += signo * cantidad
+
+    def registrar_batch(self, tribunal, ruta_batch, sentencias, firma=None):
+        """Contabilizar un batch recién escrito (seguro entre hilos)"""
+        self.registrar_conteos(tribunal, ruta_batch, contar_facetas(sentencias), len(sentencias), firma)
+
+    def registrar_conteos(self, tribunal, ruta_batch, conteos, total_sentencias, firma=None):
+        """Contabilizar un batch cuyos conteos ya se calcularon (p. ej. en un proceso del pool)"""
+        with self.lock:
+            aporte = {
+                faceta: sorted((self._internar(faceta, valor), n) for valor, n in contador.items())
+                for faceta, contador in conteos.items()
+            }
+            aporte['sentencias'] = total_sentencias
+
+            anterior = self.batches.get(str(ruta_batch))
+            if anterior:
+                _, tribunal_anterior, posicion = anterior
+                self._sumar(tribunal_anterior, self._leer_aporte(posicion), -1)
+            self._sumar(tribunal, aporte, 1)
+
+            self._anotar_aporte(ruta_batch, firma or firma_archivo(ruta_batch), tribunal, aporte)
+
+    def actualizar(self, directorio_batches):
+        """Contabilizar los batches nuevos o modificados de un directorio"""
+        total_batches = 0
+        for ruta_batch in listar_batches(directorio_batches):
+            firma = firma_archivo(ruta_batch)
+            registrado = self.batches.get(str(ruta_batch))
+            if registrado and registrado[0] == firma:
+                continue
+            self.registrar_batch(tribunal_de_batch(ruta_batch), ruta_batch, leer_batch(ruta_batch), firma)
+            total_batches += 1
+        return total_batches
+
+    def totales(self, faceta, tribunal=None):
+        """Conteos de una faceta (de un tribunal o agregados de todos), de mayor a menor"""
+        with self.lock:
+            tribunales = [tribunal] if tribunal else list(self.conteos)
+            suma = array.array('q', [0] * len(self.valores[faceta]))
+            for nombre in tribunales:
+                for numero, cantidad in enumerate(self.conteos.get(nombre, {}).get(faceta, [])):
+                    suma[numero] += cantidad
+            resultado = {self.valores[faceta][i]: n for i, n in enumerate(suma) if n}
+
+        return dict(sorted(resultado.items(), key=lambda x: (-x[1], x[0])))
+
+    def resumen(self):
+        """Totales agregados de todas las facetas y sentencias por tribunal"""
+        return {
+            "sentencias": {tribunal: n for tribunal, n in sorted(self.sentencias.items()) if n},
+            "facetas": {faceta: self.totales(faceta) for faceta in FACETAS},
+        }
+
+    def guardar_instantanea(self):
+        """Guardar el resumen actual en el historial para comparar con corridas futuras"""
+        self.historial_dir.mkdir(parents=True, exist_ok=True)
+        ruta = self.historial_dir / f"facetas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({"fecha": datetime.now().isoformat(), **self.resumen()}, f, ensure_ascii=False)
+        return ruta
+
+    def instantaneas(self):
+        """Instantáneas guardadas, de la más antigua a la más nueva"""
+        return sorted(self.historial_dir.glob("facetas_*.json"))
+
+    @staticmethod
+    def diferencia(anterior, actual):
+        """Cambios entre dos resúmenes: {seccion: {valor: delta}} sin los valores sin cambio"""
+        cambios = {}
+        secciones = [("sentencias", anterior.get("sentencias", {}), actual.get("sentencias", {}))]
+        secciones += [
+            (faceta, anterior.get("facetas", {}).get(faceta, {}), actual.get("facetas", {}).get(faceta, {}))
+            for faceta in FACETAS
+        ]
+        for seccion, antes, despues in secciones:
+            deltas = {
+                valor: despues.get(valor, 0) - antes.get(valor, 0)
+                for valor in set(antes) | set(despues)
+                if despues.get(valor, 0) != antes.get(valor, 0)
+            }
+            if deltas:
+                cambios[seccion] = dict(sorted(deltas.items(), key=lambda x: (-abs(x[1]), x[0])))
+        return cambios
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+
+    if len(args) < 1 or args[0] not in ('actualizar', 'top', 'diff') or (args[0] != 'diff' and len(args) < 2):
+        print("Uso:")
+        print("  python facetas_corpus.py actualizar DIRECTORIO_BATCHES [--facetas=DIR]")
+        print(f"  python facetas_corpus.py top {'|'.join(FACETAS)} [--tribunal=X] [--limite=N] [--facetas=DIR]")
+        print("  python facetas_corpus.py diff [--contra=INSTANTANEA.json] [--facetas=DIR]")
+        print("Ejemplo: python facetas_corpus.py top materia --tribunal=Penales")
+        sys.exit(1)
+
+    agregador = AgregadorFacetas(opciones.get('facetas', FACETAS_DEFAULT))
+
+    if args[0] == 'actualizar':
+        print("📊 ACTUALIZANDO FACETAS DEL CORPUS")
+        print("=" * 60)
+        total_batches = agregador.actualizar(args[1])
+        agregador.guardar()
+        instantanea = agregador.guardar_instantanea()
+        print(f"\n✅ Facetas actualizadas")
+        print(f"📦 Batches nuevos o modificados: {total_batches}")
+        for tribunal, n in agregador.resumen()["sentencias"].items():
+            print(f"   {tribunal}: {n:,} sentencias")
+        print(f"💾 Instantánea: {instantanea}")
+
+    elif args[0] == 'top':
+        if args[1] not in FACETAS:
+            print(f"❌ Faceta desconocida: {args[1]}")
+            sys.exit(1)
+        totales = agregador.totales(args[1], opciones.get('tribunal'))
+        limite = int(opciones.get('limite', 20))
+        print(f"📊 {args[1]} ({opciones.get('tribunal', 'todos los tribunales')}): {len(totales):,} valores")
+        print("=" * 60)
+        for valor, n in list(totales.items())[:limite]:
+            print(f"   {n:>8,}  {valor}")
+
+    else:
+        instantaneas = agregador.instantaneas()
+        if 'contra' in opciones:
+            anterior_file, actual = Path(opciones['contra']), agregador.resumen()
+        elif len(instantaneas) >= 2:
+            anterior_file = instantaneas[-2]
+            with open(instantaneas[-1], 'r', encoding='utf-8') as f:
+                actual = json.load(f)
+        else:
+            print("❌ Se necesitan al menos dos corridas de 'actualizar' (o --contra=ARCHIVO)")
+            sys.exit(1)
+
+        with open(anterior_file, 'r', encoding='utf-8') as f:
+            anterior = json.load(f)
+
+        cambios = AgregadorFacetas.diferencia(anterior, actual)
+        print(f"📊 Cambios desde {anterior_file.name}")
+        print("=" * 60)
+        if not cambios:
+            print("   Sin cambios")
+        for seccion, deltas in cambios.items():
+            print(f"\n{seccion}:")
+            for valor, delta in list(deltas.items())[:int(opciones.get('limite', 20))]:
+                print(f"   {delta:+8,}  {valor}")
+
+
+if __name__ == "__main__":
+    main()
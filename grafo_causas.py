@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Grafo de vinculación de causas entre instancias
+Une sentencias de una misma causa en distintos tribunales (juzgado → Corte
+de Apelaciones → Corte Suprema) a través de claves de causa: rol del
+juzgado, rol de la Corte, rol de la Suprema, CRR_CAUSA y RUC. El grafo
+sentencia ↔ clave se guarda en arreglos CSR y se consulta con mmap, igual
+que las tablas de nodos (ids, datos de cada sentencia y claves)
+"""
+
+import re
+import sys
+import json
+import array
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from corpus_local import iterar_batches, firma_archivo, fecha_sentencia
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+GRAFO_DEFAULT = "output/grafo_causas"
+
+# Claves compartidas por más sentencias que esto se tratan como ruido (rol 0, RUC genérico)
+MAX_GRADO_CLAVE = 500
+
+# ROL-ERA con número distinto de cero ('0-0' significa sin causa en esa instancia)
+_ROL = re.compile(r'(?:[A-Z]+-)?0*[1-9]\d*-(?:19|20)\d\d')
+# RUC completo con dígito verificador ('19-4--' viene truncado)
+_RUC = re.compile(r'[\d-]*\d-[\dkK]')
+
+
+def _texto(valor):
+    """Texto de un campo que puede venir como número, string o None"""
+    return '' if valor is None else str(valor).strip()
+
+
+def _entero(valor):
+    """Entero de un campo numérico o 0"""
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return 0
+
+
+def claves_causa(tribunal, sentencia):
+    """Claves de causa de una sentencia: la propia de su instancia y las de instancias previas"""
+    claves = set()
+    cod_juz = _entero(sentencia.get('cod_juz_i'))
+    cod_corte = _entero(sentencia.get('cod_corte_i'))
+    rol_ape = _texto(sentencia.get('rol_era_ape_s'))
+
+    if tribunal in ('Corte_Suprema', 'Corte_de_Apelaciones') or sentencia.get('cod_corte_i') is not None:
+        rol_sup = _texto(sentencia.get('rol_era_sup_s'))
+        if tribunal == 'Corte_Suprema' and _ROL.fullmatch(rol_sup):
+            claves.add(f"suprema:{rol_sup}")
+        if cod_corte and _ROL.fullmatch(rol_ape):
+            claves.add(f"corte:{cod_corte}:{rol_ape}")
+
+        # Causa de primera instancia de la que viene el recurso
+        rol_juz = _entero(sentencia.get('rol_juz_i'))
+        era_juz = _entero(sentencia.get('era_juz_i'))
+        if cod_juz and rol_juz and era_juz > 1900:
+            tipo = _texto(sentencia.get('tip_causa_juz_i'))
+            claves.add(f"juz:{cod_juz}:{tipo}-{rol_juz}-{era_juz}")
+    else:
+        # Juzgado de primera instancia: rol_era_sup_s ya es TIPO-ROL-ERA
+        rol = _texto(sentencia.get('rol_era_sup_s'))
+        if cod_juz and _ROL.fullmatch(rol):
+            claves.add(f"juz:{cod_juz}:{rol}")
+
+        causa = _entero(sentencia.get('sent__CRR_CAUSA_i') or sentencia.get('sent__crr_causa_i'))
+        if causa:
+            claves.add(f"causa:{tribunal}:{causa}")
+
+    ruc = _texto(sentencia.get('sent__RUC_s') or sentencia.get('sent__ruc_s'))
+    if _RUC.fullmatch(ruc) and ruc.strip('0-'):
+        claves.add(f"ruc:{ruc}")
+
+    return claves
+
+
+def construir_csr(origenes, destinos, cantidad):
+    """Arreglos CSR (indptr, indices) de aristas origen → destino"""
+    orden = np.lexsort((destinos, origenes))
+    indices = destinos[orden]
+    indptr = np.zeros(cantidad + 1, dtype=np.uint32)
+    np.cumsum(np.bincount(origenes, minlength=cantidad), out=indptr[1:])
+    return indptr, indices
+
+
+class TablaTextos:
+    """Tabla de strings en disco: bytes UTF-8 concatenados + offsets, con mmap
+
+    Un arreglo con el orden alfabético de los valores permite buscar un
+    valor por búsqueda binaria sin cargar la tabla.
+    """
+
+    def __init__(self, directorio, nombre):
+        self.datos_file = Path(directorio) / f"{nombre}.dat"
+        self.offsets_file = Path(directorio) / f"{nombre}_offsets.npy"
+        self.orden_file = Path(directorio) / f"{nombre}_orden.npy"
+        self._abierta = None
+
+    def escribir(self, valores):
+        """Reescribir la tabla completa"""
+        codificados = [valor.encode('utf-8') for valor in valores]
+        offsets = np.zeros(len(codificados) + 1, dtype=np.uint64)
+        np.cumsum([len(c) for c in codificados], out=offsets[1:])
+        orden = np.array(sorted(range(len(codificados)), key=codificados.__getitem__), dtype=np.uint32)
+
+        # Cada archivo se reemplaza de forma atómica, datos primero: los valores
+        # solo se agregan al final, así los offsets anteriores siguen valiendo
+        tmp = self.datos_file.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(b''.join(codificados))
+        tmp.replace(self.datos_file)
+        for ruta, arreglo in ((self.offsets_file, offsets), (self.orden_file, orden)):
+            tmp = ruta.with_suffix('.tmp.npy')
+            np.save(tmp, arreglo)
+            tmp.replace(ruta)
+        self._abierta = None
+
+    def _abrir(self):
+        """Abrir los arreglos con mmap (perezoso)"""
+        if self._abierta is None:
+            if not self.offsets_file.exists():
+                return None
+            datos = np.memmap(self.datos_file, dtype=np.uint8, mode='r') if self.datos_file.stat().st_size else b''
+            self._abierta = (
+                datos,
+                np.load(self.offsets_file, mmap_mode='r'),
+                np.load(self.orden_file, mmap_mode='r'),
+            )
+        return self._abierta
+
+    def __len__(self):
+        abierta = self._abrir()
+        return len(abierta[1]) - 1 if abierta else 0
+
+    def _bytes(self, numero):
+        datos, offsets, _ = self._abrir()
+        return bytes(datos[int(offsets[numero]):int(offsets[numero + 1])])
+
+    def __getitem__(self, numero):
+        return self._bytes(numero).decode('utf-8')
+
+    def valores(self):
+        """Todos los valores, en orden de número"""
+        return [self[numero] for numero in range(len(self))]
+
+    def buscar(self, valor):
+        """Número de un valor (None si no está)"""
+        abierta = self._abrir()
+        if not abierta:
+            return None
+        orden = abierta[2]
+        buscado = valor.encode('utf-8')
+        bajo, alto = 0, len(orden)
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if self._bytes(int(orden[medio])) < buscado:
+                bajo = medio + 1
+            else:
+                alto = medio
+        if bajo < len(orden) and self._bytes(int(orden[bajo])) == buscado:
+            return int(orden[bajo])
+        return None
+
+
+class GrafoCausas:
+    """Grafo bipartito sentencia ↔ clave de causa con ids enteros compactos
+
+    Las aristas se acumulan en un archivo de pares uint32 donde cada batch
+    ocupa un rango; en cada actualización se regeneran los CSR en ambos
+    sentidos con los rangos vigentes (un batch reescrito reemplaza el suyo).
+    Los nodos viven en tablas con mmap: ids de sentencia, sus datos
+    ([tribunal, fecha, rol] en JSON) y claves. meta.json confirma lo escrito:
+    los batches procesados, sus rangos y el largo del archivo de aristas.
+    """
+
+    def __init__(self, directorio=GRAFO_DEFAULT):
+        self.directorio = Path(directorio)
+        self.meta_file = self.directorio / "meta.json"
+        self.ids = TablaTextos(self.directorio, "sentencias_ids")
+        self.datos = TablaTextos(self.directorio, "sentencias_datos")
+        self.claves = TablaTextos(self.directorio, "claves")
+        self._nuevos = None
+        self.cargar_meta()
+        self._csr = None
+
+    def cargar_meta(self):
+        """Cargar batches procesados (y migrar nodos de meta.json de versiones anteriores)"""
+        if self.meta_file.exists():
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"batches": {}}
+
+        if "aristas_pares" not in self.meta:
+            # Versiones anteriores no sabían qué aristas aportó cada batch: se releen todos
+            (self.directorio / "aristas.bin").unlink(missing_ok=True)
+            self.meta.update({"batches": {}, "aristas": "aristas.bin", "aristas_pares": 0})
+        else:
+            # Aristas agregadas por una actualización que no llegó a guardar meta.json
+            aristas_file = self.aristas_file
+            if aristas_file.exists() and aristas_file.stat().st_size > self.meta["aristas_pares"] * 8:
+                with open(aristas_file, 'r+b') as f:
+                    f.truncate(self.meta["aristas_pares"] * 8)
+
+        if "sentencias" in self.meta:
+            self._empezar_edicion()
+            for id_sentencia, tribunal, fecha, rol in self.meta.pop("sentencias"):
+                self._agregar_sentencia(id_sentencia, [tribunal, fecha, rol])
+            for clave in self.meta.pop("claves"):
+                self._nodo_clave(clave)
+            self._guardar_nodos()
+            self.guardar_meta()
+
+    @property
+    def aristas_file(self):
+        """Archivo de aristas vigente (cambia de nombre al compactarse)"""
+        return self.directorio / self.meta["aristas"]
+
+    def guardar_meta(self):
+        """Guardar batches procesados"""
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.meta["ultima_actualizacion"] = datetime.now().isoformat()
+        tmp = self.meta_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        tmp.replace(self.meta_file)
+
+    def _empezar_edicion(self):
+        """Cargar los nodos en memoria para agregar nuevos (solo al construir)"""
+        if self._nuevos is None:
+            ids = self.ids.valores()
+            claves = self.claves.valores()
+            self._nuevos = {
+                "ids": ids,
+                "datos": self.datos.valores(),
+                "claves": claves,
+                "numero_sentencia": {id_sentencia: i for i, id_sentencia in enumerate(ids)},
+                "numero_clave": {clave: i for i, clave in enumerate(claves)},
+            }
+
+    def _guardar_nodos(self):
+        """Escribir las tablas de nodos y volver a la lectura con mmap"""
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.ids.escribir(self._nuevos["ids"])
+        self.datos.escribir(self._nuevos["datos"])
+        self.claves.escribir(self._nuevos["claves"])
+        self._nuevos = None
+
+    def _agregar_sentencia(self, id_sentencia, datos):
+        """Id compacto de una sentencia (se crea si es nueva)"""
+        numero = self._nuevos["numero_sentencia"].get(id_sentencia)
+        if numero is None:
+            numero = len(self._nuevos["ids"])
+            self._nuevos["numero_sentencia"][id_sentencia] = numero
+            self._nuevos["ids"].append(id_sentencia)
+            self._nuevos["datos"].append(json.dumps(datos, ensure_ascii=False))
+        else:
+            # Un batch reescrito puede traer el rol o la fecha corregidos
+            self._nuevos["datos"][numero] = json.dumps(datos, ensure_ascii=False)
+        return numero
+
+    def _nodo_sentencia(self, tribunal, sentencia):
+        """Id compacto de una sentencia descargada"""
+        return self._agregar_sentencia(str(sentencia.get('id')), [
+            tribunal, fecha_sentencia(sentencia),
+            sentencia.get('rol_era_sup_s') or sentencia.get('rol_era_ape_s')
+        ])
+
+    def _nodo_clave(self, clave):
+        """Id compacto de una clave de causa (se crea si es nueva)"""
+        numero = self._nuevos["numero_clave"].get(clave)
+        if numero is None:
+            numero = len(self._nuevos["claves"])
+            self._nuevos["numero_clave"][clave] = numero
+            self._nuevos["claves"].append(clave)
+        return numero
+
+    def numero_sentencia(self, id_sentencia):
+        """Número de nodo de una sentencia (None si no está en el grafo)"""
+        return self.ids.buscar(str(id_sentencia))
+
+    def fila(self, numero):
+        """[id, tribunal, fecha, rol] de un nodo sentencia"""
+        return [self.ids[numero], *json.loads(self.datos[numero])]
+
+    def actualizar(self, directorio_batches):
+        """Agregar las aristas de batches nuevos o modificados y regenerar los CSR
+
+        Las aristas nuevas se agregan al archivo antes de escribir nodos y
+        meta.json; si el proceso muere entremedio, al cargar se recortan y
+        esos batches se vuelven a procesar.
+        """
+        aristas = array.array('I')
+        total_batches = 0
+        vistos = set()
+
+        for tribunal, ruta_batch, sentencias in iterar_batches(directorio_batches):
+            vistos.add(str(ruta_batch))
+            firma = firma_archivo(ruta_batch)
+            anterior = self.meta["batches"].get(str(ruta_batch))
+            if anterior and anterior["firma"] == firma:
+                continue
+
+            self._empezar_edicion()
+            inicio = self.meta["aristas_pares"] + len(aristas) // 2
+            for sentencia in sentencias:
+                if not sentencia.get('id'):
+                    continue
+                numero = self._nodo_sentencia(tribunal, sentencia)
+                for clave in claves_causa(tribunal, sentencia):
+                    aristas.extend((numero, self._nodo_clave(clave)))
+
+            # El rango anterior de un batch reescrito deja de usarse
+            self.meta["batches"][str(ruta_batch)] = {
+                "firma": firma, "aristas": [inicio, self.meta["aristas_pares"] + len(aristas) // 2]
+            }
+            total_batches += 1
+
+        # Batches borrados del disco: sus aristas también
+        quitados = [ruta for ruta in self.meta["batches"] if ruta not in vistos]
+        for ruta in quitados:
+            del self.meta["batches"][ruta]
+
+        if total_batches or quitados:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            with open(self.aristas_file, 'ab') as f:
+                aristas.tofile(f)
+            self.meta["aristas_pares"] += len(aristas) // 2
+            if self._nuevos is not None:
+                self._guardar_nodos()
+            self.regenerar_csr()
+            self.guardar_meta()
+
+        return total_batches, len(aristas) // 2
+
+    def _aristas_vigentes(self):
+        """Pares (sentencia, clave) de los rangos de los batches vigentes"""
+        if self.aristas_file.exists():
+            todas = np.fromfile(self.aristas_file, dtype=np.uint32, count=self.meta["aristas_pares"] * 2)
+        else:
+            todas = np.empty(0, dtype=np.uint32)
+        todas = todas.reshape(-1, 2)
+        rangos = sorted(registro["aristas"] for registro in self.meta["batches"].values())
+        if not rangos:
+            return np.empty((0, 2), dtype=np.uint32)
+        return np.concatenate([todas[inicio:fin] for inicio, fin in rangos])
+
+    def _compactar_aristas(self, pares):
+        """Reescribir solo las aristas vigentes en un archivo nuevo
+
+        El archivo anterior se borra recién después de guardar meta.json con
+        el nombre y los rangos nuevos.
+        """
+        anterior = self.aristas_file
+        nombre = f"aristas_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.bin"
+        posicion = 0
+        for registro in sorted(self.meta["batches"].values(), key=lambda r: r["aristas"]):
+            inicio, fin = registro["aristas"]
+            registro["aristas"] = [posicion, posicion + fin - inicio]
+            posicion += fin - inicio
+        pares.tofile(self.directorio / nombre)
+        self.meta.update({"aristas": nombre, "aristas_pares": len(pares)})
+        self.guardar_meta()
+        anterior.unlink(missing_ok=True)
+
+    def regenerar_csr(self):
+        """Reconstruir los CSR sentencia → claves y clave → sentencias desde las aristas vigentes"""
+        pares = self._aristas_vigentes()
+        # Con más aristas reemplazadas que vigentes, el archivo se compacta
+        if self.meta["aristas_pares"] > 2 * len(pares):
+            self._compactar_aristas(pares)
+
+        # Una sentencia en dos batches (páginas solapadas) aporta las mismas aristas
+        pares = np.unique(pares, axis=0)
+        sentencias, claves = pares[:, 0], pares[:, 1]
+
+        self._csr = None
+        for nombre, (indptr, indices) in (
+            ("sentencias", construir_csr(sentencias, claves, len(self.ids))),
+            ("claves", construir_csr(claves, sentencias, len(self.claves))),
+        ):
+            np.save(self.directorio / f"{nombre}_indptr.npy", indptr)
+            np.save(self.directorio / f"{nombre}_indices.npy", indices)
+
+    def _abrir_csr(self):
+        """Abrir los CSR con mmap (perezoso)"""
+        if self._csr is None:
+            self._csr = {
+                nombre: (
+                    np.load(self.directorio / f"{nombre}_indptr.npy", mmap_mode='r'),
+                    np.load(self.directorio / f"{nombre}_indices.npy", mmap_mode='r'),
+                )
+                for nombre in ("sentencias", "claves")
+            }
+        return self._csr
+
+    def vecinos(self, nombre, numero):
+        """Vecinos de un nodo en el CSR `nombre`"""
+        indptr, indices = self._abrir_csr()[nombre]
+        return indices[indptr[numero]:indptr[numero + 1]]
+
+    def historia(self, id_sentencia):
+        """Todas las sentencias de la misma causa, ordenadas por fecha
+
+        Recorrido en anchura alternando sentencia → claves → sentencias.
+        """
+        inicio = self.numero_sentencia(id_sentencia)
+        if inicio is None:
+            return []
+
+        visitadas = {inicio}
+        claves_vistas = set()
+        pendientes = deque([inicio])
+
+        while pendientes:
+            numero = pendientes.popleft()
+            for clave in self.vecinos("sentencias", numero).tolist():
+                if clave in claves_vistas:
+                    continue
+                claves_vistas.add(clave)
+                otras = self.vecinos("claves", clave)
+                if len(otras) > MAX_GRADO_CLAVE:
+                    continue
+                for otra in otras.tolist():
+                    if otra not in visitadas:
+                        visitadas.add(otra)
+                        pendientes.append(otra)
+
+        filas = [self.fila(n) for n in visitadas]
+        return sorted(filas, key=lambda fila: (fila[2] or '', fila[0]))
+
+    def buscar_clave(self, valor):
+        """Ids de sentencias con una clave como 'ruc:2200822562-5' o un rol de Suprema"""
+        for clave in (valor, f"ruc:{valor}", f"suprema:{valor}"):
+            numero = self.claves.buscar(clave)
+            if numero is not None:
+                return [self.ids[n] for n in self.vecinos("claves", numero).tolist()]
+        return []
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+
+    if len(args) < 2 or args[0] not in ('construir', 'historia'):
+        print("Uso:")
+        print("  python grafo_causas.py construir DIRECTORIO_BATCHES [--grafo=DIR]")
+        print("  python grafo_causas.py historia ID|RUC|ROL_SUPREMA [--grafo=DIR]")
+        print("Ejemplo: python grafo_causas.py historia 248356-2023")
+        sys.exit(1)
+
+    if np is None:
+        print("❌ Error: se requiere numpy (pip install numpy)")
+        sys.exit(1)
+
+    grafo = GrafoCausas(opciones.get('grafo', GRAFO_DEFAULT))
+
+    if args[0] == 'construir':
+        print("🕸️ CONSTRUYENDO GRAFO DE CAUSAS")
+        print("=" * 60)
+        total_batches, total_aristas = grafo.actualizar(args[1])
+        print(f"\n✅ Grafo actualizado")
+        print(f"📦 Batches nuevos: {total_batches}")
+        print(f"🔗 Aristas nuevas: {total_aristas:,}")
+        print(f"📄 Sentencias: {len(grafo.ids):,} | 🔑 Claves: {len(grafo.claves):,}")
+        return
+
+    ids = [args[1]] if grafo.numero_sentencia(args[1]) is not None else grafo.buscar_clave(args[1])
+    if not ids:
+        print(f"❌ Sin sentencias para {args[1]}")
+        sys.exit(1)
+
+    historia = grafo.historia(ids[0])
+    print(f"🕸️ Historia de la causa ({len(historia)} sentencias)")
+    print("=" * 60)
+    for id_sentencia, tribunal, fecha, rol in historia:
+        print(f"   📄 {fecha or '????-??-??'} | {tribunal:22} | {rol or '':16} | {id_sentencia}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Índice de búsqueda de texto completo sobre el corpus descargado (SQLite FTS5)
+Permite buscar en texto_sentencia, caratulado_s y gls_materia_ss sin
+consultar juris.pjud.cl
+"""
+
+import sys
+import sqlite3
+from pathlib import Path
+
+from corpus_local import iterar_batches, firma_archivo, fecha_sentencia
+from normalizar_textos import normalizar_html
+
+INDICE_DEFAULT = "output/indice_busqueda.sqlite"
+
+
+def materias_sentencia(sentencia):
+    """Materias de la sentencia como un solo texto"""
+    materias = sentencia.get('gls_materia_ss') or sentencia.get('gls_materia_s') or ''
+    if isinstance(materias, list):
+        return ' | '.join(str(m) for m in materias)
+    return str(materias)
+
+
+def rol_sentencia(sentencia):
+    """Identificador de causa más representativo disponible"""
+    return (sentencia.get('rol_era_sup_s') or sentencia.get('rol_era_ape_s')
+            or sentencia.get('sent__RUC_s') or '')
+
+
+class IndiceBusqueda:
+    """Índice FTS5 con columnas filtrables por tribunal y fecha"""
+
+    def __init__(self, ruta=INDICE_DEFAULT):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.ruta)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.crear_esquema()
+
+    def crear_esquema(self):
+        """Crear tablas si no existen"""
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sentencias (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                version INTEGER,
+                tribunal TEXT,
+                fecha TEXT,
+                rol TEXT,
+                caratulado TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_sentencias_tribunal_fecha ON sentencias(tribunal, fecha);
+            CREATE INDEX IF NOT EXISTS idx_sentencias_fecha ON sentencias(fecha);
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS sentencias_fts USING fts5(
+                caratulado, materias, texto,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+
+            CREATE TABLE IF NOT EXISTS batches_indexados (
+                ruta TEXT PRIMARY KEY,
+                firma TEXT
+            );
+        """)
+
+    def indexar_sentencia(self, tribunal, sentencia):
+        """Agregar o actualizar una sentencia. Devuelve True si cambió el índice"""
+        id_sentencia = str(sentencia.get('id') or '')
+        if not id_sentencia:
+            return False
+
+        version = sentencia.get('_version_')
+        fila = self.conn.execute(
+            "SELECT rowid, version FROM sentencias WHERE id = ?", (id_sentencia,)
+        ).fetchone()
+
+        if fila and fila[1] == version:
+            return False
+
+        if fila:
+            rowid = fila[0]
+            self.conn.execute("DELETE FROM sentencias_fts WHERE rowid = ?", (rowid,))
+            self.conn.execute(
+                "UPDATE sentencias SET version = ?, tribunal = ?, fecha = ?, rol = ?, caratulado = ? WHERE rowid = ?",
+                (version, tribunal, fecha_sentencia(sentencia), rol_sentencia(sentencia),
+                 sentencia.get('caratulado_s'), rowid)
+            )
+        else:
+            cursor = self.conn.execute(
+                "INSERT INTO sentencias (id, version, tribunal, fecha, rol, caratulado) VALUES (?, ?, ?, ?, ?, ?)",
+                (id_sentencia, version, tribunal, fecha_sentencia(sentencia), rol_sentencia(sentencia),
+                 sentencia.get('caratulado_s'))
+            )
+            rowid = cursor.lastrowid
+
+        self.conn.execute(
+            "INSERT INTO sentencias_fts (rowid, caratulado, materias, texto) VALUES (?, ?, ?, ?)",
+            (rowid, sentencia.get('caratulado_s') or '', materias_sentencia(sentencia),
+             normalizar_html(sentencia.get('texto_sentencia')))
+        )
+        return True
+
+    def indexar_directorio(self, directorio):
+        """Indexar los batches nuevos o modificados de un directorio"""
+        indexados = dict(self.conn.execute("SELECT ruta, firma FROM batches_indexados"))
+        total_batches = 0
+        total_sentencias = 0
+
+        for tribunal, ruta_batch, sentencias in iterar_batches(directorio):
+            firma = firma_archivo(ruta_batch)
+            if indexados.get(str(ruta_batch)) == firma:
+                continue
+
+            with self.conn:
+                for sentencia in sentencias:
+                    if self.indexar_sentencia(tribunal, sentencia):
+                        total_sentencias += 1
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO batches_indexados (ruta, firma) VALUES (?, ?)",
+                    (str(ruta_batch), firma)
+                )
+
+            total_batches += 1
+            print(f"   ✅ {tribunal} - {ruta_batch.name}: {len(sentencias)} sentencias")
+
+        return total_batches, total_sentencias
+
+    def optimizar(self):
+        """Compactar los segmentos del índice FTS"""
+        self.conn.execute("INSERT INTO sentencias_fts (sentencias_fts) VALUES ('optimize')")
+        self.conn.commit()
+
+    def buscar(self, consulta, tribunal=None, desde=None, hasta=None, limite=20):
+        """Buscar sentencias ordenadas por relevancia (bm25) con fragmento"""
+        sql = """
+            SELECT s.id, s.tribunal, s.fecha, s.rol, s.caratulado,
+                   snippet(sentencias_fts, 2, '[', ']', '…', 16),
+                   bm25(sentencias_fts, 2.0, 2.0, 1.0) AS rango
+            FROM sentencias_fts
+            JOIN sentencias s ON s.rowid = sentencias_fts.rowid
+            WHERE sentencias_fts MATCH ?
+        """
+        parametros = [consulta]
+
+        if tribunal:
+            sql += " AND s.tribunal = ?"
+            parametros.append(tribunal)
+        if desde:
+            sql += " AND s.fecha >= ?"
+            parametros.append(desde)
+        if hasta:
+            sql += " AND s.fecha <= ?"
+            parametros.append(hasta)
+
+        sql += " ORDER BY rango LIMIT ?"
+        parametros.append(limite)
+
+        return self.conn.execute(sql, parametros).fetchall()
+
+    def cerrar(self):
+        """Cerrar conexión"""
+        self.conn.close()
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+
+    if len(args) < 2 or args[0] not in ('indexar', 'buscar'):
+        print("Uso:")
+        print("  python indice_busqueda.py indexar DIRECTORIO_BATCHES [--indice=RUTA]")
+        print("  python indice_busqueda.py buscar \"CONSULTA\" [--tribunal=X] [--desde=YYYY-MM-DD] [--hasta=YYYY-MM-DD] [--limite=N] [--indice=RUTA]")
+        print("Ejemplo: python indice_busqueda.py buscar '\"recurso de protección\" AND isapre' --tribunal=Corte_Suprema")
+        sys.exit(1)
+
+    indice = IndiceBusqueda(opciones.get('indice', INDICE_DEFAULT))
+
+    if args[0] == 'indexar':
+        print("🔎 INDEXANDO SENTENCIAS")
+        print("=" * 60)
+        total_batches, total_sentencias = indice.indexar_directorio(args[1])
+        if total_batches:
+            indice.optimizar()
+        print(f"\n✅ Indexación completada")
+        print(f"📦 Batches nuevos: {total_batches}")
+        print(f"📊 Sentencias agregadas o actualizadas: {total_sentencias:,}")
+    else:
+        try:
+            resultados = indice.buscar(
+                args[1],
+                tribunal=opciones.get('tribunal'),
+                desde=opciones.get('desde'),
+                hasta=opciones.get('hasta'),
+                limite=int(opciones.get('limite', 20))
+            )
+        except sqlite3.OperationalError as e:
+            print(f"❌ Consulta inválida: {e}")
+            sys.exit(1)
+
+        print(f"🔎 {len(resultados)} resultados para: {args[1]}")
+        print("=" * 60)
+        for id_sentencia, tribunal, fecha, rol, caratulado, fragmento, rango in resultados:
+            print(f"\n📄 {id_sentencia} | {tribunal} | {fecha} | {rol}")
+            print(f"   {caratulado}")
+            print(f"   {' '.join(fragmento.split())}")
+
+    indice.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Índice de claves de causa: rol, RUC, documento e id → ubicación en el batch
+Tablas hash de direccionamiento abierto en archivos binarios que se leen con
+mmap. Cada construcción incremental agrega un segmento; una búsqueda cuesta
+un par de accesos a memoria más la lectura de la sentencia encontrada
+"""
+
+import sys
+import json
+import mmap
+import array
+import struct
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+from corpus_local import listar_batches, registros_batch, leer_registro, firma_archivo
+
+INDICE_DEFAULT = "output/indice_claves"
+
+CAMPOS_CLAVE = (
+    'id',
+    'crr_documento_id_i',
+    'rol_era_sup_s',
+    'rol_era_ape_s',
+    'sent__RUC_s',
+)
+
+# Cabecera: firma, cantidad de slots (potencia de 2) y de entradas
+CABECERA = struct.Struct('<8sQQ')
+FIRMA_SEGMENTO = b'IDXCLV01'
+
+
+def normalizar_valor(valor):
+    """Forma canónica de un valor de clave ('o-5340-2022 ' → 'O-5340-2022')"""
+    return str(valor).strip().upper()
+
+
+def hash_clave(campo, valor):
+    """Hash de 64 bits de campo=valor (0 queda reservado para slot vacío)"""
+    clave = f"{campo}={normalizar_valor(valor)}".encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(clave, digest_size=8).digest(), 'little') or 1
+
+
+class SegmentoClaves:
+    """Segmento mapeado en memoria
+
+    Secciones tras la cabecera: hashes Q[slots], inicios Q[entradas],
+    entradas I[slots] (índice de entrada + 1), archivos I[entradas], largos I[entradas]
+    """
+
+    def __init__(self, ruta):
+        with open(ruta, 'rb') as f:
+            self.datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        firma, self.slots, entradas = CABECERA.unpack_from(self.datos)
+        if firma != FIRMA_SEGMENTO:
+            raise ValueError(f"Segmento inválido: {ruta}")
+
+        vista = memoryview(self.datos)
+        posicion = CABECERA.size
+
+        def seccion(tipo, cantidad):
+            nonlocal posicion
+            largo = cantidad * array.array(tipo).itemsize
+            resultado = vista[posicion:posicion + largo].cast(tipo)
+            posicion += largo
+            return resultado
+
+        self.hashes = seccion('Q', self.slots)
+        self.inicios = seccion('Q', entradas)
+        self.entradas = seccion('I', self.slots)
+        self.archivos = seccion('I', entradas)
+        self.largos = seccion('I', entradas)
+
+    def buscar(self, hash_buscado):
+        """Ubicaciones (archivo, inicio, largo) con ese hash (sondeo lineal)"""
+        mascara = self.slots - 1
+        slot = hash_buscado & mascara
+        ubicaciones = []
+        while self.hashes[slot]:
+            if self.hashes[slot] == hash_buscado:
+                entrada = self.entradas[slot] - 1
+                ubicaciones.append((self.archivos[entrada], self.inicios[entrada], self.largos[entrada]))
+            slot = (slot + 1) & mascara
+        return ubicaciones
+
+    def cerrar(self):
+        """Liberar vistas y mmap"""
+        for vista in (self.hashes, self.inicios, self.entradas, self.archivos, self.largos):
+            vista.release()
+        self.datos.close()
+
+
+def escribir_segmento(ruta, claves, ubicaciones):
+    """Escribir un segmento
+
+    `claves` son pares (hash, índice de entrada) y `ubicaciones` tuplas
+    (archivo, inicio, largo) por entrada.
+    """
+    slots = 1
+    while slots < 2 * max(len(claves), 1):
+        slots *= 2
+    mascara = slots - 1
+
+    hashes = array.array('Q', bytes(8 * slots))
+    entradas = array.array('I', bytes(4 * slots))
+    for hash_valor, entrada in claves:
+        slot = hash_valor & mascara
+        while hashes[slot]:
+            slot = (slot + 1) & mascara
+        hashes[slot] = hash_valor
+        entradas[slot] = entrada + 1
+
+    tmp = Path(ruta).with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(CABECERA.pack(FIRMA_SEGMENTO, slots, len(ubicaciones)))
+        hashes.tofile(f)
+        array.array('Q', (inicio for _, inicio, _ in ubicaciones)).tofile(f)
+        entradas.tofile(f)
+        array.array('I', (archivo for archivo, _, _ in ubicaciones)).tofile(f)
+        array.array('I', (largo for _, _, largo in ubicaciones)).tofile(f)
+    tmp.replace(ruta)
+
+
+class IndiceClaves:
+    """Índice por segmentos de rol/RUC/documento/id → (batch, rango en bytes)"""
+
+    def __init__(self, directorio=INDICE_DEFAULT):
+        self.directorio = Path(directorio)
+        self.meta_file = self.directorio / "meta.json"
+        self.cargar_meta()
+        self._segmentos = None
+
+    def cargar_meta(self):
+        """Cargar metadatos del índice"""
+        if self.meta_file.exists():
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"segmentos": [], "archivos": [], "batches": {}}
+
+    def guardar_meta(self):
+        """Guardar metadatos del índice"""
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.meta["ultima_actualizacion"] = datetime.now().isoformat()
+        tmp = self.meta_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        tmp.replace(self.meta_file)
+
+    def _numero_archivo(self, ruta_batch):
+        """Número estable de un archivo batch dentro del índice"""
+        if not hasattr(self, '_numeros'):
+            self._numeros = {ruta: i for i, ruta in enumerate(self.meta["archivos"])}
+        ruta = str(ruta_batch)
+        if ruta not in self._numeros:
+            self._numeros[ruta] = len(self.meta["archivos"])
+            self.meta["archivos"].append(ruta)
+        return self._numeros[ruta]
+
+    def construir(self, directorio_batches, completo=False):
+        """Indexar batches nuevos o modificados en un segmento nuevo
+
+        Con `completo` se reindexa todo en un único segmento que reemplaza a
+        los anteriores (compactación).
+        """
+        if completo:
+            anteriores = list(self.meta["segmentos"])
+            self.meta = {"segmentos": [], "archivos": [], "batches": {}}
+            if hasattr(self, '_numeros'):
+                del self._numeros
+        else:
+            anteriores = []
+
+        claves = []
+        ubicaciones = []
+        total_batches = 0
+
+        for ruta_batch in listar_batches(directorio_batches):
+            firma = firma_archivo(ruta_batch)
+            if self.meta["batches"].get(str(ruta_batch)) == firma:
+                continue
+
+            archivo = self._numero_archivo(ruta_batch)
+            for inicio, largo, sentencia in registros_batch(ruta_batch):
+                entrada = len(ubicaciones)
+                ubicaciones.append((archivo, inicio, largo))
+                for campo in CAMPOS_CLAVE:
+                    valor = sentencia.get(campo)
+                    if valor not in (None, ''):
+                        claves.append((hash_clave(campo, valor), entrada))
+
+            self.meta["batches"][str(ruta_batch)] = firma
+            total_batches += 1
+
+        if ubicaciones:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            nombre = f"segmento_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+            escribir_segmento(self.directorio / f"{nombre}.idx", claves, ubicaciones)
+            self.meta["segmentos"].append(nombre)
+
+        self.cerrar()
+        self.guardar_meta()
+
+        for anterior in anteriores:
+            (self.directorio / f"{anterior}.idx").unlink(missing_ok=True)
+
+        return total_batches, len(ubicaciones)
+
+    def _abrir_segmentos(self):
+        """Abrir segmentos con mmap (perezoso), el más nuevo primero"""
+        if self._segmentos is None:
+            self._segmentos = [
+                SegmentoClaves(self.directorio / f"{nombre}.idx")
+                for nombre in reversed(self.meta["segmentos"])
+            ]
+        return self._segmentos
+
+    def ubicaciones(self, campo, valor):
+        """Candidatos (ruta_batch, inicio, largo) para campo=valor, sin leer sentencias"""
+        hash_buscado = hash_clave(campo, valor)
+        candidatos = []
+        for segmento in self._abrir_segmentos():
+            for archivo, inicio, largo in segmento.buscar(hash_buscado):
+                candidatos.append((self.meta["archivos"][archivo], inicio, largo))
+        return candidatos
+
+    def buscar(self, campo, valor):
+        """Sentencias con campo=valor
+
+        Cada candidato se verifica contra la sentencia leída: descarta
+        colisiones de hash y ubicaciones viejas de batches reescritos.
+        """
+        buscado = normalizar_valor(valor)
+        vistos = set()
+        sentencias = []
+        for ruta_batch, inicio, largo in self.ubicaciones(campo, valor):
+            try:
+                sentencia = leer_registro(ruta_batch, inicio, largo)
+            except (OSError, ValueError):
+                continue
+            id_sentencia = sentencia.get('id')
+            if normalizar_valor(sentencia.get(campo)) != buscado or id_sentencia in vistos:
+                continue
+            vistos.add(id_sentencia)
+            sentencias.append(sentencia)
+        return sentencias
+
+    def buscar_cualquiera(self, valor):
+        """Sentencias donde algún campo clave vale `valor`"""
+        resultado = {}
+        for campo in CAMPOS_CLAVE:
+            for sentencia in self.buscar(campo, valor):
+                resultado.setdefault(sentencia.get('id'), sentencia)
+        return list(resultado.values())
+
+    def cerrar(self):
+        """Liberar mmaps"""
+        for segmento in self._segmentos or []:
+            segmento.cerrar()
+        self._segmentos = None
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+
+    if len(args) < 2 or args[0] not in ('construir', 'buscar'):
+        print("Uso:")
+        print("  python indice_claves.py construir DIRECTORIO_BATCHES [--indice=DIR] [--compactar]")
+        print(f"  python indice_claves.py buscar VALOR [--campo={'|'.join(CAMPOS_CLAVE)}] [--indice=DIR]")
+        print("Ejemplo: python indice_claves.py buscar O-5340-2022")
+        sys.exit(1)
+
+    indice = IndiceClaves(opciones.get('indice', INDICE_DEFAULT))
+
+    if args[0] == 'construir':
+        print("🗝️ CONSTRUYENDO ÍNDICE DE CLAVES DE CAUSA")
+        print("=" * 60)
+        total_batches, total_sentencias = indice.construir(args[1], completo='--compactar' in sys.argv)
+        print(f"\n✅ Índice actualizado")
+        print(f"📦 Batches nuevos: {total_batches}")
+        print(f"📊 Sentencias en segmento nuevo: {total_sentencias:,}")
+        print(f"🗂️ Segmentos: {len(indice.meta['segmentos'])}")
+        return
+
+    campo = opciones.get('campo')
+    if campo and campo not in CAMPOS_CLAVE:
+        print(f"❌ Campo no indexado: {campo}")
+        sys.exit(1)
+
+    sentencias = indice.buscar(campo, args[1]) if campo else indice.buscar_cualquiera(args[1])
+    print(f"🗝️ {len(sentencias)} sentencias para {args[1]}")
+    for sentencia in sentencias:
+        print(f"   📄 {sentencia.get('id')} | {sentencia.get('rol_era_sup_s') or sentencia.get('rol_era_ape_s')} | "
+              f"{(sentencia.get('fec_sentencia_sup_dt') or '')[:10]} | {sentencia.get('caratulado_s')}")
+
+    indice.cerrar()
+
+
+if __name__ == "__main__":
+    main()
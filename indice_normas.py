@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Índice invertido de citas normativas: (norma, artículo) → ids de sentencias
+Se construye por segmentos a medida que llegan batches y se consulta con
+mmap, sin recorrer el corpus
+
+Las listas guardan números internos de documento (densos, 32 bits); la tabla
+documentos.txt traduce cada número al id de la sentencia, que puede ser
+compuesto ("13441488-126039873"). Cada batch ocupa un rango contiguo de
+números: si el batch se reescribe, su rango anterior se marca como borrado.
+"""
+
+import re
+import sys
+import json
+import mmap
+import array
+import unicodedata
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from pathlib import Path
+
+from corpus_local import iterar_batches, firma_archivo
+
+INDICE_DEFAULT = "output/indice_normas"
+
+# Números internos de documento como enteros sin signo de 32 bits
+TIPO_ID = 'I'
+
+_ESPACIOS = re.compile(r'\s+')
+_PREFIJO_ARTICULO = re.compile(r'^(ART[IÍ]CULO|ART)\.?\s*', re.IGNORECASE)
+
+
+def normalizar_nombre(nombre):
+    """Normalizar nombre de norma para búsquedas (mayúsculas, sin tildes ni espacios extra)"""
+    nombre = unicodedata.normalize('NFKD', str(nombre))
+    nombre = ''.join(c for c in nombre if not unicodedata.combining(c))
+    return _ESPACIOS.sub(' ', nombre).strip().upper()
+
+
+def normalizar_articulo(articulo):
+    """Normalizar artículo: 'Art. 296 ' → '296'"""
+    articulo = _ESPACIOS.sub(' ', str(articulo)).strip()
+    return _PREFIJO_ARTICULO.sub('', articulo).upper()
+
+
+def citas_sentencia(sentencia):
+    """Obtener las citas (id_norma, artículo) de una sentencia"""
+    ids_norma = sentencia.get('id_norma_ss') or []
+    articulos = sentencia.get('gls_tituloparte_ss') or []
+
+    # Si falta el título de la parte, el artículo viene tras el tabulador en norma_articulo_ss
+    if not articulos:
+        articulos = [
+            re.split(r'\\t|\t', valor)[-1] for valor in sentencia.get('norma_articulo_ss') or []
+        ]
+
+    citas = set()
+    for i, id_norma in enumerate(ids_norma):
+        articulo = normalizar_articulo(articulos[i]) if i < len(articulos) else ''
+        citas.add((str(id_norma), articulo))
+    return citas
+
+
+def nombres_normas(sentencia):
+    """Nombres con que se puede referir cada norma citada"""
+    nombres = {}
+    for campo in ('gls_usocomun_ss', 'tipo_num_ss'):
+        for i, id_norma in enumerate(sentencia.get('id_norma_ss') or []):
+            valores = sentencia.get(campo) or []
+            if i < len(valores) and valores[i]:
+                nombres[normalizar_nombre(valores[i])] = str(id_norma)
+    return nombres
+
+
+class IndiceNormas:
+    """Índice por segmentos: cada construcción incremental agrega un segmento"""
+
+    def __init__(self, directorio=INDICE_DEFAULT):
+        self.directorio = Path(directorio)
+        self.meta_file = self.directorio / "meta.json"
+        self.documentos_file = self.directorio / "documentos.txt"
+        self.cargar_meta()
+        self._segmentos = None
+        self._documentos = None
+
+    def cargar_meta(self):
+        """Cargar metadatos del índice
+
+        Un índice de versiones anteriores (ids numéricos en las listas, sin
+        tabla de documentos) se descarta y se reconstruye desde cero.
+        """
+        self.meta = None
+        if self.meta_file.exists():
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+            if "documentos" not in self.meta:
+                self._borrar_segmentos(self.meta.get("segmentos", []))
+                self.meta = None
+
+        if self.meta is None:
+            self.meta = {"segmentos": [], "normas": {}, "batches": {}, "documentos": 0,
+                         "documentos_bytes": 0, "borrados": []}
+            self.documentos_file.unlink(missing_ok=True)
+        self._recortar_documentos()
+
+    def _recortar_documentos(self):
+        """Descartar los ids que agregó una construcción interrumpida antes de guardar meta.json
+
+        Sin esto la siguiente construcción numeraría desde meta["documentos"]
+        mientras la tabla ya tiene más líneas, y las consultas devolverían
+        sentencias equivocadas.
+        """
+        if not self.documentos_file.exists():
+            return
+        if "documentos_bytes" not in self.meta:
+            # Índices anteriores solo guardaban la cantidad de documentos
+            posicion = 0
+            with open(self.documentos_file, 'rb') as f:
+                for _ in range(self.meta["documentos"]):
+                    posicion += len(f.readline())
+            self.meta["documentos_bytes"] = posicion
+        if self.documentos_file.stat().st_size > self.meta["documentos_bytes"]:
+            with open(self.documentos_file, 'r+b') as f:
+                f.truncate(self.meta["documentos_bytes"])
+
+    def guardar_meta(self):
+        """Guardar metadatos del índice"""
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.meta["ultima_actualizacion"] = datetime.now().isoformat()
+        tmp = self.meta_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        tmp.replace(self.meta_file)
+
+    def _borrar_segmentos(self, nombres):
+        """Eliminar los archivos de segmentos"""
+        for nombre in nombres:
+            (self.directorio / f"{nombre}.bin").unlink(missing_ok=True)
+            (self.directorio / f"{nombre}.claves.json").unlink(missing_ok=True)
+
+    def _escribir_segmento(self, nombre, postings):
+        """Escribir un segmento: listas ordenadas de documentos concatenadas + directorio de claves"""
+        claves = {}
+        with open(self.directorio / f"{nombre}.bin", 'wb') as f:
+            offset = 0
+            for clave in sorted(postings):
+                ids = array.array(TIPO_ID, sorted(postings[clave]))
+                ids.tofile(f)
+                claves[clave] = [offset, len(ids)]
+                offset += len(ids)
+
+        with open(self.directorio / f"{nombre}.claves.json", 'w', encoding='utf-8') as f:
+            json.dump(claves, f, ensure_ascii=False)
+
+    def construir(self, directorio_batches):
+        """Indexar batches nuevos o reescritos en un segmento nuevo
+
+        Las sentencias reciben números de documento consecutivos; el rango de
+        un batch reescrito queda como borrado y se descarta al consultar.
+        """
+        postings = {}
+        total_batches = 0
+        siguiente = self.meta["documentos"]
+
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        # meta.json confirma la tabla: lo agregado sin guardar meta se recorta al cargar
+        with open(self.documentos_file, 'ab') as tabla:
+            for tribunal, ruta_batch, sentencias in iterar_batches(directorio_batches):
+                firma = firma_archivo(ruta_batch)
+                anterior = self.meta["batches"].get(str(ruta_batch))
+                if anterior and anterior["firma"] == firma:
+                    continue
+                if anterior:
+                    self.meta["borrados"].append(anterior["docs"])
+
+                inicio = siguiente
+                for sentencia in sentencias:
+                    id_sentencia = sentencia.get('id')
+                    if id_sentencia is None:
+                        continue
+
+                    documento = siguiente
+                    siguiente += 1
+                    tabla.write(f"{id_sentencia}\n".encode('utf-8'))
+
+                    for id_norma, articulo in citas_sentencia(sentencia):
+                        postings.setdefault(f"{id_norma}:{articulo}", set()).add(documento)
+                        postings.setdefault(f"{id_norma}:*", set()).add(documento)
+                    self.meta["normas"].update(nombres_normas(sentencia))
+
+                self.meta["batches"][str(ruta_batch)] = {"firma": firma, "docs": [inicio, siguiente]}
+                total_batches += 1
+            documentos_bytes = tabla.tell()
+
+        self.meta["documentos"] = siguiente
+        self.meta["documentos_bytes"] = documentos_bytes
+        self.meta["borrados"].sort()
+
+        if postings:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            nombre = f"segmento_{len(self.meta['segmentos']) + 1:05d}"
+            while (self.directorio / f"{nombre}.bin").exists():
+                nombre += "_"
+            self._escribir_segmento(nombre, postings)
+            self.meta["segmentos"].append(nombre)
+
+        self.guardar_meta()
+        self._segmentos = None
+        self._documentos = None
+        return total_batches, len(postings)
+
+    def compactar(self):
+        """Fusionar todos los segmentos en uno solo, descartando documentos borrados"""
+        if len(self.meta["segmentos"]) <= 1 and not self.meta["borrados"]:
+            return
+
+        postings = {}
+        for claves, _ in self._abrir_segmentos():
+            for clave in claves:
+                postings.setdefault(clave, set())
+        for clave in postings:
+            postings[clave].update(self.documentos(clave))
+
+        anteriores = list(self.meta["segmentos"])
+        nombre = f"segmento_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        self.cerrar()
+        self._escribir_segmento(nombre, postings)
+        self.meta["segmentos"] = [nombre]
+        self.meta["borrados"] = []
+        self.guardar_meta()
+
+        self._borrar_segmentos(a for a in anteriores if a != nombre)
+
+    def _abrir_segmentos(self):
+        """Abrir segmentos con mmap (perezoso)"""
+        if self._segmentos is None:
+            self._segmentos = []
+            for nombre in self.meta["segmentos"]:
+                with open(self.directorio / f"{nombre}.claves.json", 'r', encoding='utf-8') as f:
+                    claves = json.load(f)
+                ruta_bin = self.directorio / f"{nombre}.bin"
+                if ruta_bin.stat().st_size == 0:
+                    continue
+                with open(ruta_bin, 'rb') as f:
+                    datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._segmentos.append((claves, datos))
+        return self._segmentos
+
+    def _vigente(self, documento):
+        """El documento no pertenece a un rango borrado (batch reescrito)"""
+        borrados = self.meta["borrados"]
+        i = bisect_right(borrados, [documento, float('inf')]) - 1
+        return i < 0 or documento >= borrados[i][1]
+
+    def id_sentencia(self, documento):
+        """Id de la sentencia para un número interno de documento"""
+        if self._documentos is None:
+            with open(self.documentos_file, 'r', encoding='utf-8') as f:
+                self._documentos = f.read().splitlines()
+        return self._documentos[documento]
+
+    def _a_ids(self, documentos):
+        """Traducir documentos a ids de sentencia (ordenados, sin repetir)"""
+        return sorted({self.id_sentencia(documento) for documento in documentos})
+
+    def resolver_norma(self, norma):
+        """Obtener id_norma desde un id o un nombre ('CODIGO PENAL', 'LEY 20000')"""
+        norma = str(norma).strip()
+        if norma.isdigit():
+            return norma
+        return self.meta["normas"].get(normalizar_nombre(norma))
+
+    def clave(self, norma, articulo=None):
+        """Clave de consulta para una norma y artículo opcional"""
+        id_norma = self.resolver_norma(norma)
+        if id_norma is None:
+            return None
+        return f"{id_norma}:{normalizar_articulo(articulo) if articulo else '*'}"
+
+    def documentos(self, clave):
+        """Números de documento vigentes para una clave, ordenados"""
+        partes = []
+        for claves, datos in self._abrir_segmentos():
+            ubicacion = claves.get(clave)
+            if ubicacion:
+                offset, largo = ubicacion
+                vista = memoryview(datos).cast(TIPO_ID)
+                partes.append(vista[offset:offset + largo])
+
+        if len(partes) == 1 and not self.meta["borrados"]:
+            return partes[0]
+        return sorted(d for d in set().union(*partes) if self._vigente(d))
+
+    def ids(self, clave):
+        """Ids de sentencias para una clave, ordenados"""
+        return self._a_ids(self.documentos(clave))
+
+    def intersectar(self, claves):
+        """Sentencias que citan todas las claves (búsqueda binaria sobre la lista menor)"""
+        listas = sorted((self.documentos(c) for c in claves), key=len)
+        if not listas:
+            return []
+
+        resultado = []
+        menor, resto = listas[0], listas[1:]
+        for documento in menor:
+            for lista in resto:
+                i = bisect_left(lista, documento)
+                if i == len(lista) or lista[i] != documento:
+                    break
+            else:
+                resultado.append(documento)
+        return self._a_ids(resultado)
+
+    def unir(self, claves):
+        """Sentencias que citan alguna de las claves"""
+        resultado = set()
+        for c in claves:
+            resultado.update(self.documentos(c))
+        return self._a_ids(resultado)
+
+    def cerrar(self):
+        """Liberar mmaps"""
+        for _, datos in self._segmentos or []:
+            datos.close()
+        self._segmentos = None
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+
+    if len(args) < 2 or args[0] not in ('construir', 'buscar'):
+        print("Uso:")
+        print("  python indice_normas.py construir DIRECTORIO_BATCHES [--indice=DIR] [--compactar]")
+        print("  python indice_normas.py buscar NORMA[:ARTICULO] [NORMA[:ARTICULO] ...] [--cualquiera] [--indice=DIR]")
+        print("Ejemplo: python indice_normas.py buscar 'CODIGO PENAL:296' 'CODIGO PROCESAL PENAL:373'")
+        sys.exit(1)
+
+    indice = IndiceNormas(opciones.get('indice', INDICE_DEFAULT))
+
+    if args[0] == 'construir':
+        print("⚖️ CONSTRUYENDO ÍNDICE DE CITAS NORMATIVAS")
+        print("=" * 60)
+        total_batches, total_claves = indice.construir(args[1])
+        if '--compactar' in sys.argv:
+            indice.compactar()
+        print(f"\n✅ Índice actualizado")
+        print(f"📦 Batches nuevos: {total_batches}")
+        print(f"🔑 Claves en segmento nuevo: {total_claves:,}")
+        print(f"🗂️ Segmentos: {len(indice.meta['segmentos'])}")
+        return
+
+    claves = []
+    for termino in args[1:]:
+        norma, _, articulo = termino.rpartition(':') if ':' in termino else (termino, '', '')
+        clave = indice.clave(norma, articulo or None)
+        if clave is None:
+            print(f"❌ Norma desconocida: {norma}")
+            sys.exit(1)
+        claves.append(clave)
+
+    if '--cualquiera' in sys.argv:
+        resultado = indice.unir(claves)
+    else:
+        resultado = indice.intersectar(claves)
+
+    print(f"⚖️ {len(resultado)} sentencias citan {' Y '.join(args[1:]) if '--cualquiera' not in sys.argv else ' O '.join(args[1:])}")
+    for id_sentencia in resultado:
+        print(id_sentencia)
+
+    indice.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,6 @@ Script principal para iniciar la descarga del universo completo durante 5 días
 
 import os
 import sys
-import subprocess
 import time
 from datetime import datetime
 from pathlib import Path
@@ -78,10 +77,12 @@ def ejecutar_descarga_completa():
     print("⚠️  Presiona Ctrl+C para detener de forma segura")
     print("⚠️  El estado se guarda automáticamente")
     
+    from scheduler_5_dias import Scheduler5Dias
+    
     try:
-        # Ejecutar scheduler
-        subprocess.run([sys.executable, "scheduler_5_dias.py"])
-    except KeyboardInterrupt:
+        # Ejecutar scheduler en este mismo proceso
+        Scheduler5Dias().ejecutar_scheduler()
+    except (KeyboardInterrupt, SystemExit):
         print("\n⏹️ Descarga detenida por usuario")
         print("💾 Estado guardado - puedes continuar más tarde")
 
@@ -90,8 +91,10 @@ def ejecutar_monitor():
     print("\n📊 INICIANDO MONITOR")
     print("💡 Presiona Ctrl+C para salir del monitor")
     
+    from monitor_descarga_universo import MonitorDescargaUniverso
+    
     try:
-        subprocess.run([sys.executable, "monitor_descarga_universo.py"])
+        MonitorDescargaUniverso().ejecutar_monitor(30)
     except KeyboardInterrupt:
         print("\n👋 Monitor detenido")
 
@@ -107,9 +110,11 @@ def continuar_descarga():
         return
     
     print("✅ Estado encontrado - continuando...")
+    from scheduler_5_dias import Scheduler5Dias
+    
     try:
-        subprocess.run([sys.executable, "scheduler_5_dias.py"])
-    except KeyboardInterrupt:
+        Scheduler5Dias().ejecutar_scheduler()
+    except (KeyboardInterrupt, SystemExit):
         print("\n⏹️ Descarga detenida por usuario")
 
 def probar_tribunal_pequeno():
@@ -117,15 +122,17 @@ def probar_tribunal_pequeno():
     print("\n🧪 PROBANDO CON TRIBUNAL PEQUEÑO (Cobranza)")
     print("📊 ~26,000 sentencias - tiempo estimado: 30 minutos")
     
+    from descarga_universo_completo import DescargadorUniversoCompleto
+    
+    descargador = DescargadorUniversoCompleto()
     try:
-        # Ejecutar descarga solo de Cobranza
-        subprocess.run([
-            sys.executable, 
-            "descarga_universo_completo.py",
-            "--tribunal", "Cobranza"
-        ])
+        # Ejecutar descarga solo de Cobranza (Ctrl+C drena: los batches en vuelo terminan y se guardan)
+        with descargador.control.senales():
+            descargador.descargar_tribunal("Cobranza")
     except KeyboardInterrupt:
         print("\n⏹️ Prueba detenida por usuario")
+    finally:
+        descargador.cerrar_procesador()
 
 def main():
     """Función principal"""
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Integridad de los batches descargados
+Cada batch se escribe de forma atómica y queda registrado en el manifiesto
+de su tribunal (manifiesto_batches.jsonl) con cantidad de sentencias,
+tamaño y CRC32. El validador revisa el árbol en paralelo con varios
+procesos y lista los batches corruptos o faltantes para volver a bajarlos
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from corpus_local import listar_batches, tribunal_de_batch
+
+MANIFIESTO_BATCHES = "manifiesto_batches.jsonl"
+REPORTE_INVALIDOS = "batches_invalidos.json"
+ESTADO_DESCARGA = "estado_descarga.json"
+BLOQUE_LECTURA = 4 * 1024 * 1024
+
+_NUMERO_BATCH = re.compile(r'batch_(\d+)\.json$')
+
+
+def hash_rapido(datos, valor=0):
+    """CRC32 (suficiente para detectar truncamientos y corrupción, a varios GB/s)"""
+    return zlib.crc32(datos, valor)
+
+
+def escribir_batch(ruta_batch, contenido, total_sentencias):
+    """Escribir un batch de forma atómica y registrarlo en el manifiesto del tribunal"""
+    ruta_batch = Path(ruta_batch)
+    datos = json.dumps(contenido, ensure_ascii=False, indent=2).encode('utf-8')
+
+    tmp = ruta_batch.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(datos)
+    tmp.replace(ruta_batch)
+
+    entrada = {
+        "archivo": ruta_batch.name,
+        "sentencias": total_sentencias,
+        "bytes": len(datos),
+        "crc32": f"{hash_rapido(datos):08x}",
+        "fecha": datetime.now().isoformat(),
+    }
+    # Escriben varios procesos (pool de ProcesadorBatches): cada línea va en un
+    # solo write() con O_APPEND, que el sistema agrega entera al final del archivo
+    linea = (json.dumps(entrada, ensure_ascii=False) + "\n").encode('utf-8')
+    fd = os.open(ruta_batch.parent / MANIFIESTO_BATCHES, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, linea)
+    finally:
+        os.close(fd)
+    return entrada
+
+
+def cargar_manifiesto(directorio_tribunal):
+    """Última entrada registrada por archivo (una línea cortada por un corte se ignora)"""
+    entradas = {}
+    ruta = Path(directorio_tribunal) / MANIFIESTO_BATCHES
+    if ruta.exists():
+        with open(ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    continue
+                entradas[entrada["archivo"]] = entrada
+    return entradas
+
+
+def batches_esperados(directorio, manifiestos):
+    """Cantidad de batches que debería tener cada tribunal según estado_descarga.json
+
+    Es el rango real de la descarga: hasta total/batch_size sin pasar de
+    batch_actual (lo que sigue aún no se baja). Si el total era una
+    estimación, las páginas vacías del final no se escriben: el último
+    batch incompleto según el manifiesto marca dónde terminan los datos.
+    """
+    ruta = Path(directorio) / ESTADO_DESCARGA
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            tribunales = json.load(f).get("tribunales", {})
+    except (OSError, ValueError):
+        return {}
+
+    esperados = {}
+    for tribunal, estado in tribunales.items():
+        total, batch_size = estado.get("total"), estado.get("batch_size")
+        if not total or not batch_size:
+            continue
+        esperados[tribunal] = min(-(-total // batch_size), estado.get("batch_actual", 0))
+
+        incompletos = []
+        for archivo, entrada in manifiestos.get(tribunal, {}).items():
+            coincidencia = _NUMERO_BATCH.search(archivo)
+            if coincidencia and entrada.get("sentencias", 0) < batch_size:
+                incompletos.append(int(coincidencia.group(1)))
+        if incompletos:
+            esperados[tribunal] = min(esperados[tribunal], max(incompletos) + 1)
+    return esperados
+
+
+def validar_batch(tarea):
+    """Validar un batch (se ejecuta en un proceso del pool)
+
+    Recibe (ruta, entrada del manifiesto o None, rápido) y devuelve el motivo
+    del problema o None. Con manifiesto, en modo rápido solo compara tamaño y
+    el cierre del JSON; si no, calcula el CRC32 sin parsear. Sin manifiesto
+    se parsea el JSON completo.
+    """
+    ruta, entrada, rapido = tarea
+    try:
+        tamano = os.path.getsize(ruta)
+    except OSError:
+        return "faltante"
+
+    if entrada is None:
+        try:
+            with open(ruta, 'rb') as f:
+                contenido = json.loads(f.read())
+        except ValueError:
+            return "json_invalido"
+        sentencias = contenido.get('sentencias') if isinstance(contenido, dict) else contenido
+        return None if isinstance(sentencias, list) else "formato_desconocido"
+
+    if tamano != entrada["bytes"]:
+        return f"tamano ({tamano} de {entrada['bytes']} bytes)"
+
+    with open(ruta, 'rb') as f:
+        if rapido:
+            f.seek(max(0, tamano - 16))
+            final = f.read().rstrip()
+            return None if final.endswith((b']', b'}')) else "truncado"
+
+        crc = 0
+        for bloque in iter(lambda: f.read(BLOQUE_LECTURA), b''):
+            crc = hash_rapido(bloque, crc)
+    return None if f"{crc:08x}" == entrada["crc32"] else "crc32"
+
+
+def validar_arbol(directorio, workers=None, rapido=False):
+    """Validar todos los batches de un árbol de descarga
+
+    Devuelve una lista de problemas {tribunal, archivo, batch, motivo}: archivos
+    dañados, registrados en el manifiesto pero ausentes, y huecos en la
+    numeración batch_NNNNNN dentro del rango de la descarga (batches_esperados).
+    """
+    directorio = Path(directorio)
+    manifiestos = {}
+    tareas = []
+    numeros = {}
+
+    for ruta_batch in listar_batches(directorio):
+        tribunal = tribunal_de_batch(ruta_batch)
+        if tribunal not in manifiestos:
+            manifiestos[tribunal] = cargar_manifiesto(ruta_batch.parent)
+        tareas.append((str(ruta_batch), manifiestos[tribunal].get(ruta_batch.name), rapido))
+
+    # Tribunales que solo tienen manifiesto (todos sus batches se perdieron)
+    for manifiesto in directorio.glob(f"*/{MANIFIESTO_BATCHES}"):
+        manifiestos.setdefault(manifiesto.parent.name, cargar_manifiesto(manifiesto.parent))
+
+    presentes = {(Path(ruta).parent.name, Path(ruta).name) for ruta, _, _ in tareas}
+    for tribunal, entradas in manifiestos.items():
+        for archivo, entrada in entradas.items():
+            if (tribunal, archivo) not in presentes:
+                tareas.append((str(directorio / tribunal / archivo), entrada, rapido))
+
+    problemas = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for (ruta, _, _), motivo in zip(tareas, executor.map(validar_batch, tareas, chunksize=64)):
+            ruta = Path(ruta)
+            coincidencia = _NUMERO_BATCH.search(ruta.name)
+            if coincidencia:
+                numeros.setdefault(ruta.parent.name, set()).add(int(coincidencia.group(1)))
+            if motivo:
+                problemas.append({
+                    "tribunal": ruta.parent.name,
+                    "archivo": ruta.name,
+                    "batch": int(coincidencia.group(1)) if coincidencia else None,
+                    "motivo": motivo,
+                })
+
+    # Huecos en la numeración: batches que nunca llegaron a escribirse. Con el estado
+    # de la descarga se revisa su rango real; sin él, entre el primero y el último presentes
+    esperados = batches_esperados(directorio, manifiestos)
+    for tribunal in sorted(set(numeros) | set(esperados)):
+        existentes = numeros.get(tribunal, set())
+        if tribunal in esperados:
+            rango = range(esperados[tribunal])
+        else:
+            rango = range(min(existentes), max(existentes) + 1)
+        for numero in rango:
+            if numero not in existentes:
+                problemas.append({
+                    "tribunal": tribunal,
+                    "archivo": f"batch_{numero:06d}.json",
+                    "batch": numero,
+                    "motivo": "faltante",
+                })
+
+    problemas.sort(key=lambda p: (p["tribunal"], p["archivo"]))
+    return problemas, len(tareas)
+
+
+def guardar_reporte(directorio, problemas):
+    """Guardar la lista de batches a volver a descargar"""
+    ruta = Path(directorio) / REPORTE_INVALIDOS
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({
+            "fecha": datetime.now().isoformat(),
+            "total": len(problemas),
+            "batches": problemas
+        }, f, ensure_ascii=False, indent=2)
+    return ruta
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = dict(
+        a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a
+    )
+
+    if len(args) < 1:
+        print("Uso: python integridad_batches.py DIRECTORIO_BATCHES [--rapido] [--workers=N]")
+        print("Ejemplo: python integridad_batches.py output/universo_completo")
+        sys.exit(1)
+
+    rapido = '--rapido' in sys.argv
+    workers = int(opciones['workers']) if 'workers' in opciones else None
+
+    print("🛡️ VALIDANDO INTEGRIDAD DE BATCHES")
+    print(f"📁 {args[0]} | Modo: {'rápido (tamaño y cierre)' if rapido else 'completo (CRC32)'}")
+    print("=" * 60)
+
+    inicio = datetime.now()
+    problemas, total = validar_arbol(args[0], workers=workers, rapido=rapido)
+    reporte = guardar_reporte(args[0], problemas)
+
+    for problema in problemas[:50]:
+        print(f"   ❌ {problema['tribunal']}/{problema['archivo']}: {problema['motivo']}")
+    if len(problemas) > 50:
+        print(f"   ... y {len(problemas) - 50} más")
+
+    print(f"\n✅ Validación completada en {(datetime.now() - inicio).total_seconds():.1f}s")
+    print(f"📦 Batches revisados: {total:,}")
+    print(f"❌ Corruptos o faltantes: {len(problemas):,}")
+    print(f"💾 Reporte: {reporte}")
+
+    sys.exit(1 if problemas else 0)
+
+
+if __name__ == "__main__":
+    main()
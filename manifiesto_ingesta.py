@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Manifiesto local de ingesta
+Recuerda qué archivos y filas ya se cargaron a Supabase para que los
+reintentos y los rangos de fechas solapados solo envíen lo nuevo o modificado
+"""
+
+import sys
+import json
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+MANIFIESTO_DEFAULT = "output/manifiesto_ingesta.json"
+
+# Campos que cambian en cada preparación y no representan cambios reales
+CAMPOS_VOLATILES = ('fecha_actualizacion',)
+
+
+def hash_archivo(ruta, bloque=1024 * 1024):
+    """Calcular hash del contenido de un archivo leyendo por bloques"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, 'rb') as f:
+        for chunk in iter(lambda: f.read(bloque), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def clave_fila(fila):
+    """Obtener la clave estable de una fila (id PJUD o URL de acceso)"""
+    if fila.get('id'):
+        return str(fila['id'])
+    if fila.get('url_acceso'):
+        return fila['url_acceso']
+    return digest_fila(fila)
+
+
+def es_url_acceso(clave):
+    """Verificar si una clave es una URL de acceso (y no un id o un digest)"""
+    return clave.startswith(('http://', 'https://'))
+
+
+def digest_fila(fila):
+    """Digest de una fila: id + _version_ si existen, si no su contenido"""
+    if fila.get('id') and fila.get('_version_') is not None:
+        return f"{fila['id']}:{fila['_version_']}"
+
+    contenido = {k: v for k, v in fila.items() if k not in CAMPOS_VOLATILES}
+    serializado = json.dumps(contenido, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(serializado.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ManifiestoIngesta:
+    """Manifiesto persistente con hashes por archivo y digests por fila"""
+
+    def __init__(self, ruta=MANIFIESTO_DEFAULT):
+        self.ruta = Path(ruta)
+        self.cargar()
+
+    def cargar(self):
+        """Cargar manifiesto desde disco"""
+        if self.ruta.exists():
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                self.datos = json.load(f)
+        else:
+            self.datos = {
+                "creado": datetime.now().isoformat(),
+                "archivos": {},
+                "filas": {}
+            }
+
+    def guardar(self):
+        """Guardar manifiesto de forma atómica"""
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.datos["ultima_actualizacion"] = datetime.now().isoformat()
+
+        tmp = self.ruta.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.datos, f, ensure_ascii=False)
+        tmp.replace(self.ruta)
+
+    def archivo_ingerido(self, ruta_archivo):
+        """Verificar si un archivo ya fue cargado completo con el mismo contenido"""
+        ruta_archivo = Path(ruta_archivo)
+        registro = self.datos["archivos"].get(str(ruta_archivo))
+        return registro is not None and registro.get("hash") == hash_archivo(ruta_archivo)
+
+    def registrar_archivo(self, ruta_archivo, total_filas):
+        """Registrar un archivo cargado completamente"""
+        ruta_archivo = Path(ruta_archivo)
+        self.datos["archivos"][str(ruta_archivo)] = {
+            "hash": hash_archivo(ruta_archivo),
+            "filas": total_filas,
+            "fecha": datetime.now().isoformat()
+        }
+
+    def filtrar_pendientes(self, filas):
+        """Devolver solo las filas nuevas o modificadas"""
+        registradas = self.datos["filas"]
+        return [f for f in filas if registradas.get(clave_fila(f)) != digest_fila(f)]
+
+    def ya_registrada(self, fila):
+        """Verificar si la clave de la fila ya se cargó (con este u otro contenido)"""
+        return clave_fila(fila) in self.datos["filas"]
+
+    def registrar_filas(self, filas):
+        """Registrar filas cargadas exitosamente"""
+        for fila in filas:
+            self.datos["filas"][clave_fila(fila)] = digest_fila(fila)
+
+    def olvidar_filas(self, claves):
+        """Eliminar filas del manifiesto para que se vuelvan a enviar"""
+        for clave in claves:
+            self.datos["filas"].pop(clave, None)
+        # Un archivo con filas olvidadas ya no está completo
+        if claves:
+            self.datos["archivos"] = {}
+
+    def reconciliar(self, supabase, tabla='sentencias', columna='url_acceso', tamano_lote=200):
+        """Contrastar el manifiesto con la tabla destino mediante consultas por clave
+
+        Solo se piden las claves (sin traer filas completas). Las filas que el
+        manifiesto da por cargadas pero no existen en la tabla se olvidan para
+        que la siguiente carga las reenvíe. Devuelve las claves faltantes.
+
+        Las claves que no son URL de acceso (ids o digests de contenido) no se
+        pueden buscar en esa columna y quedan fuera de la reconciliación.
+        """
+        claves = [c for c in self.datos["filas"] if es_url_acceso(c)]
+        faltantes = []
+
+        for i in range(0, len(claves), tamano_lote):
+            lote = claves[i:i + tamano_lote]
+            response = supabase.table(tabla).select(columna).in_(columna, lote).execute()
+            presentes = {fila[columna] for fila in response.data}
+            faltantes.extend(c for c in lote if c not in presentes)
+
+        self.olvidar_filas(faltantes)
+        return faltantes
+
+    def resumen(self):
+        """Resumen del contenido del manifiesto"""
+        return {
+            "archivos": len(self.datos["archivos"]),
+            "filas": len(self.datos["filas"]),
+            "ultima_actualizacion": self.datos.get("ultima_actualizacion")
+        }
+
+
+def main():
+    """Función principal"""
+    ruta = sys.argv[1] if len(sys.argv) > 1 else MANIFIESTO_DEFAULT
+
+    if not Path(ruta).exists():
+        print(f"⚠️ No existe manifiesto en {ruta}")
+        sys.exit(1)
+
+    resumen = ManifiestoIngesta(ruta).resumen()
+    print("📒 MANIFIESTO DE INGESTA")
+    print("=" * 60)
+    print(f"   Archivos cargados: {resumen['archivos']}")
+    print(f"   Filas registradas: {resumen['filas']:,}")
+    print(f"   Última actualización: {resumen['ultima_actualizacion']}")
+
+
+if __name__ == "__main__":
+    main()
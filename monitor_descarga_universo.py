@@ -8,7 +8,6 @@ import os
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
-import subprocess
 import sys
 
 class MonitorDescargaUniverso:
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Normalización de textos de sentencias: HTML → texto Unicode limpio
+Convierte texto_sentencia y sus variantes _anon/_preview con escaneo por
+expresiones precompiladas (sin parser DOM). La conversión es más rápida que
+leer el resultado desde una caché en disco, así que cada consumidor (índice
+de búsqueda, duplicados, carga a Supabase) la calcula al vuelo
+"""
+
+import re
+import sys
+import time
+import html
+import unicodedata
+from functools import lru_cache
+
+from corpus_local import iterar_batches
+
+CAMPOS_NORMALIZABLES = (
+    'texto_sentencia',
+    'texto_sentencia_anon',
+    'texto_sentencia_preview',
+    'texto_sentencia_anon_preview',
+)
+
+# Escáner precompilado para el marcado que queda tras el camino rápido:
+# etiquetas y entidades HTML. Un '<' suelto no es etiqueta.
+_MARCADO = re.compile(
+    r'<[A-Za-z/!][^<>]*>|&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);'
+)
+_ESPACIOS_REPETIDOS = re.compile(r'  +')
+_LINEAS_VACIAS = re.compile(r'\n{3,}')
+
+# Espacios irregulares que se reducen a un espacio simple
+_ESPACIOS_RAROS = ('\t', '\xa0', '\r', '\f', '\v', '\u2007', '\u202f')
+
+
+@lru_cache(maxsize=4096)
+def _reemplazo_marcado(marcado):
+    """Traducción de una etiqueta o entidad (con caché: se repiten mucho)"""
+    if marcado[0] == '&':
+        return html.unescape(marcado).replace('\xa0', ' ')
+
+    etiqueta = marcado[1:].lstrip('/').split(None, 1)[0].rstrip('/>').lower()
+    if etiqueta == 'br':
+        return '\n'
+    if etiqueta in ('p', 'div'):
+        return '\n\n'
+    return ''
+
+
+def normalizar_html(texto):
+    """Convertir un fragmento HTML de sentencia a texto plano con párrafos
+
+    Un <br/> es fin de línea y dos o más seguidos separan párrafos. El caso
+    dominante (<br/>) se resuelve con str.replace; solo si queda marcado se
+    recorre el texto con el escáner precompilado.
+    """
+    if not texto:
+        return ''
+    if isinstance(texto, list):
+        texto = '\n'.join(str(t) for t in texto)
+
+    if '<' in texto:
+        texto = texto.replace('<br/>', '\n')
+    if '<' in texto or '&' in texto:
+        texto = _MARCADO.sub(lambda m: _reemplazo_marcado(m.group()), texto)
+
+    for espacio in _ESPACIOS_RAROS:
+        if espacio in texto:
+            texto = texto.replace(espacio, ' ')
+    if '  ' in texto:
+        texto = _ESPACIOS_REPETIDOS.sub(' ', texto)
+    if ' \n' in texto or '\n ' in texto:
+        texto = '\n'.join(linea.strip(' ') for linea in texto.split('\n'))
+    if '\n\n\n' in texto:
+        texto = _LINEAS_VACIAS.sub('\n\n', texto)
+
+    if not unicodedata.is_normalized('NFC', texto):
+        texto = unicodedata.normalize('NFC', texto)
+    return texto.strip()
+
+
+def normalizar_sentencia(sentencia):
+    """Textos normalizados de todos los campos HTML de una sentencia"""
+    return {campo: normalizar_html(sentencia.get(campo)) for campo in CAMPOS_NORMALIZABLES}
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+
+    if len(args) < 1:
+        print("Uso: python normalizar_textos.py DIRECTORIO_BATCHES")
+        print("Ejemplo: python normalizar_textos.py output/universo_completo")
+        sys.exit(1)
+
+    print("🧹 NORMALIZANDO TEXTOS DE SENTENCIAS")
+    print("=" * 60)
+
+    total_bytes = 0
+    total_sentencias = 0
+    tiempo_normalizacion = 0.0
+
+    for tribunal, ruta_batch, sentencias in iterar_batches(args[0]):
+        total_bytes += sum(
+            len(sentencia[campo].encode('utf-8'))
+            for sentencia in sentencias for campo in CAMPOS_NORMALIZABLES
+            if isinstance(sentencia.get(campo), str)
+        )
+        inicio = time.perf_counter()
+        for sentencia in sentencias:
+            normalizar_sentencia(sentencia)
+        tiempo_normalizacion += time.perf_counter() - inicio
+        total_sentencias += len(sentencias)
+        print(f"   ✅ {tribunal} - {ruta_batch.name}: {len(sentencias)} sentencias")
+
+    mb = total_bytes / (1024 * 1024)
+    print(f"\n✅ Normalización completada")
+    print(f"📊 Sentencias: {total_sentencias:,}")
+    print(f"📏 Texto HTML procesado: {mb:.1f} MB en {tiempo_normalizacion:.2f}s")
+    if tiempo_normalizacion > 0:
+        print(f"⚡ Rendimiento: {mb / tiempo_normalizacion:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
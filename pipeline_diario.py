@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Pipeline continuo: descarga → transformación → carga a Supabase
+Las páginas fluyen por colas acotadas en memoria, sin archivos intermedios
+"""
+
+import sys
+import json
+import queue
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from descargar_sentencias_api import DescargadorSentencias, EscritorJSONIncremental
+from preparar_para_supabase import mapear_sentencia
+from cargar_a_supabase import cargar_lote
+from manifiesto_ingesta import ManifiestoIngesta, MANIFIESTO_DEFAULT
+from trazas import tramo, etapa, activar_desde_argv
+
+FIN = None  # Marca de fin de cola
+ESPERA_COLA = 0.5  # Segundos entre revisiones de la señal de detención
+
+
+class PipelineDiario:
+    """Encadena descarga, mapeo y carga con colas acotadas (backpressure)"""
+
+    def __init__(self, supabase, manifiesto=None, archivo_crudo=None,
+                 tamano_cola=4, batch_size=100):
+        self.supabase = supabase
+        self.manifiesto = manifiesto
+        self.archivo_crudo = archivo_crudo
+        self.batch_size = batch_size
+
+        # Colas acotadas: si la carga se atrasa, la descarga se bloquea
+        self.cola_paginas = queue.Queue(maxsize=tamano_cola)
+        self.cola_lotes = queue.Queue(maxsize=tamano_cola)
+
+        # Si una etapa falla, las demás dejan de esperar en las colas
+        self.detener = threading.Event()
+        self.error = None
+
+        self.total_por_tribunal = {}
+        self.total_descargadas = 0
+        self.total_cargadas = 0
+        self.total_omitidas = 0
+        self.total_errores = 0
+
+    def _fallar(self, error):
+        """Registrar el primer error de una etapa y avisar a las demás"""
+        if self.error is None:
+            self.error = error
+        self.detener.set()
+
+    def _poner(self, cola, item):
+        """put() acotado que se rinde si otra etapa falló; False si se detuvo"""
+        while not self.detener.is_set():
+            try:
+                cola.put(item, timeout=ESPERA_COLA)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _tomar(self, cola):
+        """get() que devuelve FIN si otra etapa falló"""
+        while not self.detener.is_set():
+            try:
+                return cola.get(timeout=ESPERA_COLA)
+            except queue.Empty:
+                continue
+        return FIN
+
+    def _etapa_descarga(self, descargador, fecha_desde, fecha_hasta):
+        """Productor: páginas de la API hacia la cola de páginas"""
+        try:
+            with etapa("descarga"):
+                self._producir_paginas(descargador, fecha_desde, fecha_hasta)
+        except Exception as e:
+            self._fallar(e)
+
+    def _producir_paginas(self, descargador, fecha_desde, fecha_hasta):
+        try:
+            for tribunal_name, docs, num_found in descargador.iterar_paginas(fecha_desde, fecha_hasta):
+                info = self.total_por_tribunal.setdefault(tribunal_name, {
+                    'total': num_found,
+                    'descargadas': 0,
+                    'tribunal': descargador.tribunales[tribunal_name]['descripcion']
+                })
+                info['descargadas'] += len(docs)
+                self.total_descargadas += len(docs)
+                if not self._poner(self.cola_paginas, docs):
+                    return
+        finally:
+            self._poner(self.cola_paginas, FIN)
+
+    def _etapa_transformacion(self):
+        """Mapear páginas a filas Supabase, archivar crudo (tee) y armar lotes"""
+        try:
+            with etapa("transformacion"):
+                self._transformar_paginas()
+        except Exception as e:
+            self._fallar(e)
+
+    def _transformar_paginas(self):
+        escritor = EscritorJSONIncremental(self.archivo_crudo) if self.archivo_crudo else None
+        lote = []
+
+        try:
+            while True:
+                docs = self._tomar(self.cola_paginas)
+                if docs is FIN:
+                    break
+
+                if escritor:
+                    escritor.escribir(docs)
+
+                with tramo("mapping", "cpu", sentencias=len(docs)):
+                    filas = [mapear_sentencia(sentencia) for sentencia in docs]
+                for fila in filas:
+                    lote.append(fila)
+                    if len(lote) >= self.batch_size:
+                        if not self._poner(self.cola_lotes, lote):
+                            return
+                        lote = []
+
+            if lote:
+                self._poner(self.cola_lotes, lote)
+        finally:
+            if escritor:
+                escritor.cerrar()
+            self._poner(self.cola_lotes, FIN)
+
+    def _etapa_carga(self):
+        """Consumidor: insertar lotes en Supabase a medida que llegan"""
+        try:
+            with etapa("carga"):
+                self._cargar_lotes()
+        except BaseException as e:
+            self._fallar(e)
+
+    def _cargar_lotes(self):
+        batch_num = 0
+
+        while True:
+            lote = self._tomar(self.cola_lotes)
+            if lote is FIN:
+                break
+
+            batch_num += 1
+            if self.manifiesto:
+                pendientes = self.manifiesto.filtrar_pendientes(lote)
+                self.total_omitidas += len(lote) - len(pendientes)
+                lote = pendientes
+                if not lote:
+                    continue
+
+            try:
+                cargar_lote(self.supabase, lote, self.manifiesto)
+                self.total_cargadas += len(lote)
+                if self.manifiesto:
+                    self.manifiesto.registrar_filas(lote)
+                    if batch_num % 10 == 0:
+                        self.manifiesto.guardar()
+                print(f"   ✅ Lote {batch_num}: {len(lote)} sentencias cargadas ({self.total_cargadas} total)")
+            except Exception as e:
+                self.total_errores += len(lote)
+                print(f"   ❌ Lote {batch_num}: Error - {e}")
+
+        if self.manifiesto:
+            self.manifiesto.guardar()
+
+    def ejecutar(self, descargador, fecha_desde, fecha_hasta):
+        """Ejecutar las tres etapas en paralelo y esperar a que terminen
+
+        Si alguna etapa falla, las otras se detienen y el error se relanza aquí.
+        """
+        hilo_descarga = threading.Thread(
+            target=self._etapa_descarga,
+            args=(descargador, fecha_desde, fecha_hasta),
+            name="descarga",
+            daemon=True
+        )
+        hilo_transformacion = threading.Thread(
+            target=self._etapa_transformacion,
+            name="transformacion",
+            daemon=True
+        )
+
+        hilo_descarga.start()
+        hilo_transformacion.start()
+
+        self._etapa_carga()
+
+        hilo_descarga.join()
+        hilo_transformacion.join()
+
+        if self.error is not None:
+            raise self.error
+
+        return self.total_errores == 0
+
+
+def main():
+    """Función principal"""
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opciones = [a for a in sys.argv[1:] if a.startswith('--')]
+
+    if len(args) < 4:
+        print("Uso: python pipeline_diario.py FECHA_DESDE FECHA_HASTA SUPABASE_URL SUPABASE_KEY [opciones]")
+        print("Ejemplo: python pipeline_diario.py 2025-03-01 2025-03-01 https://xxx.supabase.co xxxkey --archivar")
+        print("Opciones:")
+        print("  --archivar          Guardar también las sentencias crudas en output/descarga_api")
+        print("  --sin-manifiesto    Enviar todas las filas sin consultar el manifiesto de ingesta")
+        print("  --traza[=DIR]       Exportar tramos con tiempo como traza de Chrome (output/trazas)")
+        print("  --profile           Además, perfil cProfile y memoria (tracemalloc) por etapa")
+        sys.exit(1)
+
+    fecha_desde, fecha_hasta, supabase_url, supabase_key = args[:4]
+
+    # Validar formato de fecha
+    try:
+        datetime.strptime(fecha_desde, '%Y-%m-%d')
+        datetime.strptime(fecha_hasta, '%Y-%m-%d')
+    except ValueError:
+        print("❌ Error: Las fechas deben estar en formato YYYY-MM-DD")
+        sys.exit(1)
+
+    activar_desde_argv()
+
+    print("🚀 PIPELINE DESCARGA → TRANSFORMACIÓN → CARGA")
+    print("=" * 60)
+
+    try:
+        from supabase import create_client, Client  # Importación diferida (arranque rápido del CLI)
+        supabase: Client = create_client(supabase_url, supabase_key)
+    except Exception as e:
+        print(f"❌ Error conectando a Supabase: {e}")
+        sys.exit(1)
+
+    output_dir = Path("output/descarga_api")
+    fecha_str = fecha_desde.replace('-', '')
+    archivo_crudo = output_dir / f"sentencias_{fecha_str}.json" if '--archivar' in opciones else None
+    manifiesto = None if '--sin-manifiesto' in opciones else ManifiestoIngesta(MANIFIESTO_DEFAULT)
+
+    pipeline = PipelineDiario(supabase, manifiesto=manifiesto, archivo_crudo=archivo_crudo)
+    exito = pipeline.ejecutar(DescargadorSentencias(), fecha_desde, fecha_hasta)
+
+    # Guardar resumen
+    output_dir.mkdir(parents=True, exist_ok=True)
+    resumen = {
+        'fecha_ejecucion': datetime.now().isoformat(),
+        'rango_fechas': {
+            'desde': fecha_desde,
+            'hasta': fecha_hasta
+        },
+        'total_sentencias': pipeline.total_descargadas,
+        'total_cargadas': pipeline.total_cargadas,
+        'total_omitidas_manifiesto': pipeline.total_omitidas,
+        'total_errores': pipeline.total_errores,
+        'por_tribunal': pipeline.total_por_tribunal,
+        'archivo_sentencias': str(archivo_crudo) if archivo_crudo else None
+    }
+    resumen_file = output_dir / f"resumen_{fecha_str}.json"
+    with open(resumen_file, 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 60)
+    print("📊 RESUMEN DEL PIPELINE")
+    print(f"   📥 Descargadas: {pipeline.total_descargadas}")
+    print(f"   ✅ Cargadas: {pipeline.total_cargadas}")
+    print(f"   ⏭️ Ya cargadas (manifiesto): {pipeline.total_omitidas}")
+    print(f"   ❌ Con errores: {pipeline.total_errores}")
+    print(f"   💾 Resumen: {resumen_file}")
+
+    if pipeline.total_descargadas == 0:
+        print("\n⚠️ No se encontraron sentencias para el rango especificado")
+        sys.exit(1)
+
+    if not exito:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
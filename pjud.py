@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Punto de entrada único con subcomandos
+Cada subcomando importa su módulo recién al ejecutarse, así comandos como
+el monitor o el menú de recuperación arrancan sin cargar requests, bs4 ni
+supabase, y los orquestadores llaman a los demás en el mismo proceso
+"""
+
+import sys
+import importlib
+
+# subcomando: (módulo, descripción)
+COMANDOS = {
+    'download': ('descargar_sentencias_api', "Descargar sentencias de un rango de fechas"),
+    'backfill': ('backfill_sentencias', "Completar los días faltantes del calendario de descarga"),
+    'universe': ('descarga_universo_completo', "Descargar el universo completo (o --tribunal=X)"),
+    'scheduler': ('scheduler_5_dias', "Scheduler de la descarga del universo (5 días)"),
+    'prepare': ('preparar_para_supabase', "Mapear sentencias descargadas al formato de Supabase"),
+    'load': ('cargar_a_supabase', "Cargar un archivo preparado a Supabase"),
+    'pipeline': ('pipeline_diario', "Descarga → transformación → carga en un solo proceso"),
+    'monitor': ('monitor_descarga_universo', "Monitor en tiempo real de la descarga del universo"),
+    'control': ('control_descarga', "Pausar, reanudar, drenar o ajustar una descarga en curso"),
+    'budget': ('presupuesto_ip', "Ver o fijar el ritmo de solicitudes de la máquina"),
+    'breaker': ('cortacircuitos', "Ver o reiniciar el cortacircuitos ante bloqueos del servidor"),
+    'recover': ('recuperar_descarga', "Menú de recuperación de descargas interrumpidas"),
+    'validate': ('integridad_batches', "Validar la integridad de los batches descargados"),
+    'audit': ('auditoria_conteos', "Auditar conteos locales contra el buscador"),
+}
+
+
+def main():
+    """Función principal"""
+    if len(sys.argv) < 2 or sys.argv[1] not in COMANDOS:
+        print("Uso: python pjud.py SUBCOMANDO [argumentos del subcomando]")
+        print("Ejemplo: python pjud.py download 2025-03-01 2025-03-01")
+        print("\nSubcomandos:")
+        for comando, (modulo, descripcion) in COMANDOS.items():
+            print(f"  {comando:<10} {descripcion} ({modulo}.py)")
+        sys.exit(0 if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help') else 1)
+
+    comando = sys.argv[1]
+    modulo, _ = COMANDOS[comando]
+
+    # El subcomando ve sus argumentos igual que si se ejecutara su script
+    sys.argv = [f"pjud.py {comando}"] + sys.argv[2:]
+    importlib.import_module(modulo).main()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,34 @@ import sys
 import json
 from pathlib import Path
 from datetime import datetime
+from normalizar_textos import normalizar_html
+from trazas import tramo, etapa, activar_desde_argv
+
+def mapear_sentencia(sentencia):
+    """Mapear una sentencia de la API PJUD a la estructura de la tabla Supabase"""
+    return {
+        # Campos que coinciden con la tabla Supabase
+        'rol_numero': sentencia.get('rol_era_sup_s'),
+        'rol_completo': sentencia.get('rol_era_sup_s'),
+        'caratulado': sentencia.get('des_contenido_s', '')[:500] if sentencia.get('des_contenido_s') else '',  # Limitar longitud
+        'fecha_sentencia': sentencia.get('fec_sentencia_d', '').split('T')[0] if sentencia.get('fec_sentencia_d') else None,
+        'corte': sentencia.get('gls_corte_s'),
+        'sala': sentencia.get('gls_sala_sup_s'),
+        'resultado_recurso': sentencia.get('resultado_recurso_sup_s'),
+        'texto_completo': normalizar_html(sentencia.get('des_contenido_s') or sentencia.get('texto_sentencia')) or None,
+        
+        # Campos adicionales disponibles
+        'url_acceso': f"https://juris.pjud.cl/sentencia/{sentencia.get('id')}" if sentencia.get('id') else None,
+        'condicion_publicacion': sentencia.get('gls_condicion_publicacion_s'),
+        
+        # Arrays si están disponibles
+        'ministros': sentencia.get('id_ministro_ss', []) if isinstance(sentencia.get('id_ministro_ss'), list) else [],
+        'materias': sentencia.get('gls_materia_ss', []) if isinstance(sentencia.get('gls_materia_ss'), list) else [],
+        'normas': sentencia.get('gls_norma_ss', []) if isinstance(sentencia.get('gls_norma_ss'), list) else [],
+        
+        # Metadata
+        'fecha_actualizacion': datetime.now().date().isoformat()
+    }
 
 def preparar_sentencias_para_supabase(input_dir):
     """Preparar sentencias para Supabase"""
@@ -17,8 +45,13 @@ def preparar_sentencias_para_supabase(input_dir):
         print(f"❌ Error: Directorio {input_dir} no existe")
         return False
     
-    # Buscar archivos JSON con sentencias
-    archivos_json = list(input_path.glob("sentencias_*.json"))
+    # Buscar archivos JSON con sentencias (excluyendo la salida de esta preparación):
+    # los de la descarga por tribunal y día están en subdirectorios
+    archivos_json = [
+        archivo for patron in ("sentencias_*.json", "*/sentencias_*.json")
+        for archivo in sorted(input_path.glob(patron))
+        if archivo.name != "sentencias_para_supabase.json"
+    ]
     
     if not archivos_json:
         print(f"⚠️ No se encontraron archivos de sentencias en {input_dir}")
@@ -28,44 +61,25 @@ def preparar_sentencias_para_supabase(input_dir):
     
     todas_sentencias = []
     
-    for archivo in archivos_json:
-        print(f"📖 Procesando {archivo.name}...")
-        
-        with open(archivo, 'r', encoding='utf-8') as f:
-            sentencias = json.load(f)
-        
-        # Mapear campos de la API PJUD a la estructura de la tabla Supabase
-        for sentencia in sentencias:
-            sentencia_supabase = {
-                # Campos que coinciden con la tabla Supabase
-                'rol_numero': sentencia.get('rol_era_sup_s'),
-                'rol_completo': sentencia.get('rol_era_sup_s'),
-                'caratulado': sentencia.get('des_contenido_s', '')[:500] if sentencia.get('des_contenido_s') else '',  # Limitar longitud
-                'fecha_sentencia': sentencia.get('fec_sentencia_d', '').split('T')[0] if sentencia.get('fec_sentencia_d') else None,
-                'corte': sentencia.get('gls_corte_s'),
-                'sala': sentencia.get('gls_sala_sup_s'),
-                'resultado_recurso': sentencia.get('resultado_recurso_sup_s'),
-                'texto_completo': sentencia.get('des_contenido_s'),
-                
-                # Campos adicionales disponibles
-                'url_acceso': f"https://juris.pjud.cl/sentencia/{sentencia.get('id')}" if sentencia.get('id') else None,
-                'condicion_publicacion': sentencia.get('gls_condicion_publicacion_s'),
-                
-                # Arrays si están disponibles
-                'ministros': sentencia.get('id_ministro_ss', []) if isinstance(sentencia.get('id_ministro_ss'), list) else [],
-                'materias': sentencia.get('gls_materia_ss', []) if isinstance(sentencia.get('gls_materia_ss'), list) else [],
-                'normas': sentencia.get('gls_norma_ss', []) if isinstance(sentencia.get('gls_norma_ss'), list) else [],
-                
-                # Metadata
-                'fecha_actualizacion': datetime.now().date().isoformat()
-            }
+    with etapa("transformacion"):
+        for archivo in archivos_json:
+            print(f"📖 Procesando {archivo.name}...")
             
-            todas_sentencias.append(sentencia_supabase)
-    
-    # Guardar archivo para Supabase
-    output_file = input_path / "sentencias_para_supabase.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(todas_sentencias, f, ensure_ascii=False, indent=2)
+            with tramo("decode", "cpu", archivo=archivo.name):
+                with open(archivo, 'r', encoding='utf-8') as f:
+                    sentencias = json.load(f)
+            
+            # Mapear campos de la API PJUD a la estructura de la tabla Supabase
+            with tramo("mapping", "cpu", archivo=archivo.name, sentencias=len(sentencias)):
+                for sentencia in sentencias:
+                    sentencia_supabase = mapear_sentencia(sentencia)
+                    todas_sentencias.append(sentencia_supabase)
+        
+        # Guardar archivo para Supabase
+        output_file = input_path / "sentencias_para_supabase.json"
+        with tramo("write", "escritura", archivo=output_file.name):
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(todas_sentencias, f, ensure_ascii=False, indent=2)
     
     print(f"\n✅ Preparación completada")
     print(f"📊 Total de sentencias preparadas: {len(todas_sentencias)}")
@@ -76,11 +90,12 @@ def preparar_sentencias_para_supabase(input_dir):
 def main():
     """Función principal"""
     if len(sys.argv) < 2:
-        print("Uso: python preparar_para_supabase.py DIRECTORIO_INPUT")
+        print("Uso: python preparar_para_supabase.py DIRECTORIO_INPUT [--traza[=DIR]] [--profile]")
         print("Ejemplo: python preparar_para_supabase.py output/descarga_api")
         sys.exit(1)
     
     input_dir = sys.argv[1]
+    activar_desde_argv()
     
     print("🔄 PREPARANDO SENTENCIAS PARA SUPABASE")
     print("=" * 60)
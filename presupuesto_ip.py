@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Presupuesto de solicitudes de la IP, compartido entre procesos
+Un token bucket en un archivo de estado con bloqueo: la descarga del
+universo, el scheduler, los backfills y las descargas manuales que corren
+en la misma máquina sacan turnos del mismo balde, así el ritmo total hacia
+el servidor no supera lo que tolera desde nuestra IP
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+SOLICITUDES_POR_SEGUNDO_IP = 2.0   # Ritmo total de la máquina hacia el servidor
+RAFAGA_IP = 2                      # Solicitudes que se pueden acumular sin esperar
+
+# Un solo archivo por máquina (PJUD_PRESUPUESTO lo cambia; "off" lo desactiva)
+PRESUPUESTO_DEFAULT = os.path.join(tempfile.gettempdir(), "pjud_presupuesto_ip.json")
+
+
+@contextmanager
+def archivo_bloqueado(ruta_lock, lock_hilos):
+    """Bloqueo exclusivo entre hilos (lock_hilos) y procesos (flock sobre ruta_lock)"""
+    with lock_hilos, open(ruta_lock, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        elif msvcrt:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            elif msvcrt:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class PresupuestoIP:
+    """Token bucket en disco; esperar() reserva un turno y duerme hasta él
+
+    El balde puede quedar en negativo: son turnos ya reservados por otros
+    procesos, que se atienden en orden de llegada al archivo.
+    """
+
+    def __init__(self, ruta=PRESUPUESTO_DEFAULT):
+        self.ruta = Path(ruta)
+        self.ruta_lock = self.ruta.with_suffix('.lock')
+        self.lock = threading.Lock()   # flock no excluye entre hilos de un mismo proceso
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+
+    def _bloqueado(self):
+        """Bloqueo exclusivo del estado entre hilos y procesos"""
+        return archivo_bloqueado(self.ruta_lock, self.lock)
+
+    def _leer(self):
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            estado = {}
+        estado.setdefault("por_segundo", SOLICITUDES_POR_SEGUNDO_IP)
+        estado.setdefault("rafaga", RAFAGA_IP)
+        estado.setdefault("tokens", estado["rafaga"])
+        estado.setdefault("actualizado", time.time())
+        return estado
+
+    def _escribir(self, estado):
+        tmp = self.ruta.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(estado, f)
+        tmp.replace(self.ruta)
+
+    def _rellenar(self, estado, ahora):
+        """Sumar los tokens acumulados desde la última lectura (hasta la ráfaga)"""
+        transcurrido = max(0.0, ahora - estado["actualizado"])
+        estado["tokens"] = min(estado["rafaga"], estado["tokens"] + transcurrido * estado["por_segundo"])
+        estado["actualizado"] = ahora
+
+    def reservar(self):
+        """Reservar un turno; devuelve los segundos a esperar hasta él"""
+        with self._bloqueado():
+            estado = self._leer()
+            ahora = time.time()
+            self._rellenar(estado, ahora)
+            estado["tokens"] -= 1
+            estado["solicitudes"] = estado.get("solicitudes", 0) + 1
+            self._escribir(estado)
+        return max(0.0, -estado["tokens"] / estado["por_segundo"])
+
+    def esperar(self):
+        """Bloquear hasta el turno de la próxima solicitud"""
+        espera = self.reservar()
+        if espera > 0:
+            time.sleep(espera)
+
+    def fijar(self, por_segundo, rafaga=None):
+        """Cambiar el ritmo de la máquina (rige de inmediato para todos los procesos)"""
+        if por_segundo <= 0:
+            raise ValueError("el ritmo debe ser mayor que 0")
+        with self._bloqueado():
+            estado = self._leer()
+            self._rellenar(estado, time.time())
+            estado["por_segundo"] = por_segundo
+            if rafaga is not None:
+                estado["rafaga"] = max(1, rafaga)
+            estado["tokens"] = min(estado["tokens"], estado["rafaga"])
+            self._escribir(estado)
+        return estado
+
+    def estado(self):
+        """Estado actual del balde (sin reservar)"""
+        with self._bloqueado():
+            estado = self._leer()
+        self._rellenar(estado, time.time())
+        return estado
+
+
+class _SinPresupuesto:
+    """Presupuesto desactivado (PJUD_PRESUPUESTO=off)"""
+
+    def esperar(self):
+        pass
+
+
+_presupuesto = None
+
+
+def presupuesto_ip():
+    """Presupuesto de la máquina, uno por proceso"""
+    global _presupuesto
+    if _presupuesto is None:
+        ruta = os.environ.get("PJUD_PRESUPUESTO", PRESUPUESTO_DEFAULT)
+        if ruta.lower() in ("off", "0", "no"):
+            _presupuesto = _SinPresupuesto()
+        else:
+            if not fcntl and not msvcrt:
+                print("⚠️ Sin bloqueo de archivos: el presupuesto de la IP no se comparte entre procesos")
+            _presupuesto = PresupuestoIP(ruta)
+    return _presupuesto
+
+
+def main():
+    """Función principal"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ('estado', 'fijar') or (args[0] == 'fijar' and len(args) < 2):
+        print("Uso: python presupuesto_ip.py estado")
+        print("     python presupuesto_ip.py fijar SOLICITUDES_POR_SEGUNDO [RAFAGA]")
+        print("Ejemplo: python presupuesto_ip.py fijar 1.5")
+        print(f"Archivo: {os.environ.get('PJUD_PRESUPUESTO', PRESUPUESTO_DEFAULT)} (variable PJUD_PRESUPUESTO)")
+        sys.exit(1)
+
+    presupuesto = presupuesto_ip()
+    if not isinstance(presupuesto, PresupuestoIP):
+        print("⚠️ Presupuesto desactivado (PJUD_PRESUPUESTO=off)")
+        return
+
+    if args[0] == 'fijar':
+        try:
+            estado = presupuesto.fijar(float(args[1]), int(args[2]) if len(args) > 2 else None)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ Ritmo de la máquina: {estado['por_segundo']:g} solicitudes/s (ráfaga {estado['rafaga']})")
+        return
+
+    estado = presupuesto.estado()
+    print(f"⏱️ Presupuesto de la IP ({presupuesto.ruta})")
+    print(f"   Ritmo: {estado['por_segundo']:g} solicitudes/s | Ráfaga: {estado['rafaga']}")
+    if estado["tokens"] >= 0:
+        print(f"   Disponibles: {estado['tokens']:.1f}")
+    else:
+        print(f"   Turnos reservados en espera: {-estado['tokens']:.0f} "
+              f"({-estado['tokens'] / estado['por_segundo']:.1f}s de cola)")
+    print(f"   Solicitudes atendidas: {estado.get('solicitudes', 0):,}")
+
+
+if __name__ == "__main__":
+    main()
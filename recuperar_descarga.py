@@ -80,18 +80,17 @@ def continuar_descarga_tribunal(tribunal_name):
     print(f"🎯 Total: {tribunal_data.get('total', 0):,}")
     print(f"📦 Batch actual: {tribunal_data.get('batch_actual', 0)}")
     
-    # Ejecutar descarga
-    import subprocess
-    import sys
+    # Ejecutar descarga en este mismo proceso
+    from descarga_universo_completo import DescargadorUniversoCompleto
     
+    descargador = DescargadorUniversoCompleto()
     try:
-        subprocess.run([
-            sys.executable,
-            "descarga_universo_completo.py",
-            "--tribunal", tribunal_name
-        ])
+        with descargador.control.senales():  # Ctrl+C drena: los batches en vuelo terminan y se guardan
+            descargador.descargar_tribunal(tribunal_name)
     except KeyboardInterrupt:
         print(f"\n⏹️ Descarga de {tribunal_name} detenida")
+    finally:
+        descargador.cerrar_procesador()
 
 def continuar_descarga_completa():
     """Continuar descarga completa desde donde se quedó"""
@@ -118,13 +117,12 @@ def continuar_descarga_completa():
     for tribunal in tribunales_pendientes:
         print(f"  - {tribunal}")
     
-    # Continuar con scheduler
-    import subprocess
-    import sys
+    # Continuar con scheduler (en este mismo proceso)
+    from scheduler_5_dias import Scheduler5Dias
     
     try:
-        subprocess.run([sys.executable, "scheduler_5_dias.py"])
-    except KeyboardInterrupt:
+        Scheduler5Dias().ejecutar_scheduler()
+    except (KeyboardInterrupt, SystemExit):
         print("\n⏹️ Descarga detenida por usuario")
 
 def limpiar_archivos_temporales():
@@ -135,8 +133,8 @@ def limpiar_archivos_temporales():
     logs_dir = output_dir / "logs"
     
     if logs_dir.exists():
-        # Mantener solo los últimos 10 logs
-        log_files = list(logs_dir.glob("*.log"))
+        # Mantener solo los últimos 10 logs (texto antiguo, JSON y sus rotaciones)
+        log_files = list(logs_dir.glob("*.log")) + list(logs_dir.glob("*.jsonl*"))
         log_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
         
         for log_file in log_files[10:]:
@@ -145,6 +143,37 @@ def limpiar_archivos_temporales():
     
     print("✅ Limpieza completada")
 
+def reparar_batches_danados():
+    """Validar la integridad de los batches y volver a descargar los dañados"""
+    from integridad_batches import validar_arbol, guardar_reporte
+    
+    output_dir = Path("output/universo_completo")
+    print("\n🛡️ VALIDANDO INTEGRIDAD DE BATCHES")
+    
+    problemas, total = validar_arbol(output_dir)
+    guardar_reporte(output_dir, problemas)
+    print(f"📦 Batches revisados: {total:,}")
+    print(f"❌ Corruptos o faltantes: {len(problemas):,}")
+    
+    if not problemas:
+        print("✅ Todos los batches están íntegros")
+        return
+    
+    for problema in problemas[:20]:
+        print(f"  - {problema['tribunal']}/{problema['archivo']}: {problema['motivo']}")
+    
+    respuesta = input("\n¿Volver a descargar estos batches? (s/N): ").lower()
+    if respuesta not in ['s', 'si', 'sí', 'y', 'yes']:
+        return
+    
+    from descarga_universo_completo import DescargadorUniversoCompleto
+    
+    try:
+        reparados = DescargadorUniversoCompleto().reparar_batches(problemas)
+        print(f"✅ Batches reparados: {reparados} de {len(problemas)}")
+    except KeyboardInterrupt:
+        print("\n⏹️ Reparación detenida por usuario")
+
 def mostrar_opciones_recuperacion():
     """Mostrar opciones de recuperación"""
     print("\n📋 OPCIONES DE RECUPERACIÓN:")
@@ -153,18 +182,19 @@ def mostrar_opciones_recuperacion():
     print("3. 🏛️ Continuar tribunal específico")
     print("4. 📊 Solo monitorear")
     print("5. 🧹 Limpiar archivos temporales")
-    print("6. ❌ Salir")
+    print("6. 🛡️ Validar integridad y reparar batches")
+    print("7. ❌ Salir")
     
     while True:
         try:
-            opcion = input("\nSelecciona una opción (1-6): ").strip()
-            if opcion in ['1', '2', '3', '4', '5', '6']:
+            opcion = input("\nSelecciona una opción (1-7): ").strip()
+            if opcion in ['1', '2', '3', '4', '5', '6', '7']:
                 return opcion
             else:
-                print("❌ Opción inválida. Selecciona 1-6.")
+                print("❌ Opción inválida. Selecciona 1-7.")
         except KeyboardInterrupt:
             print("\n👋 Cancelado por usuario")
-            return '6'
+            return '7'
 
 def main():
     """Función principal"""
@@ -182,12 +212,13 @@ def main():
             tribunal = input("Ingresa el nombre del tribunal: ").strip()
             continuar_descarga_tribunal(tribunal)
         elif opcion == '4':
-            import subprocess
-            import sys
-            subprocess.run([sys.executable, "monitor_descarga_universo.py"])
+            from monitor_descarga_universo import MonitorDescargaUniverso
+            MonitorDescargaUniverso().ejecutar_monitor(30)
         elif opcion == '5':
             limpiar_archivos_temporales()
         elif opcion == '6':
+            reparar_batches_danados()
+        elif opcion == '7':
             print("👋 Hasta luego!")
             break
 
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Registro de eventos de las descargas largas
+Los hilos de descarga solo encolan el registro; un hilo aparte lo escribe
+como JSON por línea (archivo con rotación por tamaño) y como texto en la
+consola. Los eventos rutinarios (un batch descargado) se muestrean: a lo
+sumo uno por intervalo y clave, con la cuenta de los omitidos
+"""
+
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+MAX_BYTES_LOG = 50 * 1024 * 1024    # Tamaño de cada archivo antes de rotar
+RESPALDOS_LOG = 10                  # Archivos rotados que se conservan
+INTERVALO_MUESTREO = 5.0            # Segundos entre eventos rutinarios de una misma clave
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro: fecha, nivel, mensaje y los campos del evento"""
+
+    def format(self, record):
+        datos = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "nivel": record.levelname,
+            "msg": record.getMessage(),
+        }
+        datos.update(getattr(record, "evento", None) or {})
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class FiltroMuestreo(logging.Filter):
+    """Deja pasar a lo sumo un evento rutinario por intervalo y clave
+
+    Solo afecta a los registros con extra={"muestreo": clave}; los demás
+    (avisos, errores, hitos) pasan siempre. El que pasa lleva en su evento
+    cuántos se omitieron desde el anterior.
+    """
+
+    def __init__(self, intervalo=INTERVALO_MUESTREO):
+        super().__init__()
+        self.intervalo = intervalo
+        self.lock = threading.Lock()
+        self.ultimo = {}      # clave -> instante del último que pasó
+        self.omitidos = {}    # clave -> omitidos desde entonces
+
+    def filter(self, record):
+        clave = getattr(record, "muestreo", None)
+        if clave is None:
+            return True
+
+        ahora = time.monotonic()
+        with self.lock:
+            if ahora - self.ultimo.get(clave, float('-inf')) < self.intervalo:
+                self.omitidos[clave] = self.omitidos.get(clave, 0) + 1
+                return False
+            self.ultimo[clave] = ahora
+            omitidos = self.omitidos.pop(clave, 0)
+
+        if omitidos:
+            record.evento = dict(getattr(record, "evento", None) or {}, omitidos=omitidos)
+        return True
+
+
+def configurar_logger(nombre, log_dir, prefijo, intervalo=INTERVALO_MUESTREO,
+                      max_bytes=MAX_BYTES_LOG, respaldos=RESPALDOS_LOG):
+    """Logger con cola: JSON por línea en log_dir/PREFIJO_<fecha>.jsonl y texto en consola
+
+    Es idempotente: si el logger ya está configurado (otra instancia en el
+    mismo proceso) se devuelve tal cual, sin duplicar handlers.
+    """
+    logger = logging.getLogger(nombre)
+    if getattr(logger, "oyente", None):
+        return logger
+
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    archivo = RotatingFileHandler(
+        log_dir / f"{prefijo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl",
+        maxBytes=max_bytes, backupCount=respaldos, encoding='utf-8'
+    )
+    archivo.setFormatter(FormatoJSON())
+
+    consola = logging.StreamHandler()
+    consola.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    cola = queue.SimpleQueue()
+    encolador = QueueHandler(cola)
+    encolador.addFilter(FiltroMuestreo(intervalo))   # Lo omitido no llega a la cola
+
+    logger.setLevel(logging.INFO)
+    logger.addHandler(encolador)
+    logger.propagate = False
+
+    oyente = QueueListener(cola, archivo, consola, respect_handler_level=True)
+    oyente.start()
+    logger.oyente = oyente
+    atexit.register(oyente.stop)   # Vaciar la cola al salir
+    return logger
+
+
+def main():
+    """Función principal: resumir un log JSON (eventos por nivel y estado, latencias)"""
+    if len(sys.argv) < 2:
+        print("Uso: python registro_eventos.py LOG.jsonl")
+        print("Ejemplo: python registro_eventos.py output/universo_completo/logs/descarga_20250301_060000.jsonl")
+        sys.exit(1)
+
+    niveles, estados, latencias = {}, {}, []
+    omitidos = 0
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                evento = json.loads(linea)
+            except ValueError:
+                continue
+            niveles[evento.get("nivel")] = niveles.get(evento.get("nivel"), 0) + 1
+            if "estado" in evento:
+                estados[evento["estado"]] = estados.get(evento["estado"], 0) + 1 + evento.get("omitidos", 0)
+            if "latencia_ms" in evento:
+                latencias.append(evento["latencia_ms"])
+            omitidos += evento.get("omitidos", 0)
+
+    print(f"📜 {sum(niveles.values()):,} eventos en {sys.argv[1]} ({omitidos:,} rutinarios omitidos por muestreo)")
+    for nivel, n in sorted(niveles.items(), key=lambda x: -x[1]):
+        print(f"   {nivel}: {n:,}")
+    for estado, n in sorted(estados.items(), key=lambda x: -x[1]):
+        print(f"   estado {estado}: {n:,}")
+    if latencias:
+        latencias.sort()
+        print(f"   latencia muestreada: mediana {latencias[len(latencias) // 2]:,.0f} ms, "
+              f"p95 {latencias[int(len(latencias) * 0.95)]:,.0f} ms, máx {latencias[-1]:,.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
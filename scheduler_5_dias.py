@@ -7,36 +7,66 @@ Con pausas inteligentes y recuperación automática
 import os
 import sys
 import time
-import subprocess
-import signal
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from config_descarga import ConfigDescarga
+from control_descarga import ControlDescarga, iniciar_servidor, PUERTO_CONTROL, PLAZO_DRENADO, puerto_de_argumentos
+
 class Scheduler5Dias:
-    def __init__(self, output_dir="output/universo_completo"):
+    def __init__(self, output_dir="output/universo_completo", config=None, control=None,
+                 puerto_control=PUERTO_CONTROL):
         self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
         self.estado_file = self.output_dir / "scheduler_estado.json"
         self.log_file = self.output_dir / "scheduler.log"
         
-        # Configuración de horarios (UTC-3)
-        self.horario_inicio = 6  # 6:00 AM
-        self.horario_fin = 22    # 10:00 PM
-        self.pausa_nocturna = False  # Sin pausas nocturnas
-        
-        # Configuración de pausas
-        self.pausa_entre_tribunales = 60   # 1 minuto entre tribunales
-        self.pausa_por_error = 300         # 5 minutos por error
-        self.pausa_ciclo = 300             # 5 minutos entre ciclos
+        # Horarios, pausas, duración y orden de tribunales desde config_descarga_5_dias.json
+        self.config = config or ConfigDescarga()
+        self.fecha_inicio = datetime.now()
+        self.aplicar_config(self.config)
+        self.config.al_cambiar(self.aplicar_config)
         
         # Estado
         self.ejecutando = False
-        self.fecha_inicio = datetime.now()
-        self.fecha_fin = self.fecha_inicio + timedelta(days=5)
+        self.descargador = None  # DescargadorUniversoCompleto, se crea al primer tribunal
+        self.tribunal_actual = None
         
-        # Configurar manejo de señales
-        signal.signal(signal.SIGINT, self.manejar_interrupcion)
-        signal.signal(signal.SIGTERM, self.manejar_interrupcion)
+        # Canal de control (pausa, drenado, concurrencia, prioridad), compartido con el descargador
+        self.control = control or ControlDescarga()
+        self.puerto_control = puerto_control
+        self.control.agregar_tribunales(self.tribunales)
+        self.control.agregar_fuente(lambda: {"scheduler": {
+            "tribunal_actual": self.tribunal_actual,
+            "orden": self.tribunales,
+            "fin_estimado": self.fecha_fin.isoformat(),
+        }})
+    
+    def aplicar_config(self, config):
+        """Tomar horarios y pausas de la configuración (también en caliente)"""
+        horarios = config.seccion("horarios")
+        self.horario_inicio = horarios["inicio_diario"]   # UTC-3
+        self.horario_fin = horarios["fin_diario"]
+        self.pausa_nocturna = horarios["pausa_nocturna"]
+        self.pausa_entre_tribunales = horarios["pausa_entre_tribunales"]
+        self.pausa_por_error = horarios["pausa_por_error"]
+        self.pausa_ciclo = horarios["pausa_ciclo"]
+        self.fecha_fin = self.fecha_inicio + timedelta(days=config.seccion("descarga")["duracion_dias"])
+        
+        # Orden de tribunales por prioridad (a igual prioridad, el orden del archivo)
+        tribunales = config.seccion("tribunales")
+        self.tribunales = sorted(tribunales, key=lambda nombre: tribunales[nombre]["prioridad"])
+    
+    def detenido(self):
+        """¿Hay que dejar de lanzar trabajo? (fin del scheduler o drenado pedido)"""
+        return not self.ejecutando or self.control.drenando
+    
+    def dormir(self, segundos):
+        """Pausa interrumpible por el canal de control"""
+        limite = time.monotonic() + segundos
+        while not self.detenido() and time.monotonic() < limite:
+            time.sleep(min(1.0, limite - time.monotonic()))
     
     def log(self, mensaje):
         """Escribir log con timestamp"""
@@ -97,11 +127,11 @@ class Scheduler5Dias:
         
         # Pausar en bloques de 1 hora para poder interrumpir
         while tiempo_restante.total_seconds() > 0:
-            if not self.ejecutando:
+            if self.detenido():
                 break
             
             pausa_segundos = min(3600, tiempo_restante.total_seconds())  # 1 hora máximo
-            time.sleep(pausa_segundos)
+            self.dormir(pausa_segundos)
             tiempo_restante -= timedelta(seconds=pausa_segundos)
             
             if tiempo_restante.total_seconds() > 0:
@@ -114,30 +144,23 @@ class Scheduler5Dias:
         self.log(f"🏛️ Iniciando descarga de {tribunal_name}")
         
         try:
-            # Ejecutar script de descarga con timeout
-            cmd = [
-                sys.executable, 
-                "descarga_universo_completo.py",
-                "--tribunal", tribunal_name
-            ]
+            # En el mismo proceso: una sola sesión HTTP y un solo estado para todos los tribunales
+            if self.descargador is None:
+                from descarga_universo_completo import DescargadorUniversoCompleto
+                self.descargador = DescargadorUniversoCompleto(self.output_dir, config=self.config,
+                                                               control=self.control)
             
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                timeout=7200  # 2 horas máximo por tribunal
-            )
+            self.descargador.descargar_tribunal(tribunal_name)
             
-            if result.returncode == 0:
+            if self.descargador.tribunal_completado(tribunal_name):
                 self.log(f"✅ {tribunal_name} completado exitosamente")
                 return True
+            elif self.control.drenando:
+                self.log(f"⏹️ {tribunal_name} drenado - se retoma desde su último batch sin terminar")
             else:
-                self.log(f"❌ Error en {tribunal_name}: {result.stderr}")
+                self.log(f"❌ {tribunal_name} no quedó completo")
                 return False
                 
-        except subprocess.TimeoutExpired:
-            self.log(f"⏰ Timeout en {tribunal_name} - continuando con siguiente")
-            return False
         except Exception as e:
             self.log(f"❌ Error ejecutando {tribunal_name}: {e}")
             return False
@@ -146,39 +169,41 @@ class Scheduler5Dias:
         """Ejecutar un ciclo completo de descarga"""
         self.log("🚀 Iniciando ciclo de descarga")
         
-        # Orden de tribunales por prioridad
-        tribunales = [
-            "Corte_de_Apelaciones",  # Más grande
-            "Civiles",
-            "Penales", 
-            "Familia",
-            "Laborales",
-            "Corte_Suprema",
-            "Cobranza"  # Más pequeño
-        ]
-        
         estado = self.cargar_estado()
         tribunales_completados = set(estado.get("tribunales_completados", []))
         
-        for tribunal in tribunales:
-            if not self.ejecutando:
-                break
-            
+        # Orden de tribunales por prioridad (se fija al inicio de cada ciclo)
+        for tribunal in self.tribunales:
             if tribunal in tribunales_completados:
                 self.log(f"⏭️ {tribunal} ya completado - saltando")
+        pendientes = [t for t in self.tribunales if t not in tribunales_completados]
+        
+        while pendientes and not self.detenido():
+            # En pausa no se empieza un tribunal nuevo
+            if self.control.pausado:
+                self.control.esperar_reanudacion(1.0)
                 continue
             
+            # Un tribunal priorizado desde el canal de control pasa adelante
+            tribunal = self.control.prioritario if self.control.prioritario in pendientes else pendientes[0]
+            pendientes.remove(tribunal)
+            
             # Verificar horario antes de cada tribunal
             if not self.es_horario_valido():
                 self.log("🌙 Fuera de horario - iniciando pausa nocturna")
-                self.pausa_nocturna()
+                self.ejecutar_pausa_nocturna()
                 continue
             
             # Ejecutar descarga
             estado["tribunales_en_progreso"] = [tribunal]
             self.guardar_estado(estado)
             
+            self.tribunal_actual = tribunal
             exito = self.ejecutar_descarga_tribunal(tribunal)
+            self.tribunal_actual = None
+            
+            if self.control.drenando and not exito:
+                break  # Drenado a mitad del tribunal: no es un error, se retoma desde su batch_actual
             
             if exito:
                 tribunales_completados.add(tribunal)
@@ -192,16 +217,18 @@ class Scheduler5Dias:
                 self.guardar_estado(estado)
                 
                 self.log(f"❌ Error en {tribunal} - pausa de {self.pausa_por_error}s")
-                time.sleep(self.pausa_por_error)
+                self.dormir(self.pausa_por_error)
             
             # Pausa entre tribunales
-            if tribunal != tribunales[-1]:  # No pausar después del último
+            if pendientes:  # No pausar después del último
                 self.log(f"⏸️ Pausa entre tribunales: {self.pausa_entre_tribunales}s")
-                time.sleep(self.pausa_entre_tribunales)
+                self.dormir(self.pausa_entre_tribunales)
     
     def ejecutar_scheduler(self):
         """Ejecutar scheduler principal"""
         self.ejecutando = True
+        self.config.vigilar()  # Cambios en config_descarga_5_dias.json se aplican en caliente
+        servidor_control = iniciar_servidor(self.control, self.puerto_control)
         self.log("🚀 INICIANDO SCHEDULER DE 5 DÍAS")
         self.log(f"📅 Fecha inicio: {self.fecha_inicio}")
         self.log(f"📅 Fecha fin: {self.fecha_fin}")
@@ -212,46 +239,70 @@ class Scheduler5Dias:
         self.guardar_estado(estado)
         
         try:
-            while self.ejecutando and datetime.now() < self.fecha_fin:
-                # Ejecutar descarga continua (sin pausas nocturnas)
-                self.log("🚀 Ejecutando descarga continua")
-                self.ejecutar_ciclo_descarga()
-                
-                # Verificar si todos los tribunales están completos
-                estado = self.cargar_estado()
-                if len(estado.get("tribunales_completados", [])) >= 7:
-                    self.log("🎉 ¡TODOS LOS TRIBUNALES COMPLETADOS!")
-                    break
-                
-                # Pausa corta antes del siguiente ciclo
-                if self.ejecutando:
-                    self.log(f"⏸️ Pausa de {self.pausa_ciclo}s antes del siguiente ciclo")
-                    time.sleep(self.pausa_ciclo)
+            with self.control.senales(self.manejar_interrupcion):
+                self.ejecutar_hasta_fin()
             
             if datetime.now() >= self.fecha_fin:
                 self.log("⏰ Tiempo de 5 días completado")
             
-            estado["estado"] = "completado"
+            estado = self.cargar_estado()
+            if self.control.drenando:
+                estado["estado"] = "interrumpido"
+                self.log("💾 Scheduler drenado - estado guardado, puedes continuar más tarde")
+            else:
+                estado["estado"] = "completado"
             self.guardar_estado(estado)
             
+        except KeyboardInterrupt:
+            # Segunda interrupción: el descargador ya guardó su avance
+            estado = self.cargar_estado()
+            estado["estado"] = "interrumpido"
+            self.guardar_estado(estado)
+            self.log("💾 Estado guardado - puedes continuar más tarde")
         except Exception as e:
             self.log(f"❌ Error en scheduler: {e}")
             estado["estado"] = "error"
             self.guardar_estado(estado)
+        finally:
+            self.ejecutando = False
+            if self.descargador:
+                self.descargador.cerrar_procesador()
+            if servidor_control:
+                servidor_control.shutdown()
+                servidor_control.server_close()
         
         self.log("🏁 Scheduler finalizado")
     
+    def ejecutar_hasta_fin(self):
+        """Ciclos de descarga hasta completar todo, llegar a fecha_fin o drenar"""
+        while not self.detenido() and datetime.now() < self.fecha_fin:
+            # Ejecutar descarga continua (sin pausas nocturnas)
+            self.log("🚀 Ejecutando descarga continua")
+            self.ejecutar_ciclo_descarga()
+            
+            # Verificar si todos los tribunales están completos
+            estado = self.cargar_estado()
+            if set(self.tribunales) <= set(estado.get("tribunales_completados", [])):
+                self.log("🎉 ¡TODOS LOS TRIBUNALES COMPLETADOS!")
+                break
+            
+            # Pausa corta antes del siguiente ciclo
+            if not self.detenido():
+                self.log(f"⏸️ Pausa de {self.pausa_ciclo}s antes del siguiente ciclo")
+                self.dormir(self.pausa_ciclo)
+    
     def manejar_interrupcion(self, signum, frame):
-        """Manejar interrupciones (Ctrl+C)"""
-        self.log("⏹️ Interrupción recibida - deteniendo scheduler...")
-        self.ejecutando = False
-        
-        estado = self.cargar_estado()
-        estado["estado"] = "interrumpido"
-        self.guardar_estado(estado)
-        
-        self.log("💾 Estado guardado - puedes continuar más tarde")
-        sys.exit(0)
+        """Manejar interrupciones (Ctrl+C, SIGTERM) drenando en vez de salir
+
+        La primera señal deja de lanzar batches y espera a los que están en
+        vuelo (hasta PLAZO_DRENADO segundos); el estado se guarda al terminar.
+        Una segunda señal corta sin esperar.
+        """
+        if self.control.drenando:
+            self.log("⏹️ Segunda interrupción - deteniendo sin esperar los batches en vuelo...")
+        else:
+            self.log(f"⏹️ Interrupción recibida - terminando batches en vuelo (máx. {PLAZO_DRENADO}s)...")
+        self.control.senal(signum, frame)
 
 def main():
     """Función principal"""
@@ -269,7 +320,7 @@ def main():
         return
     
     # Crear y ejecutar scheduler
-    scheduler = Scheduler5Dias()
+    scheduler = Scheduler5Dias(puerto_control=puerto_de_argumentos())
     scheduler.ejecutar_scheduler()
 
 if __name__ == "__main__":
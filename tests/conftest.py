@@ -0,0 +1,35 @@
+"""Los módulos del proyecto son scripts en la raíz del repositorio"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class Reloj:
+    """Reloj falso: time.time() devuelve `ahora` y time.sleep() lo adelanta"""
+
+    def __init__(self, ahora=1_700_000_000.0):
+        self.ahora = ahora
+        self.dormido = []
+
+    def time(self):
+        return self.ahora
+
+    def sleep(self, segundos):
+        self.dormido.append(segundos)
+        self.ahora += segundos
+
+    def avanzar(self, segundos):
+        self.ahora += segundos
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(time, "time", reloj.time)
+    monkeypatch.setattr(time, "sleep", reloj.sleep)
+    return reloj
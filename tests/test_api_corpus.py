@@ -0,0 +1,119 @@
+"""Pruebas del catálogo y la API local del corpus (api_corpus.py)"""
+
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from api_corpus import CatalogoCorpus, CatalogoDesactualizado, ManejadorAPI
+
+
+def sentencia(id_sentencia, dia, **campos):
+    return {"id": id_sentencia, "fec_sentencia_sup_dt": f"2024-01-{dia:02d}T00:00:00Z",
+            "rol_era_sup_s": f"{id_sentencia}-2024", "gls_materia_s": "Recurso de protección", **campos}
+
+
+def escribir_batch(directorio, tribunal, nombre, sentencias):
+    ruta = directorio / tribunal / nombre
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(json.dumps(sentencias, ensure_ascii=False, indent=2), encoding='utf-8')
+    return ruta
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    batches = tmp_path / "batches"
+    escribir_batch(batches, "Corte_Suprema", "batch_000000.json", [sentencia("1", 2), sentencia("2", 3)])
+    escribir_batch(batches, "Corte_Suprema", "batch_000001.json", [sentencia("3", 4), sentencia("4", 5)])
+    catalogo = CatalogoCorpus(tmp_path / "catalogo.sqlite")
+    catalogo.actualizar(batches)
+    return batches, catalogo
+
+
+@pytest.fixture
+def api(corpus):
+    """Servidor en un puerto libre; devuelve get(ruta) -> (estado, cuerpo)"""
+    batches, catalogo = corpus
+
+    class Manejador(ManejadorAPI):
+        pass
+    Manejador.catalogo = catalogo
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+    servidor.daemon_threads = True
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+
+    def get(ruta):
+        conexion = http.client.HTTPConnection("127.0.0.1", servidor.server_address[1], timeout=10)
+        conexion.request("GET", ruta)
+        respuesta = conexion.getresponse()
+        cuerpo = respuesta.read().decode('utf-8')
+        conexion.close()
+        return respuesta.status, cuerpo
+
+    yield batches, get
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_consultas(api):
+    _, get = api
+    estado, cuerpo = get("/sentencias/2")
+    assert estado == 200 and json.loads(cuerpo)["id"] == "2"
+    assert get("/sentencias/99")[0] == 404
+    assert [s["id"] for s in json.loads(get("/rol/3-2024")[1])] == ["3"]
+
+    estado, cuerpo = get("/sentencias?tribunal=Corte_Suprema&desde=2024-01-03&limite=2")
+    assert estado == 200
+    assert [json.loads(linea)["id"] for linea in cuerpo.splitlines()] == ["2", "3"]
+    assert get("/sentencias?limite=muchas")[0] == 400
+
+
+def test_batch_borrado_responde_500(api):
+    batches, get = api
+    (batches / "Corte_Suprema" / "batch_000000.json").unlink()
+    estado, cuerpo = get("/sentencias/1")
+    assert estado == 500
+    assert "error" in json.loads(cuerpo)
+    assert get("/sentencias?tribunal=Corte_Suprema")[0] == 500
+
+
+def test_batch_reescrito_responde_500(api):
+    batches, get = api
+    # Mismo archivo con otro contenido: los rangos catalogados quedan desfasados
+    escribir_batch(batches, "Corte_Suprema", "batch_000000.json", [sentencia("2", 3, extra="x" * 50)])
+    for ruta in ("/sentencias/1", "/sentencias/2", "/rol/2-2024"):
+        estado, cuerpo = get(ruta)
+        assert estado == 500, ruta
+        assert "error" in json.loads(cuerpo)
+
+
+def test_error_a_mitad_del_listado(api):
+    batches, get = api
+    (batches / "Corte_Suprema" / "batch_000001.json").unlink()
+    estado, cuerpo = get("/sentencias?tribunal=Corte_Suprema")
+    assert estado == 200
+    lineas = [json.loads(linea) for linea in cuerpo.splitlines()]
+    assert [s["id"] for s in lineas[:2]] == ["1", "2"]
+    assert "error" in lineas[-1]
+
+
+def test_actualizar_quita_batches_borrados(corpus):
+    batches, catalogo = corpus
+    (batches / "Corte_Suprema" / "batch_000001.json").unlink()
+    catalogo.actualizar(batches)
+    assert catalogo.estadisticas()["sentencias"] == 2
+    assert catalogo.estadisticas()["batches"] == 1
+    assert catalogo.por_id("3") is None
+    assert [s["id"] for s in catalogo.listar(materia="recurso de protección")] == ["1", "2"]
+
+
+def test_lectura_desactualizada(corpus):
+    batches, catalogo = corpus
+    escribir_batch(batches, "Corte_Suprema", "batch_000001.json", [sentencia("4", 5), sentencia("3", 4)])
+    with pytest.raises(CatalogoDesactualizado):
+        catalogo.por_id("3")
+    catalogo.actualizar(batches)
+    assert catalogo.por_id("3")["id"] == "3"
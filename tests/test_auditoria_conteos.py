@@ -0,0 +1,66 @@
+"""Pruebas de la auditoría de conteos y la redescarga (auditoria_conteos.py)"""
+
+import json
+from datetime import date
+
+import auditoria_conteos
+from auditoria_conteos import AuditorConteos, ventanas_mensuales
+from corpus_local import listar_batches, leer_batch
+
+
+class DescargadorFalso:
+    """Sin red: páginas fijas por tribunal"""
+
+    paginas = {}
+
+    def __init__(self):
+        self.tribunales = {"Corte_Suprema": {"id": "528", "descripcion": "Corte Suprema"},
+                           "Laborales": {"id": "271", "descripcion": "Tribunales Laborales"}}
+
+    def iterar_paginas(self, fecha_desde, fecha_hasta, token=None):
+        for tribunal in self.tribunales:
+            for docs in self.paginas.get(tribunal, []):
+                yield tribunal, docs, sum(len(p) for p in self.paginas[tribunal])
+
+
+def sentencia(id_sentencia, dia):
+    return {"id": id_sentencia, "fec_sentencia_sup_dt": f"2024-01-{dia:02d}T00:00:00Z"}
+
+
+def test_ventanas_mensuales():
+    assert ventanas_mensuales(date(2024, 1, 20), date(2024, 3, 5)) == [
+        (date(2024, 1, 20), date(2024, 1, 31)),
+        (date(2024, 2, 1), date(2024, 2, 29)),
+        (date(2024, 3, 1), date(2024, 3, 5)),
+    ]
+
+
+def test_redescarga_reemplaza_el_archivo_del_dia(tmp_path, monkeypatch):
+    corpus = tmp_path / "corpus"
+    (corpus / "Corte_Suprema").mkdir(parents=True)
+    dia = corpus / "Corte_Suprema" / "sentencias_20240102.json"
+    dia.write_text(json.dumps([sentencia("1", 2), sentencia("2", 2)]), encoding='utf-8')
+    otro_dia = corpus / "Corte_Suprema" / "sentencias_20240103.json"
+    otro_dia.write_text(json.dumps([sentencia("9", 3)]), encoding='utf-8')
+    # Restos de una versión anterior de la redescarga
+    (corpus / "Corte_Suprema" / "batch_redescarga_2024-01-02_2024-01-02_001.json").write_text(
+        json.dumps({"sentencias": [sentencia("1", 2)]}), encoding='utf-8')
+
+    DescargadorFalso.paginas = {"Corte_Suprema": [[sentencia("1", 2), sentencia("2", 2)], [sentencia("3", 2)]]}
+    monkeypatch.setattr(auditoria_conteos, "DescargadorSentencias", DescargadorFalso)
+
+    auditor = AuditorConteos(corpus, tmp_path / "auditoria")
+    auditor.encolar([{"tribunal": "Corte_Suprema", "desde": "2024-01-02", "hasta": "2024-01-02",
+                      "remoto": 3, "local": 2}])
+    auditor.redescargar()
+
+    assert auditor.cargar_cola() == []
+    assert [s["id"] for s in leer_batch(dia)] == ["1", "2", "3"]
+    assert [s["id"] for s in leer_batch(otro_dia)] == ["9"]
+    # Cada sentencia queda una sola vez en el corpus
+    ids = [s["id"] for ruta in listar_batches(corpus) for s in leer_batch(ruta)]
+    assert sorted(ids) == ["1", "2", "3", "9"]
+    assert (tmp_path / "auditoria" / "redescarga_Corte_Suprema_2024-01-02_2024-01-02.json").exists()
+
+    auditor.catalogo.actualizar(corpus)
+    assert auditor.catalogo.contar("Corte_Suprema", "2024-01-02", "2024-01-02") == 3
@@ -0,0 +1,59 @@
+"""Pruebas del envío de lotes a Supabase (cargar_a_supabase.py) con un cliente falso"""
+
+from cargar_a_supabase import cargar_lote
+from manifiesto_ingesta import ManifiestoIngesta
+
+
+class ClienteFalso:
+    """Registra las operaciones como las arma supabase-py: table().insert/update().eq().execute()"""
+
+    def __init__(self):
+        self.operaciones = []
+
+    def table(self, tabla):
+        cliente = self
+
+        class Consulta:
+            def insert(self, filas):
+                self.operacion = ["insert", tabla, filas]
+                return self
+
+            def update(self, fila):
+                self.operacion = ["update", tabla, fila]
+                return self
+
+            def upsert(self, *args, **kwargs):
+                raise AssertionError("upsert necesita un índice único que la tabla no tiene")
+
+            def eq(self, columna, valor):
+                self.operacion.append((columna, valor))
+                return self
+
+            def execute(self):
+                cliente.operaciones.append(self.operacion)
+                return self
+
+        return Consulta()
+
+
+def fila(numero, texto="a"):
+    return {"url_acceso": f"https://juris.pjud.cl/sentencia/{numero}", "texto_completo": texto}
+
+
+def test_sin_manifiesto_inserta_todo():
+    cliente = ClienteFalso()
+    cargar_lote(cliente, [fila(1), fila(2)])
+    assert cliente.operaciones == [["insert", "sentencias", [fila(1), fila(2)]]]
+
+
+def test_filas_modificadas_se_actualizan_por_url_acceso(tmp_path):
+    manifiesto = ManifiestoIngesta(tmp_path / "manifiesto.json")
+    manifiesto.registrar_filas([fila(1), {"texto_completo": "sin url"}])
+
+    cliente = ClienteFalso()
+    sin_url = {"texto_completo": "sin url"}
+    cargar_lote(cliente, [fila(1, "corregido"), fila(2), sin_url], manifiesto)
+    assert cliente.operaciones == [
+        ["insert", "sentencias", [fila(2), sin_url]],
+        ["update", "sentencias", fila(1, "corregido"), ("url_acceso", fila(1)["url_acceso"])],
+    ]
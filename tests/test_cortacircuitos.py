@@ -0,0 +1,153 @@
+"""Pruebas de las transiciones del cortacircuitos (cortacircuitos.py)"""
+
+import pytest
+
+from cortacircuitos import (
+    EXITOS_POR_ETAPA, PLAZO_SONDA, RAMPA, SONDEOS, UMBRAL_BLOQUEO,
+    BloqueoDetectado, CircuitoAbierto, Cortacircuitos, es_reinicio,
+)
+
+
+class Respuesta:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+@pytest.fixture
+def circuito(tmp_path, reloj):
+    return Cortacircuitos(tmp_path / "cortacircuitos.json")
+
+
+def bloquear(circuito, veces=UMBRAL_BLOQUEO):
+    for _ in range(veces):
+        with pytest.raises(BloqueoDetectado):
+            circuito.solicitar(lambda: Respuesta(419))
+
+
+def test_abre_tras_umbral_de_bloqueos_seguidos(circuito):
+    bloquear(circuito, UMBRAL_BLOQUEO - 1)
+    assert circuito.consultar()["estado"] == "cerrado"
+
+    # Una respuesta buena reinicia la cuenta
+    circuito.solicitar(lambda: Respuesta(200))
+    assert circuito.consultar()["fallos_seguidos"] == 0
+
+    bloquear(circuito)
+    estado = circuito.consultar()
+    assert estado["estado"] == "abierto"
+    assert estado["intento"] == 0
+    assert not circuito.permite_envio()
+
+
+def test_errores_que_no_son_bloqueo_no_abren(circuito):
+    for _ in range(UMBRAL_BLOQUEO * 2):
+        circuito.solicitar(lambda: Respuesta(503))
+        with pytest.raises(TimeoutError):
+            circuito.solicitar(lambda: (_ for _ in ()).throw(TimeoutError("lento")))
+    assert circuito.consultar()["estado"] == "cerrado"
+
+
+def test_conexion_reiniciada_cuenta_como_bloqueo(circuito):
+    def reiniciada():
+        raise ConnectionResetError("Connection reset by peer")
+
+    for _ in range(UMBRAL_BLOQUEO):
+        with pytest.raises(BloqueoDetectado):
+            circuito.solicitar(reiniciada)
+    assert circuito.consultar()["estado"] == "abierto"
+
+
+def test_abierto_no_envia_hasta_la_sonda(circuito, reloj):
+    bloquear(circuito)
+    enviadas = []
+    with pytest.raises(CircuitoAbierto) as error:
+        circuito.solicitar(lambda: enviadas.append(1) or Respuesta(200))
+    assert not enviadas
+    assert error.value.hasta == reloj.ahora + SONDEOS[0]
+
+    reloj.avanzar(SONDEOS[0])
+    assert circuito.permite_envio()
+
+
+def test_sonda_exitosa_recupera_por_etapas_hasta_cerrar(circuito, reloj):
+    bloquear(circuito)
+    reloj.avanzar(SONDEOS[0])
+
+    circuito.antes()
+    assert circuito.consultar()["estado"] == "sondeando"
+    # Con la sonda en vuelo nadie más envía
+    with pytest.raises(CircuitoAbierto):
+        Cortacircuitos(circuito.ruta).antes()
+    circuito.exito()
+    estado = circuito.consultar()
+    assert (estado["estado"], estado["etapa"]) == ("recuperando", 0)
+    assert not circuito.normal()
+
+    for etapa, intervalo in enumerate(RAMPA):
+        assert circuito.consultar()["etapa"] == etapa
+        reloj.dormido.clear()
+        for _ in range(EXITOS_POR_ETAPA):
+            circuito.solicitar(lambda: Respuesta(200))
+        # Espaciado según la etapa (el primer turno quedó reservado en la etapa anterior)
+        assert reloj.dormido[1:] == [intervalo] * (EXITOS_POR_ETAPA - 1)
+
+    estado = circuito.consultar()
+    assert estado["estado"] == "cerrado"
+    assert estado["ultimo_bloqueo"]
+    assert circuito.normal()
+
+
+def test_sonda_fallida_reabre_con_intervalo_creciente(circuito, reloj):
+    bloquear(circuito)
+    for intento in range(1, len(SONDEOS) + 2):
+        reloj.avanzar(circuito.consultar()["proxima_sonda"] - reloj.ahora)
+        with pytest.raises(TimeoutError):
+            circuito.solicitar(lambda: (_ for _ in ()).throw(TimeoutError("sin respuesta")))
+        estado = circuito.consultar()
+        assert estado["estado"] == "abierto"
+        assert estado["proxima_sonda"] == reloj.ahora + SONDEOS[min(intento, len(SONDEOS) - 1)]
+
+
+def test_sonda_colgada_libera_el_circuito(circuito, reloj):
+    bloquear(circuito)
+    reloj.avanzar(SONDEOS[0])
+    circuito.antes()   # La sonda nunca informa
+
+    otro = Cortacircuitos(circuito.ruta)
+    assert not otro.permite_envio()
+    reloj.avanzar(PLAZO_SONDA)
+    assert otro.permite_envio()
+    otro.antes()
+    assert otro.consultar()["estado"] == "sondeando"
+
+
+def test_bloqueo_en_recuperacion_reabre(circuito, reloj):
+    bloquear(circuito)
+    reloj.avanzar(SONDEOS[0])
+    circuito.solicitar(lambda: Respuesta(200))
+    assert circuito.consultar()["estado"] == "recuperando"
+
+    bloquear(circuito, 1)
+    estado = circuito.consultar()
+    assert estado["estado"] == "abierto"
+    assert estado["proxima_sonda"] == reloj.ahora + SONDEOS[1]
+
+
+def test_reiniciar_cierra(circuito):
+    bloquear(circuito)
+    circuito.reiniciar()
+    assert circuito.consultar()["estado"] == "cerrado"
+    circuito.solicitar(lambda: Respuesta(200))
+
+
+def test_es_reinicio():
+    try:
+        try:
+            raise ConnectionResetError(104, "Connection reset by peer")
+        except ConnectionResetError as e:
+            raise OSError("error de red") from e
+    except OSError as e:
+        envuelto = e
+    assert es_reinicio(envuelto)
+    assert es_reinicio(Exception("('Connection aborted.', RemoteDisconnected(...))"))
+    assert not es_reinicio(TimeoutError("Read timed out"))
@@ -0,0 +1,96 @@
+"""Pruebas de la codificación delta de textos derivados (delta_textos.py)"""
+
+import json
+
+from corpus_local import leer_batch
+from delta_textos import (
+    MIN_DIFF, aplicar_delta, codificar_delta, comprimir_sentencia, convertir_directorio, expandir_sentencia,
+)
+from integridad_batches import escribir_batch, validar_arbol
+
+BASE = "".join(f"Considerando {i}: que el recurrente Juan Pérez alega la infracción del artículo {i}.<br/>"
+               for i in range(200))
+
+
+def anonimizar(texto):
+    return texto.replace("Juan Pérez", "XXXXX")
+
+
+def test_ida_y_vuelta_textos_casi_iguales():
+    derivado = anonimizar(BASE)
+    ops = codificar_delta(BASE, derivado)
+    assert aplicar_delta(BASE, ops) == derivado
+    assert len(json.dumps(ops, ensure_ascii=False)) < len(derivado)
+
+
+def test_ida_y_vuelta_casos_limite():
+    casos = [
+        ("", ""),
+        ("", "texto nuevo"),
+        ("texto viejo", ""),
+        (BASE, BASE),
+        (BASE, BASE[:500]),              # vista previa: prefijo del texto
+        (BASE, "Encabezado\n" + BASE),   # solo cambia el comienzo
+        (BASE, BASE + "Firmado.\n"),     # solo cambia el final
+        ("abc" * 10, "abd" * 10),        # diferencia central corta
+        (BASE, BASE[:1000] + "x" * (MIN_DIFF * 3) + BASE[2000:]),
+        ("ñandú — «cita»", "ñandú – «cita» ✓"),
+    ]
+    for base, derivado in casos:
+        assert aplicar_delta(base, codificar_delta(base, derivado)) == derivado
+
+
+def test_comprimir_y_expandir_sentencia():
+    anon = anonimizar(BASE)
+    sentencia = {
+        "id": "1",
+        "texto_sentencia": BASE,
+        "texto_sentencia_anon": anon,
+        "texto_sentencia_preview": BASE[:300],
+        "texto_sentencia_anon_preview": anon[:300],
+    }
+    comprimida = comprimir_sentencia(sentencia)
+    assert comprimida["texto_sentencia_anon"]["delta_de"] == "texto_sentencia"
+    assert comprimida["texto_sentencia"] == BASE
+    assert sentencia["texto_sentencia_anon"] == anon  # el original no se modifica
+
+    # Pasar por JSON como en los batch_*.json
+    expandida = expandir_sentencia(json.loads(json.dumps(comprimida, ensure_ascii=False)))
+    assert expandida == sentencia
+
+
+def test_comprimir_sin_base_o_sin_ganancia():
+    sin_base = {"texto_sentencia": None, "texto_sentencia_anon": "texto"}
+    assert comprimir_sentencia(sin_base) == sin_base
+
+    # Un derivado que no se parece a la base se guarda completo
+    distinta = {"texto_sentencia": BASE, "texto_sentencia_anon": "otra cosa"}
+    assert comprimir_sentencia(distinta) == distinta
+
+
+def test_expandir_sin_deltas_no_cambia_nada():
+    sentencia = {"texto_sentencia": "a", "texto_sentencia_anon": "b"}
+    assert expandir_sentencia(sentencia) is sentencia
+    assert sentencia == {"texto_sentencia": "a", "texto_sentencia_anon": "b"}
+
+
+def test_convertir_directorio_mantiene_el_manifiesto(tmp_path):
+    anon = anonimizar(BASE)
+    sentencias = [{"id": str(i), "texto_sentencia": BASE, "texto_sentencia_anon": anon} for i in range(3)]
+    tribunal = tmp_path / "Corte_Suprema"
+    tribunal.mkdir()
+    escribir_batch(tribunal / "batch_000000.json", sentencias, len(sentencias))
+    escribir_batch(tribunal / "batch_000001.json", sentencias, len(sentencias))
+    # Descarga por día: sin manifiesto
+    (tribunal / "sentencias_20240102.json").write_text(json.dumps(sentencias), encoding='utf-8')
+
+    antes, despues = convertir_directorio(tmp_path)
+    assert despues < antes
+    assert validar_arbol(tmp_path, workers=1)[0] == []
+    comprimido = json.loads((tribunal / "batch_000000.json").read_text(encoding='utf-8'))
+    assert isinstance(comprimido[0]["texto_sentencia_anon"], dict)
+
+    convertir_directorio(tmp_path, expandir=True)
+    assert validar_arbol(tmp_path, workers=1)[0] == []
+    for nombre in ("batch_000000.json", "sentencias_20240102.json"):
+        assert leer_batch(tribunal / nombre) == sentencias
@@ -0,0 +1,157 @@
+"""Pruebas de la contabilidad de batches de descargar_tribunal (descarga_universo_completo.py)"""
+
+import json
+import logging
+import threading
+import time
+
+import pytest
+
+from control_descarga import ControlDescarga
+from cortacircuitos import CircuitoAbierto, _SinCortacircuitos
+from descarga_universo_completo import MAX_REINTENTOS_BATCH, DescargadorUniversoCompleto
+from facetas_corpus import AgregadorFacetas
+
+BATCH_SIZE = 10
+
+
+class RedFalsa:
+    """Reemplaza descargar_batch_sentencias: registra los pedidos y falla a pedido
+
+    fallos: batch -> lista de excepciones a lanzar en sus primeros pedidos
+    (None en la lista: ese pedido responde bien).
+    """
+
+    def __init__(self, fallos=None, demoras=None, al_pedir=None):
+        self.fallos = {batch: list(errores) for batch, errores in (fallos or {}).items()}
+        self.demoras = demoras or {}
+        self.al_pedir = al_pedir
+        self.pedidos = []
+        self.lock = threading.Lock()
+
+    def __call__(self, tribunal_name, offset, limit, batch_num, en_cola=False):
+        assert offset == batch_num * BATCH_SIZE
+        with self.lock:
+            self.pedidos.append(batch_num)
+            errores = self.fallos.get(batch_num)
+            error = errores.pop(0) if errores else None
+        if self.al_pedir:
+            self.al_pedir(batch_num)
+        time.sleep(self.demoras.get(batch_num, 0))
+        if error:
+            raise error
+        return limit
+
+
+def nuevo_descargador(directorio, total, estado=None):
+    """Descargador sin red ni pool de procesos, con el estado en directorio"""
+    descargador = DescargadorUniversoCompleto.__new__(DescargadorUniversoCompleto)
+    descargador.output_dir = directorio
+    descargador.estado_file = directorio / "estado_descarga.json"
+    descargador.estado = estado or {"tribunales": {}, "total_descargado": 0}
+    descargador.facetas = AgregadorFacetas(directorio / "facetas")
+    descargador.logger = logging.getLogger("test_descarga_universo")
+    descargador.tribunales = {"Prueba": {"id_buscador": "0", "cabecera": "Prueba",
+                                         "total_estimado": total, "prioridad": 1}}
+    descargador.batch_size = BATCH_SIZE
+    descargador.max_workers = 4
+    descargador.workers_por_tribunal = {"Prueba": 4}
+    descargador.procesos_escritura = 0
+    descargador.procesador = None
+    descargador.circuito = _SinCortacircuitos()
+    descargador.control = ControlDescarga()
+    descargador.en_curso = {}
+    descargador.obtener_total_tribunal = lambda *args: total
+    return descargador
+
+
+def estado_en_disco(descargador):
+    with open(descargador.estado_file, 'r') as f:
+        return json.load(f)["tribunales"]["Prueba"]
+
+
+def test_batches_fuera_de_orden(tmp_path):
+    descargador = nuevo_descargador(tmp_path, 95)
+    descargador.descargar_batch_sentencias = red = RedFalsa(demoras={0: 0.2})
+
+    assert descargador.descargar_tribunal("Prueba") == 95
+    assert sorted(red.pedidos) == list(range(10))
+    tribunal = estado_en_disco(descargador)
+    assert tribunal["estado"] == "completado"
+    assert tribunal["descargado"] == 95
+    assert tribunal["batch_actual"] == 10
+    assert tribunal["batches_adelantados"] == []
+
+
+def test_error_se_reintenta_y_cuenta_una_vez(tmp_path):
+    descargador = nuevo_descargador(tmp_path, 50)
+    descargador.descargar_batch_sentencias = red = RedFalsa(
+        fallos={2: [RuntimeError("HTTP 500")] * MAX_REINTENTOS_BATCH})
+
+    assert descargador.descargar_tribunal("Prueba") == 50
+    assert red.pedidos.count(2) == MAX_REINTENTOS_BATCH + 1
+    assert estado_en_disco(descargador)["estado"] == "completado"
+
+
+def test_circuito_abierto_no_gasta_reintentos(tmp_path):
+    descargador = nuevo_descargador(tmp_path, 50)
+    descargador.descargar_batch_sentencias = red = RedFalsa(
+        fallos={1: [CircuitoAbierto("Circuito abierto")] * (MAX_REINTENTOS_BATCH + 3)})
+
+    assert descargador.descargar_tribunal("Prueba") == 50
+    assert red.pedidos.count(1) == MAX_REINTENTOS_BATCH + 4
+    assert estado_en_disco(descargador)["estado"] == "completado"
+
+
+def test_batch_fallido_queda_para_la_proxima_corrida(tmp_path):
+    descargador = nuevo_descargador(tmp_path, 50)
+    descargador.descargar_batch_sentencias = red = RedFalsa(
+        fallos={1: [RuntimeError("timeout")] * (MAX_REINTENTOS_BATCH + 1)})
+
+    assert descargador.descargar_tribunal("Prueba") == 40
+    assert red.pedidos.count(1) == MAX_REINTENTOS_BATCH + 1
+    tribunal = estado_en_disco(descargador)
+    assert tribunal["estado"] == "interrumpido"
+    assert tribunal["batch_actual"] == 1
+    assert tribunal["batches_adelantados"] == [2, 3, 4]
+    assert tribunal["descargado"] == 40
+
+    # La corrida siguiente pide solo el batch que faltó
+    with open(descargador.estado_file, 'r') as f:
+        estado = json.load(f)
+    descargador = nuevo_descargador(tmp_path, 50, estado)
+    descargador.descargar_batch_sentencias = red = RedFalsa()
+    assert descargador.descargar_tribunal("Prueba") == 10
+    assert red.pedidos == [1]
+    tribunal = estado_en_disco(descargador)
+    assert tribunal["estado"] == "completado"
+    assert tribunal["descargado"] == 50
+    assert tribunal["batches_adelantados"] == []
+
+
+@pytest.mark.parametrize("batch_drenado", [0, 2, 5])
+def test_drenado_se_reanuda_sin_repetir_ni_saltar(tmp_path, batch_drenado):
+    descargador = nuevo_descargador(tmp_path, 200)
+
+    def drenar(batch_num):
+        if batch_num == batch_drenado:
+            descargador.control.drenar(plazo=60)
+
+    descargador.descargar_batch_sentencias = primera = RedFalsa(demoras={0: 0.1}, al_pedir=drenar)
+    descargador.descargar_tribunal("Prueba")
+    tribunal = estado_en_disco(descargador)
+    assert tribunal["estado"] == "interrumpido"
+    # Lo escrito es justo lo anterior a batch_actual más los adelantados
+    assert set(primera.pedidos) == set(range(tribunal["batch_actual"])) | set(tribunal["batches_adelantados"])
+
+    with open(descargador.estado_file, 'r') as f:
+        estado = json.load(f)
+    descargador = nuevo_descargador(tmp_path, 200, estado)
+    descargador.descargar_batch_sentencias = segunda = RedFalsa()
+    descargador.descargar_tribunal("Prueba")
+
+    assert not set(primera.pedidos) & set(segunda.pedidos)
+    assert sorted(primera.pedidos + segunda.pedidos) == list(range(20))
+    tribunal = estado_en_disco(descargador)
+    assert tribunal["estado"] == "completado"
+    assert tribunal["descargado"] == 200
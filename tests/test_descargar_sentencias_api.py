@@ -0,0 +1,116 @@
+"""Pruebas de la escritura incremental de la descarga por fechas (descargar_sentencias_api.py)"""
+
+import json
+
+from descargar_sentencias_api import EscritorJSONIncremental, SalidaPorDia
+
+
+def leer(ruta):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_arreglo_valido_tras_cada_escritura(tmp_path):
+    ruta = tmp_path / "sub" / "sentencias.json"
+    escritor = EscritorJSONIncremental(ruta)
+    assert leer(ruta) == []
+
+    escritor.escribir([{"id": 1}, {"id": 2, "texto": "ñandú"}])
+    assert leer(ruta) == [{"id": 1}, {"id": 2, "texto": "ñandú"}]
+
+    escritor.escribir([])
+    escritor.escribir([{"id": 3}])
+    assert leer(ruta) == [{"id": 1}, {"id": 2, "texto": "ñandú"}, {"id": 3}]
+    assert escritor.total == 3
+    escritor.cerrar()
+    escritor.cerrar()
+
+
+def test_continuar_agrega_al_arreglo_existente(tmp_path):
+    ruta = tmp_path / "sentencias.json"
+    escritor = EscritorJSONIncremental(ruta)
+    escritor.escribir([{"id": 1}])
+    escritor.cerrar()
+
+    escritor = EscritorJSONIncremental(ruta, continuar=True)
+    escritor.escribir([{"id": 2}, {"id": 3}])
+    escritor.cerrar()
+    assert leer(ruta) == [{"id": 1}, {"id": 2}, {"id": 3}]
+
+
+def test_continuar_arreglo_vacio_o_con_otro_formato(tmp_path):
+    vacio = tmp_path / "vacio.json"
+    EscritorJSONIncremental(vacio).cerrar()
+    escritor = EscritorJSONIncremental(vacio, continuar=True)
+    escritor.escribir([{"id": 1}])
+    escritor.cerrar()
+    assert leer(vacio) == [{"id": 1}]
+
+    # Un arreglo escrito con json.dump (indentado) también se continúa
+    indentado = tmp_path / "indentado.json"
+    indentado.write_text(json.dumps([{"id": 1}], indent=2), encoding='utf-8')
+    escritor = EscritorJSONIncremental(indentado, continuar=True)
+    escritor.escribir([{"id": 2}])
+    escritor.cerrar()
+    assert leer(indentado) == [{"id": 1}, {"id": 2}]
+
+
+def test_sin_continuar_reemplaza(tmp_path):
+    ruta = tmp_path / "sentencias.json"
+    ruta.write_text('[{"id": 1}]', encoding='utf-8')
+    escritor = EscritorJSONIncremental(ruta)
+    escritor.escribir([{"id": 2}])
+    escritor.cerrar()
+    assert leer(ruta) == [{"id": 2}]
+
+    # continuar sobre un archivo que no existe lo crea
+    nuevo = tmp_path / "nuevo.json"
+    escritor = EscritorJSONIncremental(nuevo, continuar=True)
+    escritor.escribir([{"id": 1}])
+    escritor.cerrar()
+    assert leer(nuevo) == [{"id": 1}]
+
+
+def test_salida_por_dia(tmp_path):
+    salida = SalidaPorDia(tmp_path, "2024-01-01", "2024-01-07")
+    salida.agregar("Corte_Suprema", "Corte Suprema", [
+        {"id": 1, "fec_sentencia_sup_dt": "2024-01-02T00:00:00Z"},
+        {"id": 2, "sent__FEC_ANIO_i": 2024, "sent__FEC_MES_i": 1, "sent__FEC_DIA_i": 3},
+        {"id": 3},
+    ], 5)
+    salida.agregar("Corte_Apelaciones", "Cortes de Apelaciones", [
+        {"id": 4, "fec_sentencia_sup_dt": "2024-01-02T00:00:00Z"},
+    ], 1)
+    # Vuelve un tribunal ya cerrado: el día se continúa, no se pisa
+    salida.agregar("Corte_Suprema", "Corte Suprema", [
+        {"id": 5, "fec_sentencia_sup_dt": "2024-01-02T00:00:00Z"},
+        {"id": 6},
+    ], 5)
+    salida.cerrar()
+
+    suprema = tmp_path / "Corte_Suprema"
+    assert leer(suprema / "sentencias_20240102.json") == [
+        {"id": 1, "fec_sentencia_sup_dt": "2024-01-02T00:00:00Z"},
+        {"id": 5, "fec_sentencia_sup_dt": "2024-01-02T00:00:00Z"},
+    ]
+    assert [s["id"] for s in leer(suprema / "sentencias_20240103.json")] == [2]
+    # Las sin fecha van a un archivo del rango pedido
+    assert leer(suprema / "sentencias_sin-fecha_20240101_20240107.json") == [{"id": 3}, {"id": 6}]
+
+    resumen = leer(tmp_path / "resumen_20240101.json")
+    assert resumen["total_sentencias"] == 6
+    assert resumen["por_tribunal"]["Corte_Suprema"]["descargadas"] == 5
+    assert resumen["por_dia"]["2024-01-02"] == {"Corte_Suprema": 2, "Corte_Apelaciones": 1}
+    assert len(resumen["archivos"]) == 4
+    assert "completado" in resumen
+
+
+def test_sin_fecha_de_ventanas_distintas_no_se_pisan(tmp_path):
+    for desde, hasta, ident in (("2024-01-01", "2024-01-07", 1), ("2024-01-08", "2024-01-14", 2)):
+        salida = SalidaPorDia(tmp_path, desde, hasta)
+        salida.agregar("Corte_Suprema", "Corte Suprema", [{"id": ident}], 1)
+        salida.cerrar()
+
+    archivos = sorted(p.name for p in (tmp_path / "Corte_Suprema").iterdir())
+    assert archivos == ["sentencias_sin-fecha_20240101_20240107.json",
+                        "sentencias_sin-fecha_20240108_20240114.json"]
@@ -0,0 +1,71 @@
+"""Pruebas de la detección de casi duplicados (duplicados_minhash.py)"""
+
+import random
+
+import pytest
+
+import duplicados_minhash
+from duplicados_minhash import MIN_PALABRAS, NUM_PERMUTACIONES, DetectorDuplicados, np
+
+pytestmark = pytest.mark.skipif(np is None, reason="duplicados_minhash requiere numpy")
+
+
+def texto_al_azar(semilla, largo=400):
+    rng = random.Random(semilla)
+    return [f"palabra{rng.randrange(5000)}" for _ in range(largo)]
+
+
+def sentencia(id_sentencia, palabras):
+    return {"id": id_sentencia, "texto_sentencia": "<p>" + " ".join(palabras) + "</p>"}
+
+
+@pytest.fixture
+def detector(tmp_path):
+    detector = DetectorDuplicados(tmp_path / "duplicados.sqlite")
+    yield detector
+    detector.cerrar()
+
+
+def test_firma_estima_jaccard(detector):
+    base = texto_al_azar(1)
+    parecido = base[:380] + texto_al_azar(2, 20)
+    firmas = detector.calcular_firmas([base, parecido, texto_al_azar(3)])
+    assert firmas.shape == (3, NUM_PERMUTACIONES)
+
+    shingles = [set(detector._hashes_shingles(p).tolist()) for p in (base, parecido)]
+    jaccard = len(shingles[0] & shingles[1]) / len(shingles[0] | shingles[1])
+    assert np.mean(firmas[0] == firmas[1]) == pytest.approx(jaccard, abs=0.1)
+    assert np.mean(firmas[0] == firmas[2]) < 0.05
+
+
+def test_firmas_no_dependen_del_tamano_del_lote(detector, monkeypatch):
+    textos = [texto_al_azar(semilla, 100 + semilla * 7) for semilla in range(12)]
+    juntas = detector.calcular_firmas(textos)
+    monkeypatch.setattr(duplicados_minhash, "MAX_SHINGLES_POR_LOTE", 300)
+    assert (detector.calcular_firmas(textos) == juntas).all()
+
+
+def test_agregar_y_agrupar_entre_tribunales(detector):
+    base = texto_al_azar(1)
+    assert detector.agregar("Civiles", [
+        sentencia("c1", base),
+        sentencia("c2", texto_al_azar(2)),
+        sentencia("corta", base[:MIN_PALABRAS - 1]),
+        {"id": None, "texto_sentencia": " ".join(base)},
+    ]) == 0
+    # Copia casi exacta en otro tribunal
+    assert detector.agregar("Corte_de_Apelaciones", [sentencia("a1", base[:395] + ["distinta"] * 5)]) == 1
+    # Una sentencia ya indexada no se vuelve a agregar
+    assert detector.agregar("Civiles", [sentencia("c1", base)]) == 0
+
+    assert detector.clusters() == [{
+        "representante": "c1",
+        "sentencias": [{"id": "c1", "tribunal": "Civiles"},
+                       {"id": "a1", "tribunal": "Corte_de_Apelaciones"}],
+    }]
+
+
+def test_id_repetido_en_un_mismo_batch(detector):
+    base = texto_al_azar(1)
+    assert detector.agregar("Civiles", [sentencia("c1", base), sentencia("c1", base), sentencia("c2", base)]) == 1
+    assert detector.conn.execute("SELECT COUNT(*) FROM firmas").fetchone()[0] == 2
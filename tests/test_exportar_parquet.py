@@ -0,0 +1,119 @@
+"""Pruebas de la exportación incremental a Parquet (exportar_parquet.py)"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from exportar_parquet import ExportadorParquet, convertir_valor, pa, tipo_campo
+
+requiere_pyarrow = pytest.mark.skipif(pa is None, reason="exportar_parquet requiere pyarrow")
+
+
+def test_tipo_campo():
+    assert tipo_campo('cod_corte_i') == 'int'
+    assert tipo_campo('fec_sentencia_sup_dt') == 'fecha'
+    assert tipo_campo('descriptores_ss') == 'lista'
+    assert tipo_campo('rol_era_sup_s') == 'texto'
+    assert tipo_campo('tip_causa_juz_i') == 'texto'
+    assert tipo_campo('crr_documento_id_i') == 'texto'
+
+
+def test_convertir_valor():
+    assert convertir_valor('12', 'int') == 12
+    assert convertir_valor('NO', 'int') is None
+    assert convertir_valor('x', 'lista') == ['x']
+    assert convertir_valor([1, 'a'], 'lista') == ['1', 'a']
+    assert convertir_valor('2024-01-02T00:00:00Z', 'fecha') == datetime(2024, 1, 2, tzinfo=timezone.utc)
+    assert convertir_valor('sin fecha', 'fecha') is None
+    assert convertir_valor(5, 'texto') == '5'
+    assert convertir_valor(None, 'int') is None
+
+
+def escribir_batch(directorio, tribunal, nombre, sentencias):
+    ruta = directorio / tribunal / nombre
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(json.dumps(sentencias), encoding='utf-8')
+    return ruta
+
+
+def sentencia(id_sentencia, anio, **campos):
+    return {"id": id_sentencia, "sent__FEC_ANIO_i": anio, "sent__FEC_MES_i": 1, "sent__FEC_DIA_i": 2,
+            "texto_sentencia": "texto", **campos}
+
+
+def archivos(directorio):
+    return sorted(str(p.relative_to(directorio)).split(os.sep)[:3] for p in directorio.rglob("*.parquet"))
+
+
+@requiere_pyarrow
+def test_exportar_por_particion_e_incremental(tmp_path):
+    import pyarrow.parquet as pq
+
+    entrada, salida = tmp_path / "batches", tmp_path / "parquet"
+    escribir_batch(entrada, "Civiles", "batch_000000.json", [
+        sentencia("1", 2023, cod_corte_i=10), sentencia("2", 2024, cod_corte_i="20"),
+    ])
+
+    exportador = ExportadorParquet(entrada, salida, con_textos=True)
+    assert exportador.exportar() == (1, 2)
+    assert archivos(salida) == [
+        ["metadatos", "tribunal=Civiles", "anio=2023"], ["metadatos", "tribunal=Civiles", "anio=2024"],
+        ["textos", "tribunal=Civiles", "anio=2023"], ["textos", "tribunal=Civiles", "anio=2024"],
+    ]
+    (archivo,) = (salida / "metadatos" / "tribunal=Civiles" / "anio=2024").iterdir()
+    fila = pq.read_table(archivo).to_pylist()[0]
+    assert fila["cod_corte_i"] == 20
+    assert fila["fecha_sentencia"] == "2024-01-02"
+    assert "texto_sentencia" not in fila
+
+    # Sin cambios no se vuelve a exportar
+    assert ExportadorParquet(entrada, salida, con_textos=True).exportar() == (0, 0)
+
+
+@requiere_pyarrow
+def test_batch_reescrito_quita_particiones_obsoletas(tmp_path):
+    entrada, salida = tmp_path / "batches", tmp_path / "parquet"
+    ruta = escribir_batch(entrada, "Civiles", "batch_000000.json", [sentencia("1", 2023), sentencia("2", 2024)])
+    ExportadorParquet(entrada, salida).exportar()
+
+    escribir_batch(entrada, "Civiles", "batch_000000.json", [sentencia("1", 2024), sentencia("2", 2024)])
+    os.utime(ruta, ns=(0, 0))   # Firma distinta aunque el tamaño coincida
+    exportador = ExportadorParquet(entrada, salida)
+    assert exportador.exportar() == (1, 2)
+    assert archivos(salida) == [["metadatos", "tribunal=Civiles", "anio=2024"]]
+    assert exportador.estado["batches"][str(ruta)]["particiones"] == [2024]
+
+
+@requiere_pyarrow
+def test_valor_no_numerico_pasa_la_columna_a_texto(tmp_path):
+    import pyarrow.parquet as pq
+
+    entrada, salida = tmp_path / "batches", tmp_path / "parquet"
+    escribir_batch(entrada, "Laborales", "batch_000000.json", [
+        sentencia("1", 2024, flg_extra_i=1), sentencia("2", 2024, flg_extra_i="NO"),
+    ])
+    exportador = ExportadorParquet(entrada, salida)
+    exportador.exportar()
+    assert exportador.estado["columnas"]["flg_extra_i"] == 'texto'
+    (archivo,) = (salida / "metadatos" / "tribunal=Laborales" / "anio=2024").iterdir()
+    assert [f["flg_extra_i"] for f in pq.read_table(archivo).to_pylist()] == ["1", "NO"]
+
+
+@requiere_pyarrow
+def test_estado_anterior_con_solo_firmas(tmp_path):
+    entrada, salida = tmp_path / "batches", tmp_path / "parquet"
+    ruta = escribir_batch(entrada, "Civiles", "batch_000000.json", [sentencia("1", 2023)])
+    exportador = ExportadorParquet(entrada, salida)
+    exportador.exportar()
+
+    # Formato anterior: ruta -> firma; las particiones se recuperan del disco
+    estado = json.loads(exportador.estado_file.read_text())
+    estado["batches"] = {ruta_batch: registro["firma"] for ruta_batch, registro in estado["batches"].items()}
+    estado["columnas"]["tip_causa_juz_i"] = 'int'
+    exportador.estado_file.write_text(json.dumps(estado))
+
+    exportador = ExportadorParquet(entrada, salida)
+    assert exportador.estado["batches"][str(ruta)]["particiones"] == [2023]
+    assert exportador.estado["columnas"]["tip_causa_juz_i"] == 'texto'
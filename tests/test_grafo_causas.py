@@ -0,0 +1,183 @@
+"""Pruebas del grafo de vinculación de causas (grafo_causas.py)"""
+
+import json
+
+import pytest
+
+from grafo_causas import GrafoCausas, TablaTextos, claves_causa, np
+
+requiere_numpy = pytest.mark.skipif(np is None, reason="grafo_causas requiere numpy")
+
+JUZGADO = {"id": "j1", "cod_juz_i": 100, "rol_era_sup_s": "C-123-2020",
+           "fec_sentencia_sup_dt": "2020-06-01T00:00:00Z", "sent__RUC_s": "2000123456-7"}
+CORTE = {"id": "a1", "cod_corte_i": 10, "rol_era_ape_s": "456-2021", "cod_juz_i": "100",
+         "rol_juz_i": 123, "era_juz_i": 2020, "tip_causa_juz_i": "C",
+         "fec_sentencia_sup_dt": "2021-03-01T00:00:00Z"}
+SUPREMA = {"id": "s1", "cod_corte_i": 10, "rol_era_sup_s": "7890-2022",
+           "rol_era_ape_s": "456-2021", "fec_sentencia_sup_dt": "2022-01-10T00:00:00Z"}
+OTRA = {"id": "j2", "cod_juz_i": 100, "rol_era_sup_s": "C-999-2020",
+        "fec_sentencia_sup_dt": "2020-07-01T00:00:00Z"}
+
+
+def escribir_batch(directorio, tribunal, nombre, sentencias):
+    ruta = directorio / tribunal / nombre
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(json.dumps(sentencias), encoding='utf-8')
+    return ruta
+
+
+def test_claves_causa_por_instancia():
+    assert claves_causa("Civiles", JUZGADO) == {"juz:100:C-123-2020", "ruc:2000123456-7"}
+    assert claves_causa("Corte_de_Apelaciones", CORTE) == {"corte:10:456-2021", "juz:100:C-123-2020"}
+    assert claves_causa("Corte_Suprema", SUPREMA) == {"suprema:7890-2022", "corte:10:456-2021"}
+
+
+def test_claves_causa_ignora_roles_vacios_y_campos_numericos():
+    sentencia = {"cod_corte_i": 10, "rol_era_sup_s": "0-0", "rol_era_ape_s": 0,
+                 "sent__RUC_s": "19-4--"}
+    assert claves_causa("Corte_Suprema", sentencia) == set()
+    # Campos que llegan como número en vez de string no rompen la extracción
+    assert claves_causa("Penales", {"cod_juz_i": 5, "rol_era_sup_s": 2020,
+                                    "sent__CRR_CAUSA_i": "77", "sent__RUC_s": 123}) == {"causa:Penales:77"}
+
+
+@requiere_numpy
+def test_tabla_textos(tmp_path):
+    tabla = TablaTextos(tmp_path, "prueba")
+    assert len(tabla) == 0
+    assert tabla.buscar("a") is None
+
+    valores = ["suprema:1-2020", "ruc:12-3", "ñandú", "", "corte:5:1-2021"]
+    tabla.escribir(valores)
+    assert len(tabla) == len(valores)
+    assert tabla.valores() == valores
+    for numero, valor in enumerate(valores):
+        assert tabla.buscar(valor) == numero
+    assert tabla.buscar("no-esta") is None
+
+    # Desde otra instancia (solo mmap)
+    assert TablaTextos(tmp_path, "prueba")[2] == "ñandú"
+
+
+@requiere_numpy
+def test_historia_entre_instancias(tmp_path):
+    batches = tmp_path / "batches"
+    escribir_batch(batches, "Civiles", "batch_000000.json", [JUZGADO, OTRA])
+    escribir_batch(batches, "Corte_de_Apelaciones", "batch_000000.json", [CORTE])
+    escribir_batch(batches, "Corte_Suprema", "batch_000000.json", [SUPREMA])
+
+    grafo = GrafoCausas(tmp_path / "grafo")
+    assert grafo.actualizar(batches)[0] == 3
+
+    historia = GrafoCausas(tmp_path / "grafo").historia("s1")
+    assert [fila[0] for fila in historia] == ["j1", "a1", "s1"]
+    assert historia[0] == ["j1", "Civiles", "2020-06-01", "C-123-2020"]
+    assert [fila[0] for fila in grafo.historia("j2")] == ["j2"]
+    assert grafo.historia("no-existe") == []
+    assert grafo.buscar_clave("2000123456-7") == ["j1"]
+    assert grafo.buscar_clave("7890-2022") == ["s1"]
+
+
+@requiere_numpy
+def test_actualizacion_incremental(tmp_path):
+    batches = tmp_path / "batches"
+    escribir_batch(batches, "Civiles", "batch_000000.json", [JUZGADO])
+    grafo = GrafoCausas(tmp_path / "grafo")
+    grafo.actualizar(batches)
+
+    # Sin cambios no se relee nada
+    assert GrafoCausas(tmp_path / "grafo").actualizar(batches) == (0, 0)
+
+    escribir_batch(batches, "Corte_Suprema", "batch_000000.json", [SUPREMA])
+    grafo = GrafoCausas(tmp_path / "grafo")
+    assert grafo.actualizar(batches)[0] == 1
+    # La Corte que los une llega después
+    escribir_batch(batches, "Corte_de_Apelaciones", "batch_000000.json", [CORTE])
+    grafo.actualizar(batches)
+    assert [fila[0] for fila in grafo.historia("j1")] == ["j1", "a1", "s1"]
+
+    # Un batch reescrito no duplica nodos ni aristas
+    escribir_batch(batches, "Civiles", "batch_000000.json", [JUZGADO, OTRA])
+    grafo = GrafoCausas(tmp_path / "grafo")
+    grafo.actualizar(batches)
+    assert sorted(grafo.ids.valores()) == ["a1", "j1", "j2", "s1"]
+    assert len(grafo.vecinos("sentencias", grafo.numero_sentencia("j1"))) == 2
+
+
+@requiere_numpy
+def test_batch_reescrito_reemplaza_sus_aristas(tmp_path):
+    batches = tmp_path / "batches"
+    escribir_batch(batches, "Civiles", "batch_000000.json", [JUZGADO])
+    escribir_batch(batches, "Corte_de_Apelaciones", "batch_000000.json", [CORTE])
+    GrafoCausas(tmp_path / "grafo").actualizar(batches)
+
+    # El juzgado corrigió el rol: ya no es la causa que subió a la Corte
+    corregido = dict(JUZGADO, rol_era_sup_s="C-124-2020", sent__RUC_s=None)
+    escribir_batch(batches, "Civiles", "batch_000000.json", [corregido])
+    grafo = GrafoCausas(tmp_path / "grafo")
+    grafo.actualizar(batches)
+    assert [fila[0] for fila in grafo.historia("a1")] == ["a1"]
+    assert grafo.historia("j1") == [["j1", "Civiles", "2020-06-01", "C-124-2020"]]
+    assert grafo.buscar_clave("2000123456-7") == []
+
+    # Un batch borrado deja de aportar aristas
+    (batches / "Corte_de_Apelaciones" / "batch_000000.json").unlink()
+    grafo = GrafoCausas(tmp_path / "grafo")
+    grafo.actualizar(batches)
+    assert len(grafo.vecinos("sentencias", grafo.numero_sentencia("a1"))) == 0
+
+
+@requiere_numpy
+def test_reescrituras_compactan_el_archivo_de_aristas(tmp_path):
+    batches = tmp_path / "batches"
+    for version in range(5):
+        escribir_batch(batches, "Civiles", "batch_000000.json", [JUZGADO, dict(OTRA, version=version)])
+        grafo = GrafoCausas(tmp_path / "grafo")
+        grafo.actualizar(batches)
+        assert grafo.meta["aristas_pares"] <= 2 * 3
+        assert (tmp_path / "grafo" / grafo.meta["aristas"]).stat().st_size == grafo.meta["aristas_pares"] * 8
+    assert len(list((tmp_path / "grafo").glob("aristas*.bin"))) == 1
+    assert grafo.buscar_clave("2000123456-7") == ["j1"]
+
+
+@requiere_numpy
+def test_actualizacion_interrumpida_no_desalinea_las_aristas(tmp_path, monkeypatch):
+    batches = tmp_path / "batches"
+    escribir_batch(batches, "Corte_Suprema", "batch_000000.json", [SUPREMA])
+    GrafoCausas(tmp_path / "grafo").actualizar(batches)
+
+    # Muere después de agregar aristas y antes de guardar nodos y meta.json
+    escribir_batch(batches, "Civiles", "batch_000000.json", [OTRA, JUZGADO])
+    def morir(self):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as m:
+        m.setattr(GrafoCausas, "_guardar_nodos", morir)
+        with pytest.raises(KeyboardInterrupt):
+            GrafoCausas(tmp_path / "grafo").actualizar(batches)
+
+    # Antes de la siguiente corrida cambian los batches (y con ellos la numeración)
+    escribir_batch(batches, "Civiles", "batch_000000.json", [JUZGADO])
+    escribir_batch(batches, "Corte_de_Apelaciones", "batch_000000.json", [CORTE])
+    grafo = GrafoCausas(tmp_path / "grafo")
+    grafo.actualizar(batches)
+    assert [fila[0] for fila in grafo.historia("s1")] == ["j1", "a1", "s1"]
+    assert grafo.numero_sentencia("j2") is None
+    assert (tmp_path / "grafo" / grafo.meta["aristas"]).stat().st_size == grafo.meta["aristas_pares"] * 8
+
+
+@requiere_numpy
+def test_grafo_de_version_anterior_se_relee(tmp_path):
+    batches = tmp_path / "batches"
+    escribir_batch(batches, "Civiles", "batch_000000.json", [JUZGADO])
+    GrafoCausas(tmp_path / "grafo").actualizar(batches)
+
+    # meta.json sin rangos de aristas por batch
+    meta_file = tmp_path / "grafo" / "meta.json"
+    meta = json.loads(meta_file.read_text())
+    meta["batches"] = {ruta: registro["firma"] for ruta, registro in meta["batches"].items()}
+    del meta["aristas_pares"], meta["aristas"]
+    meta_file.write_text(json.dumps(meta))
+
+    grafo = GrafoCausas(tmp_path / "grafo")
+    assert grafo.actualizar(batches)[0] == 1
+    assert grafo.buscar_clave("2000123456-7") == ["j1"]
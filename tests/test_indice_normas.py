@@ -0,0 +1,83 @@
+"""Pruebas del índice invertido de citas normativas (indice_normas.py)"""
+
+import json
+
+import pytest
+
+from indice_normas import IndiceNormas, citas_sentencia
+
+
+def sentencia(id_sentencia, *citas):
+    return {"id": id_sentencia, "id_norma_ss": [norma for norma, _ in citas],
+            "gls_tituloparte_ss": [articulo for _, articulo in citas]}
+
+
+def escribir_batch(directorio, nombre, contenido):
+    ruta = directorio / "Corte_Suprema" / nombre
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(contenido if isinstance(contenido, str) else json.dumps(contenido), encoding='utf-8')
+    return ruta
+
+
+def test_citas_sentencia():
+    assert citas_sentencia(sentencia("1", (1984, "Art. 296 "), (1984, "art 297"))) == {
+        ("1984", "296"), ("1984", "297")}
+    assert citas_sentencia({"id_norma_ss": [5], "norma_articulo_ss": ["Ley\\t12"]}) == {("5", "12")}
+
+
+def test_consulta_y_batch_reescrito(tmp_path):
+    batches = tmp_path / "batches"
+    escribir_batch(batches, "batch_000000.json", [
+        sentencia("13441488-126039873", (1984, "296")), sentencia("B", (1984, "296"), (1984, "297")),
+    ])
+    indice = IndiceNormas(tmp_path / "indice")
+    indice.construir(batches)
+    assert indice.ids("1984:296") == ["13441488-126039873", "B"]
+    assert indice.intersectar(["1984:296", "1984:297"]) == ["B"]
+
+    # El rango anterior del batch reescrito queda borrado
+    escribir_batch(batches, "batch_000000.json", [sentencia("B", (1984, "297"), (1984, "300"))])
+    indice = IndiceNormas(tmp_path / "indice")
+    indice.construir(batches)
+    assert indice.ids("1984:296") == []
+    assert indice.ids("1984:*") == ["B"]
+
+    indice.compactar()
+    assert IndiceNormas(tmp_path / "indice").unir(["1984:297", "1984:300"]) == ["B"]
+
+
+def test_construccion_interrumpida_no_desplaza_la_numeracion(tmp_path):
+    batches = tmp_path / "batches"
+    escribir_batch(batches, "batch_000000.json", [sentencia("A", (1, "1")), sentencia("B", (1, "2"))])
+    IndiceNormas(tmp_path / "indice").construir(batches)
+
+    # La segunda construcción agrega ids a documentos.txt y falla antes de guardar meta.json
+    escribir_batch(batches, "batch_000001.json", [sentencia("C", (1, "3"))])
+    escribir_batch(batches, "batch_000002.json", '[{"id": "D", "id_norma_ss": [1')
+    with pytest.raises(ValueError):
+        IndiceNormas(tmp_path / "indice").construir(batches)
+
+    escribir_batch(batches, "batch_000002.json", [sentencia("D", (1, "4"))])
+    indice = IndiceNormas(tmp_path / "indice")
+    indice.construir(batches)
+    assert (tmp_path / "indice" / "documentos.txt").read_text().splitlines() == ["A", "B", "C", "D"]
+    assert [indice.ids(f"1:{articulo}") for articulo in "1234"] == [["A"], ["B"], ["C"], ["D"]]
+
+
+def test_indice_sin_documentos_bytes(tmp_path):
+    batches = tmp_path / "batches"
+    escribir_batch(batches, "batch_000000.json", [sentencia("A", (1, "1"))])
+    IndiceNormas(tmp_path / "indice").construir(batches)
+
+    # meta.json de antes de documentos_bytes, con ids sin confirmar al final de la tabla
+    meta_file = tmp_path / "indice" / "meta.json"
+    meta = json.loads(meta_file.read_text())
+    del meta["documentos_bytes"]
+    meta_file.write_text(json.dumps(meta))
+    with open(tmp_path / "indice" / "documentos.txt", 'a') as f:
+        f.write("X\nY\n")
+
+    escribir_batch(batches, "batch_000001.json", [sentencia("B", (1, "2"))])
+    indice = IndiceNormas(tmp_path / "indice")
+    indice.construir(batches)
+    assert indice.ids("1:2") == ["B"]
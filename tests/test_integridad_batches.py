@@ -0,0 +1,82 @@
+"""Pruebas del manifiesto y el validador de batches (integridad_batches.py)"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from integridad_batches import MANIFIESTO_BATCHES, cargar_manifiesto, escribir_batch, validar_arbol
+
+
+def escribir_numero(tarea):
+    directorio, numero = tarea
+    sentencias = [{"id": f"{numero}-{i}", "texto": "x" * 3000} for i in range(5)]
+    escribir_batch(f"{directorio}/batch_{numero:06d}.json", sentencias, len(sentencias))
+
+
+def test_manifiesto_desde_varios_procesos(tmp_path):
+    tribunal = tmp_path / "Corte_Suprema"
+    tribunal.mkdir()
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(escribir_numero, [(str(tribunal), n) for n in range(200)]))
+
+    lineas = (tribunal / MANIFIESTO_BATCHES).read_text(encoding='utf-8').splitlines()
+    assert len(lineas) == 200
+    assert all(json.loads(linea)["sentencias"] == 5 for linea in lineas)
+    assert len(cargar_manifiesto(tribunal)) == 200
+    assert validar_arbol(tmp_path, workers=2) == ([], 200)
+
+
+def test_batch_danado_o_ausente(tmp_path):
+    tribunal = tmp_path / "Corte_Suprema"
+    tribunal.mkdir()
+    for numero in range(3):
+        escribir_numero((str(tribunal), numero))
+    ruta = tribunal / "batch_000001.json"
+    ruta.write_bytes(ruta.read_bytes()[:-10])
+    (tribunal / "batch_000002.json").unlink()
+
+    problemas, _ = validar_arbol(tmp_path, workers=1)
+    assert [(p["batch"], p["motivo"].split()[0]) for p in problemas] == [(1, "tamano"), (2, "faltante")]
+
+
+def escribir_tribunal(directorio, numeros, sentencias_por_batch=10, ultimo=None):
+    tribunal = directorio / "Civiles"
+    tribunal.mkdir(exist_ok=True)
+    for numero in numeros:
+        cantidad = ultimo if numero == max(numeros) and ultimo else sentencias_por_batch
+        escribir_batch(tribunal / f"batch_{numero:06d}.json",
+                       [{"id": f"{numero}-{i}"} for i in range(cantidad)], cantidad)
+
+
+def escribir_estado(directorio, **tribunal):
+    (directorio / "estado_descarga.json").write_text(json.dumps({"tribunales": {"Civiles": tribunal}}))
+
+
+def faltantes(directorio):
+    problemas, _ = validar_arbol(directorio, workers=1)
+    assert all(p["motivo"] == "faltante" for p in problemas)
+    return [p["batch"] for p in problemas]
+
+
+def test_huecos_sin_estado(tmp_path):
+    escribir_tribunal(tmp_path, [2, 3, 6])
+    assert faltantes(tmp_path) == [4, 5]
+
+
+def test_huecos_dentro_del_rango_de_la_descarga(tmp_path):
+    escribir_tribunal(tmp_path, [1, 3, 4], ultimo=5)
+    escribir_estado(tmp_path, total=45, batch_size=10, batch_actual=5, estado="completado")
+    # También faltan los del comienzo; nada más allá del total
+    assert faltantes(tmp_path) == [0, 2]
+
+
+def test_no_reporta_lo_que_aun_no_se_descarga(tmp_path):
+    escribir_tribunal(tmp_path, [0, 1, 2, 5])
+    escribir_estado(tmp_path, total=1000, batch_size=10, batch_actual=3, estado="interrumpido")
+    assert faltantes(tmp_path) == []
+
+
+def test_paginas_vacias_tras_un_total_estimado(tmp_path):
+    # El total era una estimación: los datos terminan en el batch 3 (incompleto)
+    escribir_tribunal(tmp_path, [0, 1, 3], ultimo=4)
+    escribir_estado(tmp_path, total=200, batch_size=10, batch_actual=20, estado="completado")
+    assert faltantes(tmp_path) == [2]
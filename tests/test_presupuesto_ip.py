@@ -0,0 +1,70 @@
+"""Pruebas del token bucket compartido (presupuesto_ip.py)"""
+
+import pytest
+
+from presupuesto_ip import RAFAGA_IP, SOLICITUDES_POR_SEGUNDO_IP, PresupuestoIP
+
+
+@pytest.fixture
+def presupuesto(tmp_path, reloj):
+    return PresupuestoIP(tmp_path / "presupuesto.json")
+
+
+def test_rafaga_inicial_sin_espera(presupuesto):
+    for _ in range(RAFAGA_IP):
+        assert presupuesto.reservar() == 0.0
+    assert presupuesto.reservar() == pytest.approx(1 / SOLICITUDES_POR_SEGUNDO_IP)
+
+
+def test_turnos_reservados_se_encolan(presupuesto):
+    esperas = [presupuesto.reservar() for _ in range(RAFAGA_IP + 4)]
+    intervalo = 1 / SOLICITUDES_POR_SEGUNDO_IP
+    assert esperas[RAFAGA_IP:] == pytest.approx([intervalo * i for i in range(1, 5)])
+    assert presupuesto.estado()["tokens"] == pytest.approx(-4)
+    assert presupuesto.estado()["solicitudes"] == RAFAGA_IP + 4
+
+
+def test_relleno_con_el_tiempo_hasta_la_rafaga(presupuesto, reloj):
+    for _ in range(RAFAGA_IP):
+        presupuesto.reservar()
+    assert presupuesto.estado()["tokens"] == pytest.approx(0)
+
+    reloj.avanzar(0.25)
+    assert presupuesto.estado()["tokens"] == pytest.approx(0.25 * SOLICITUDES_POR_SEGUNDO_IP)
+
+    # Una pausa larga no acumula más que la ráfaga
+    reloj.avanzar(3600)
+    assert presupuesto.estado()["tokens"] == RAFAGA_IP
+
+
+def test_esperar_duerme_hasta_el_turno(presupuesto, reloj):
+    for _ in range(RAFAGA_IP + 3):
+        presupuesto.esperar()
+    # Cada turno sale 1/ritmo después del anterior
+    intervalo = 1 / SOLICITUDES_POR_SEGUNDO_IP
+    assert reloj.dormido == pytest.approx([intervalo] * 3)
+
+
+def test_compartido_entre_instancias(presupuesto, tmp_path):
+    otro = PresupuestoIP(tmp_path / "presupuesto.json")
+    for _ in range(RAFAGA_IP):
+        otro.reservar()
+    assert presupuesto.reservar() > 0
+
+
+def test_fijar(presupuesto, reloj):
+    estado = presupuesto.fijar(0.5, rafaga=1)
+    assert (estado["por_segundo"], estado["rafaga"], estado["tokens"]) == (0.5, 1, 1)
+
+    assert presupuesto.reservar() == 0.0
+    assert presupuesto.reservar() == pytest.approx(2.0)
+
+    # Con turnos reservados, bajar la ráfaga no los borra
+    assert presupuesto.fijar(1.0, rafaga=0)["tokens"] == pytest.approx(-1)
+    assert presupuesto.estado()["rafaga"] == 1
+
+
+@pytest.mark.parametrize("por_segundo", [0, -1])
+def test_fijar_rechaza_ritmo_no_positivo(presupuesto, por_segundo):
+    with pytest.raises(ValueError):
+        presupuesto.fijar(por_segundo)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Trazas y perfiles de las etapas de descarga, transformación y carga
+Instrumentación opcional: tramos con tiempo alrededor de token, contexto,
+cada POST, decodificación, escritura, mapeo y subida, exportados como
+traza de Chrome (chrome://tracing o ui.perfetto.dev). Con --profile se
+guarda además un perfil cProfile y una instantánea tracemalloc por etapa.
+Desactivada no agrega trabajo más allá de una comparación por tramo
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+TRAZAS_DEFAULT = "output/trazas"
+
+_NULO = nullcontext()
+
+
+class Trazador:
+    """Acumula tramos (eventos 'X' del formato de trazas de Chrome)"""
+
+    def __init__(self, directorio=TRAZAS_DEFAULT, perfilar=False):
+        self.directorio = Path(directorio)
+        self.perfilar = perfilar
+        self.eventos = []
+        self.origen = time.perf_counter()
+        self.pid = os.getpid()
+        self.hilos = {}
+        self.lock = threading.Lock()
+        self.sello = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        if perfilar and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+
+    def _micros(self, instante):
+        return (instante - self.origen) * 1e6
+
+    @contextmanager
+    def tramo(self, nombre, categoria="", **args):
+        """Medir un bloque como tramo"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            fin = time.perf_counter()
+            hilo = threading.current_thread()
+            evento = {
+                "name": nombre,
+                "cat": categoria,
+                "ph": "X",
+                "ts": round(self._micros(inicio), 1),
+                "dur": round((fin - inicio) * 1e6, 1),
+                "pid": self.pid,
+                "tid": hilo.ident,
+            }
+            if args:
+                evento["args"] = args
+            with self.lock:
+                self.hilos.setdefault(hilo.ident, hilo.name)
+                self.eventos.append(evento)
+
+    def registrar(self, nombre, categoria, inicio, duracion, pid=None, **args):
+        """Agregar un tramo medido en otro proceso (inicio en time.time(), duración en segundos)
+
+        Los procesos de un pool no tienen trazador: devuelven sus tiempos con
+        el resultado y el proceso principal los registra aquí, en una fila
+        propia por proceso.
+        """
+        inicio_local = inicio - (time.time() - time.perf_counter())
+        if pid is None or pid == self.pid:
+            hilo = threading.current_thread()
+            tid, nombre_hilo = hilo.ident, hilo.name
+        else:
+            tid, nombre_hilo = pid, f"proceso {pid}"
+        evento = {
+            "name": nombre,
+            "cat": categoria,
+            "ph": "X",
+            "ts": round(self._micros(inicio_local), 1),
+            "dur": round(duracion * 1e6, 1),
+            "pid": self.pid,
+            "tid": tid,
+        }
+        if args:
+            evento["args"] = args
+        with self.lock:
+            self.hilos.setdefault(tid, nombre_hilo)
+            self.eventos.append(evento)
+
+    @contextmanager
+    def etapa(self, nombre):
+        """Tramo de una etapa completa; con perfilado, perfil y memoria de la etapa
+
+        cProfile mide solo el hilo que lo activa, así que cada etapa debe
+        abrirse en el hilo que la ejecuta.
+        """
+        if not self.perfilar:
+            with self.tramo(nombre, "etapa"):
+                yield
+            return
+
+        perfil = cProfile.Profile()
+        memoria_inicio = tracemalloc.take_snapshot()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Ya hay un perfil activo en este hilo (etapas anidadas): solo el tramo
+            perfil = None
+
+        try:
+            with self.tramo(nombre, "etapa"):
+                yield
+        finally:
+            if perfil:
+                perfil.disable()
+            self._guardar_perfil(nombre, perfil, memoria_inicio, tracemalloc.take_snapshot())
+
+    def _guardar_perfil(self, nombre, perfil, memoria_inicio, memoria_fin):
+        """Escribir el perfil (.prof, para pstats o snakeviz) y el resumen de memoria de una etapa"""
+        destino = self.directorio / f"perfil_{self.sello}"
+        destino.mkdir(parents=True, exist_ok=True)
+        base = destino / f"{nombre}_{threading.get_ident()}"
+
+        if perfil:
+            perfil.dump_stats(f"{base}.prof")
+        memoria_fin.dump(f"{base}.tracemalloc")
+
+        diferencias = memoria_fin.compare_to(memoria_inicio, 'lineno')
+        actual, pico = tracemalloc.get_traced_memory()
+        with open(f"{base}_memoria.txt", 'w', encoding='utf-8') as f:
+            f.write(f"Etapa: {nombre}\n")
+            f.write(f"Memoria trazada: {actual / 1e6:.1f} MB (pico {pico / 1e6:.1f} MB)\n\n")
+            f.write("Mayores crecimientos por línea:\n")
+            for estadistica in diferencias[:25]:
+                f.write(f"{estadistica}\n")
+
+    def exportar(self):
+        """Escribir la traza en formato JSON de Chrome"""
+        with self.lock:
+            eventos = list(self.eventos)
+            hilos = dict(self.hilos)
+        if not eventos:
+            return None
+
+        metadatos = [{
+            "name": "process_name", "ph": "M", "pid": self.pid,
+            "args": {"name": Path(sys.argv[0]).stem or "python"}
+        }]
+        metadatos += [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": nombre}}
+            for tid, nombre in hilos.items()
+        ]
+
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        ruta = self.directorio / f"traza_{Path(sys.argv[0]).stem}_{self.sello}_{self.pid}.json"
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": metadatos + eventos, "displayTimeUnit": "ms"}, f)
+        return ruta
+
+    def resumen(self):
+        """Tiempo total, cantidad y máximo por nombre de tramo, de mayor a menor"""
+        totales = {}
+        with self.lock:
+            for evento in self.eventos:
+                total = totales.setdefault(evento["name"], {"n": 0, "ms": 0.0, "max_ms": 0.0})
+                total["n"] += 1
+                total["ms"] += evento["dur"] / 1000
+                total["max_ms"] = max(total["max_ms"], evento["dur"] / 1000)
+        return dict(sorted(totales.items(), key=lambda x: -x[1]["ms"]))
+
+
+_trazador = None
+
+
+def activar(directorio=TRAZAS_DEFAULT, perfilar=False):
+    """Activar la instrumentación; la traza se exporta al terminar el proceso"""
+    global _trazador
+    if _trazador is None:
+        _trazador = Trazador(directorio, perfilar)
+        atexit.register(_al_salir)
+    return _trazador
+
+
+def activar_desde_argv(argv=None):
+    """Activar si la línea de comandos trae --traza[=DIR] o --profile (o PJUD_TRAZA en el entorno)"""
+    argv = sys.argv if argv is None else argv
+    directorio = os.environ.get("PJUD_TRAZA")
+    perfilar = '--profile' in argv
+    for arg in argv:
+        if arg == '--traza':
+            directorio = directorio or TRAZAS_DEFAULT
+        elif arg.startswith('--traza='):
+            directorio = arg.split('=', 1)[1]
+    if directorio or perfilar:
+        return activar(directorio or TRAZAS_DEFAULT, perfilar)
+    return None
+
+
+def _al_salir():
+    ruta = _trazador.exportar()
+    if ruta:
+        print(f"\n⏱️ Traza: {ruta}")
+        for nombre, total in list(_trazador.resumen().items())[:10]:
+            print(f"   {nombre}: {total['n']}× {total['ms']:.0f} ms (máx {total['max_ms']:.0f} ms)")
+
+
+def tramo(nombre, categoria="", **args):
+    """Tramo con tiempo (no hace nada si la instrumentación está desactivada)"""
+    if _trazador is None:
+        return _NULO
+    return _trazador.tramo(nombre, categoria, **args)
+
+
+def registrar_tramo(nombre, categoria, inicio, duracion, pid=None, **args):
+    """Registrar un tramo medido en otro proceso (no hace nada si la instrumentación está desactivada)"""
+    if _trazador is not None:
+        _trazador.registrar(nombre, categoria, inicio, duracion, pid, **args)
+
+
+def etapa(nombre):
+    """Etapa de descarga, transformación o carga (perfilada con --profile)"""
+    if _trazador is None:
+        return _NULO
+    return _trazador.etapa(nombre)
+
+
+def main():
+    """Función principal"""
+    if len(sys.argv) < 2:
+        print("Uso: python trazas.py TRAZA.json")
+        print("Ejemplo: python trazas.py output/trazas/traza_pipeline_diario_20250301_060000_1234.json")
+        print("Para generar trazas agrega --traza[=DIR] (y --profile) a los scripts de descarga, "
+              "preparación o carga, o define PJUD_TRAZA=DIR")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        eventos = [e for e in json.load(f)["traceEvents"] if e.get("ph") == "X"]
+
+    totales = {}
+    for evento in eventos:
+        total = totales.setdefault(evento["name"], [0, 0.0, 0.0])
+        total[0] += 1
+        total[1] += evento["dur"] / 1000
+        total[2] = max(total[2], evento["dur"] / 1000)
+
+    print(f"⏱️ {len(eventos):,} tramos en {sys.argv[1]}")
+    print("=" * 60)
+    print(f"   {'tramo':<24}{'n':>8}{'total ms':>14}{'medio ms':>12}{'máx ms':>12}")
+    for nombre, (n, ms, maximo) in sorted(totales.items(), key=lambda x: -x[1][1]):
+        print(f"   {nombre:<24}{n:>8,}{ms:>14,.1f}{ms / n:>12,.2f}{maximo:>12,.1f}")
+
+
+if __name__ == "__main__":
+    main()